@@ -0,0 +1,45 @@
+"""
+HFA SROI impact model.
+
+Every stage is available as functions that take and return DataFrames, without reading or
+writing files on import. File based runs go through impactPy.pipeline (python -m impactPy).
+"""
+
+import importlib
+
+from .survey import load_survey, process_data, map_income_level
+from .precision import PRECISION_SETTINGS, resolve_precision, compute_dtype, as_compute
+from .kernels import KERNEL_SETTINGS, available_backends
+from .validation import validate_inputs, read_raw_tables, raise_for_errors
+from .calibration import CALIBRATION_SETTINGS, WeightCalibration, apply_weights, read_margins
+from .activity import (calculate_activity_levels, create_activity_summary, calculate_spending_summary,
+                       create_spending_summaries, weighted_median)
+from .thresholds import INTENSITY_SCHEMES, ActivityDistributions, threshold_curves
+from .elasticity import (MODE_CONFIGS, calculate_elasticity, calculate_survey_rates, calculate_age_group_proportions,
+                         prepare_market_data, process_market_data)
+from .demand_curve import DemandCurve, predict_customers, discount_for_customers
+from .business import calculate_business_outcomes
+from .social import calculate_social_outcomes, calculate_market_social_outcomes
+from .health_functions import (calculate_adjusted_risk_rates, calculate_cases_saved, find_health_outcomes,
+                               get_risk_table, resolve_health_parameters, evaluate_health_outcomes,
+                               calculate_scenario_health_outcomes, calculate_geography_health_outcomes,
+                               split_scenarios_by_gender)
+from .geography import load_populations, geography_lineage
+from .consolidation import consolidate_results
+from .sensitivity import SENSITIVITY_SETTINGS, Dual, scenario_sensitivities, rank_inputs
+from .projection import PROJECTION_SETTINGS, build_projection_inputs, project_years, project_sroi
+from .cohort import COHORT_SETTINGS, simulate_cohorts, summarise_cohorts, cohort_yearly_table
+from .optimizer import OPTIMIZER_SETTINGS, build_options, optimize_discounts
+
+# Modules that also run as scripts (python -m impactPy.equivalence, ...) are imported on first use,
+# so that running them does not find them already imported by the package
+_LAZY_EXPORTS = {
+    'run_equivalence': 'equivalence', 'compare_outputs': 'equivalence', 'raise_for_mismatches': 'equivalence',
+    'record_run': 'warehouse', 'list_runs': 'warehouse', 'read_table': 'warehouse', 'query': 'warehouse',
+    'WaveAggregates': 'waves', 'wave_cells': 'waves'
+}
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        return getattr(importlib.import_module(f'.{_LAZY_EXPORTS[name]}', __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,258 @@
+
+"""
+Physical activity and spending summaries.
+
+- Weekly physical activity minutes = frequency x duration x intensity (based on heart rate).
+- Respondents are classified inactive, fairly active (30-149 minutes) or active as per WHO guidelines
+  (150+ minutes of moderate activity or equivalent).
+- Activity and spending behaviour are summarised by market and segment (gender, age group, income level)
+  using survey weights.
+"""
+
+
+import numpy as np
+import pandas as pd
+
+from .mappings import CURRENCY_RATES
+from .kernels import group_sums, group_weighted_quantiles, weekly_activity
+from .precision import ACCUMULATOR, compute_dtype
+
+# WHO guideline: 150 minutes of moderate activity a week, vigorous minutes counting double
+ACTIVE_MINUTES = 150
+INTENSITY_WEIGHTS = {'low': 0, 'moderate': 1, 'high': 2}
+
+# Below ACTIVE_MINUTES, respondents with at least this many weekly minutes are fairly active
+FAIRLY_ACTIVE_MINUTES = 30
+ACTIVITY_TIERS = ['inactive', 'fairly active', 'active']
+
+ACTIVITY_OUTPUT_COLUMNS = ['S1', 'dSEGMENT', 'uuid', 'total_activity_mins', 'activity_tier', 'active_flag', 'fairly_active_flag',
+                           'total_gym_minutes', 'gym_intensity',
+                           'walking_minutes', 'walking_intensity',
+                           'other_sports_minutes', 'other_sports_intensity']
+
+# Days per week of each frequency code (0.5 x multiplier for less than a week)
+FREQUENCY_DAYS = {1: 0.5, 2: 1, 3: 2, 4: 3, 5: 4, 6: 5, 7: 6, 8: 7, 9: 8}
+
+# Intensity of each heart rate code
+INTENSITY_CODES = {1: 'high', 2: 'moderate', 3: 'low'}
+
+# Activity questions answered by customers (dSEGMENT 1) and non-customers (dSEGMENT 2)
+ACTIVITY_QUESTIONS = {
+    1: {
+        'gym_freq': 'Q4', 'gym_duration': 'Q5r1', 'gym_intensity': 'Q6',
+        'walking_freq': 'Q9', 'walking_duration': 'Q10r1', 'walking_intensity': 'Q11',
+        'sports_freq': 'Q12', 'sports_duration': 'Q13r1', 'sports_intensity': 'Q14'
+    },
+    2: {
+        'gym_freq': 'Section_B_Q2', 'gym_duration': 'Section_B_Q3r1', 'gym_intensity': 'Section_B_Q4',
+        'walking_freq': 'Section_B_Q7', 'walking_duration': 'Section_B_Q8r1', 'walking_intensity': 'Section_B_Q9',
+        'sports_freq': 'Section_B_Q10', 'sports_duration': 'Section_B_Q11r1', 'sports_intensity': 'Section_B_Q12'
+    }
+}
+
+# Activities of the questionnaire: weekly minutes column, intensity column and question prefix
+ACTIVITIES = [('total_gym_minutes', 'gym_intensity', 'gym'),
+              ('walking_minutes', 'walking_intensity', 'walking'),
+              ('other_sports_minutes', 'other_sports_intensity', 'sports')]
+
+# Walks shorter than this many minutes a session do not count
+MIN_WALKING_MINUTES = 10
+
+def section_answers(survey_df, item):
+    """Section A and section B answers of every respondent to an ACTIVITY_QUESTIONS item."""
+    return tuple(survey_df[ACTIVITY_QUESTIONS[segment][item]].to_numpy(dtype=float) for segment in ACTIVITY_QUESTIONS)
+
+def activity_minutes(survey_df, precision=None, backend=None,
+                     intensity_weights=INTENSITY_WEIGHTS):
+    """
+    Weekly minutes and intensity of gym, walking and other sports of every respondent, and
+    total_activity_mins: their weekly minutes of moderate activity or equivalent.
+
+    Weekly minutes = days per week of the frequency code x minutes per session, in the compute
+    precision (see impactPy.precision); unknown frequency codes count 0 days and unknown
+    intensity codes low intensity. Totals are summed in float64. Each activity is one pass of the
+    weekly_activity kernel (see impactPy.kernels).
+    """
+    dtype = compute_dtype(precision)
+    customers = (survey_df['dSEGMENT'] == 1).to_numpy()
+
+    # Intensity labels and weights by kernel position, position 0 for unknown codes
+    labels = np.array(['low'] + list(INTENSITY_CODES.values()), dtype=object)
+    weights = [intensity_weights[label] for label in labels]
+
+    activities = {}
+    total = np.zeros(len(survey_df), dtype=ACCUMULATOR)
+    for minutes, intensity, activity in ACTIVITIES:
+        section_a, section_b = zip(*(section_answers(survey_df, f'{activity}_{item}') for item in ['freq', 'duration', 'intensity']))
+        weekly, positions, weighted = weekly_activity(
+            customers, section_a, section_b, FREQUENCY_DAYS, list(INTENSITY_CODES), weights,
+            MIN_WALKING_MINUTES if activity == 'walking' else 0, dtype, backend
+        )
+
+        activities[minutes] = weekly
+        activities[intensity] = labels[positions]
+        total += weighted
+
+    activities['total_activity_mins'] = total
+    return pd.DataFrame(activities, index=survey_df.index)
+
+def classify_activity_tiers(minutes, fairly_active_minutes=FAIRLY_ACTIVE_MINUTES, active_minutes=ACTIVE_MINUTES):
+    """Position in ACTIVITY_TIERS of every weekly minutes value: 0 inactive, 1 fairly active, 2 active."""
+    return np.searchsorted([fairly_active_minutes, active_minutes], np.asarray(minutes, dtype=float), side='right')
+
+def calculate_activity_levels(survey_df, precision=None, backend=None):
+    """Return weekly activity minutes, activity tier and tier flags for every respondent."""
+
+    activities = activity_minutes(survey_df, precision, backend)
+    df = pd.concat([survey_df[['S1', 'dSEGMENT', 'uuid']], activities], axis=1)
+
+    # Apply WHO guidelines to classify active and fairly active individuals
+    tiers = classify_activity_tiers(df['total_activity_mins'])
+    df['activity_tier'] = np.array(ACTIVITY_TIERS, dtype=object)[tiers]
+    df['active_flag'] = (tiers == 2).astype(int)
+    df['fairly_active_flag'] = (tiers == 1).astype(int)
+
+    return df[ACTIVITY_OUTPUT_COLUMNS]
+
+# Analysis Functions
+CUSTOMER_STATUS = {1: 'customers', 2: 'non_customers'}
+
+def fairly_active_flags(df):
+    """Fairly active flag of every respondent, derived from total_activity_mins for activity outputs saved without one."""
+    if 'fairly_active_flag' in df.columns:
+        return df['fairly_active_flag']
+    return pd.Series((classify_activity_tiers(df['total_activity_mins']) == 1).astype(int), index=df.index)
+
+# Weighted sums behind the activity summaries, per (market, group columns, dSEGMENT)
+ACTIVITY_SUM_COLUMNS = ['weighted_active', 'weighted_fairly_active', 'WEIGHT']
+
+def create_activity_summary(df, group_columns):
+    """
+    Weighted share of active and fairly active customers and non-customers by market and group_columns.
+
+    Weighted tier counts and weights are summed in a single groupby over
+    (market, group_columns, dSEGMENT) and unstacked by customer status. Only groups with
+    both customers and non-customers are kept.
+    """
+    keys = ['market'] + group_columns
+
+    data = df.loc[df['dSEGMENT'].isin(list(CUSTOMER_STATUS)), keys + ['dSEGMENT', 'WEIGHT']]
+    data = data.assign(weighted_active=df['active_flag'] * df['WEIGHT'],
+                       weighted_fairly_active=fairly_active_flags(df) * df['WEIGHT'])
+
+    return activity_summary_from_sums(data.groupby(keys + ['dSEGMENT'])[ACTIVITY_SUM_COLUMNS].sum())
+
+def activity_summary_from_sums(sums):
+    """
+    Activity summary of the weighted sums (ACTIVITY_SUM_COLUMNS) of every (market, group columns,
+    dSEGMENT), as summed by create_activity_summary or merged from survey waves (see impactPy.waves).
+    """
+    sums = sums[sums.index.get_level_values('dSEGMENT').isin(list(CUSTOMER_STATUS))]
+    sums = sums.unstack('dSEGMENT').dropna()
+
+    weights = sums['WEIGHT'].rename(columns=CUSTOMER_STATUS)
+    active = (sums['weighted_active'] / sums['WEIGHT']).rename(columns=CUSTOMER_STATUS)
+    fairly_active = (sums['weighted_fairly_active'] / sums['WEIGHT']).rename(columns=CUSTOMER_STATUS)
+
+    return format_activity_summary(
+        sums.index.to_frame(index=False), active['customers'].to_numpy(), active['non_customers'].to_numpy(),
+        weights['customers'].to_numpy(), weights['non_customers'].to_numpy(),
+        fairly_active['customers'].to_numpy(), fairly_active['non_customers'].to_numpy()
+    )
+
+def format_activity_summary(groups, active_customers, active_non_customers, customers, non_customers,
+                            fairly_active_customers, fairly_active_non_customers):
+    """
+    Activity summary table of the groups (market and group columns) from their active and fairly
+    active shares and weights. 'change' and 'fairly change' are the differences in the share of
+    active and fairly active respondents between customers and non-customers.
+    """
+    keys = list(groups.columns)
+
+    final_summary = groups.reset_index(drop=True).assign(**{
+        'active customers': active_customers,
+        'active non-customers': active_non_customers,
+        'fairly active customers': fairly_active_customers,
+        'fairly active non-customers': fairly_active_non_customers,
+        'customers': customers,
+        'non_customers': non_customers
+    })
+
+    final_summary['change'] = final_summary['active customers'] - final_summary['active non-customers']
+    final_summary['fairly change'] = final_summary['fairly active customers'] - final_summary['fairly active non-customers']
+    final_summary['total count'] = final_summary['customers'] + final_summary['non_customers']
+
+    share_columns = ['active customers', 'active non-customers', 'change',
+                     'fairly active customers', 'fairly active non-customers', 'fairly change']
+    final_summary[share_columns] = final_summary[share_columns].round(5)
+
+    final_summary['non-customers %'] = (final_summary['non_customers'] / final_summary['total count']).round(1)
+
+    output_columns = keys + share_columns + ['customers', 'non_customers', 'total count', 'non-customers %']
+    return final_summary[output_columns]
+
+# Spending Analysis Functions
+def weighted_median(data, weights):
+    data, weights = np.array(data).squeeze(), np.array(weights).squeeze()
+    s_data, s_weights = map(np.array, zip(*sorted(zip(data, weights))))
+    midpoint = 0.5 * sum(s_weights)
+    if any(weights > midpoint):
+        w_median = (data[weights == np.max(weights)])[0]
+    else:
+        cs_weights = np.cumsum(s_weights)
+        idx = np.where(cs_weights <= midpoint)[0][-1]
+        if cs_weights[idx] == midpoint:
+            w_median = np.mean(s_data[idx:idx+2])
+        else:
+            w_median = s_data[idx+1]
+    return w_median
+
+SPENDING_COLUMNS = ['median_spent_local', 'median_spent_$', 'avg_spent_local', 'avg_spent_$', 'weighted_total']
+
+def calculate_spending_summary(data, group_cols, currency_rates=CURRENCY_RATES, backend=None):
+    """
+    Weighted median and mean monthly spend (Q2r1), in local currency and dollars, and weighted
+    total of every group of group_cols (which include 'market', for the currency rates).
+
+    Groups are numbered once and the medians (as weighted_median) and weighted sums of all
+    groups come out of the group_weighted_quantiles and group_sums kernels (see impactPy.kernels).
+    """
+    grouped = data.groupby(group_cols)
+    groups = grouped.size().index.to_frame(index=False)
+    codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    currency_rate = groups['market'].map(currency_rates).to_numpy()
+
+    spend, weights = data['Q2r1'].to_numpy(dtype=float), data['WEIGHT'].to_numpy(dtype=float)
+    local_median = group_weighted_quantiles(codes, spend, weights, len(groups), backend=backend)[0]
+    weighted_total, weighted_spend = group_sums(codes, np.stack([weights, spend * weights]), len(groups), backend)
+    weighted_local_avg = weighted_spend / weighted_total
+
+    summary = groups.assign(**{
+        'median_spent_local': local_median,
+        'median_spent_$': local_median * currency_rate,
+        'avg_spent_local': weighted_local_avg,
+        'avg_spent_$': weighted_local_avg * currency_rate,
+        'weighted_total': weighted_total
+    })
+    summary[SPENDING_COLUMNS] = summary[SPENDING_COLUMNS].round(2)
+
+    return summary
+
+def create_spending_summaries(df, currency_rates=CURRENCY_RATES):
+    """Spending summaries of Male and Female customers by gender, age group and income level."""
+    customers_df = df[(df['dSEGMENT'] == 1) & (df['gender'].isin(['Male', 'Female']))].copy()
+
+    summaries = {}
+    for group in ['gender', 'age_group']:
+        spending_summary = calculate_spending_summary(customers_df, ['market', group], currency_rates)
+        summaries[group] = spending_summary.sort_values(['market', group])
+
+    # Income level spending summary
+    income_spending_summary = calculate_spending_summary(
+        customers_df[customers_df['income_level'] != 'Prefer not to answer'],
+        ['market', 'income_level'],
+        currency_rates
+    )
+    summaries['income_level'] = income_spending_summary.sort_values(['market', 'income_level'])
+
+    return summaries
@@ -22,7 +22,6 @@ Methodology for Health Cost Data Processing:
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import yfinance as yf
 
 def read_data(file_path):
     return pd.read_csv(file_path)
@@ -43,6 +42,9 @@ def get_inflation_adjustment(cpi_data, country, base_year):
         return np.nan
 
 def fetch_exchange_rate(currency_pair, date, max_attempts=4):
+    # Imported here so the module can be used without yfinance installed
+    import yfinance as yf
+
     for i in range(max_attempts):
         adjusted_date = date + timedelta(days=i)
         data = yf.download(currency_pair, start=adjusted_date, end=adjusted_date + timedelta(days=1))
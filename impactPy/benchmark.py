@@ -0,0 +1,201 @@
+
+"""
+Benchmarks of the array engines at large sizes.
+
+Every workload runs on synthetic inputs (no data files needed) in each precision of
+impactPy.precision and each installed kernel backend of impactPy.kernels it supports. The report
+gives the best wall time of a few runs (after a warm-up call, which compiles the Numba kernels)
+and the peak of the allocations traced by tracemalloc (NumPy arrays included), both also relative
+to float64 on NumPy, and the largest differences of the outputs from the float64 NumPy outputs,
+checked against FLOAT32_TOLERANCES:
+
+    activity     calculate_activity_levels of every respondent (precisions, backends)
+    elasticity   calculate_elasticity by market and gender of every respondent (precisions, backends)
+    spending     calculate_spending_summary by market and gender of every customer (backends)
+    health       evaluate_health_outcomes of every scenario x adult disease (precisions)
+    projection   project_sroi of every variant x scenario x year (precisions)
+    cohort       simulate_cohorts of every scenario x adult disease x state x year, summed (precisions)
+
+Run with python -m impactPy.benchmark from the repository root.
+"""
+
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from .activity import calculate_activity_levels, calculate_spending_summary
+from .cohort import COHORT_SETTINGS, simulate_cohorts, summarise_cohorts
+from .elasticity import MODE_CONFIGS, calculate_elasticity
+from .equivalence import compare_outputs, synthetic_survey
+from .health_functions import ADULT_HEALTH_LIST, calculate_adjusted_risk_rates, evaluate_health_outcomes
+from .kernels import KERNEL_BACKENDS, available_backends
+from .precision import FLOAT32_TOLERANCES, PRECISIONS
+from .projection import project_sroi
+
+BENCHMARK_SETTINGS = {
+    'respondents': 1_000_000,
+    'scenarios': 100_000,
+    'geographies': 10,
+    'projection_scenarios': 5_000,
+    'cohort_scenarios': 100_000,
+    'variants': 4,
+    'horizon': 20
+}
+
+BENCHMARK_COLUMNS = ['workload', 'size', 'precision', 'backend', 'seconds', 'speedup', 'peak_mb', 'memory_ratio',
+                     'max_abs_diff', 'max_rel_diff', 'within_tolerance']
+
+def synthetic_risk_table(geographies, seed=0):
+    """Risk decompositions of every adult disease, gender and geography from random parameters."""
+    rng = np.random.default_rng(seed)
+    keys = pd.MultiIndex.from_product([ADULT_HEALTH_LIST, ['female', 'male'], geographies, ['adult']],
+                                      names=['factor', 'gender', 'geography', 'age_group']).to_frame(index=False)
+    n = len(keys)
+    activity_rate, fairly_activity_rate = rng.uniform(0.2, 0.6, n), rng.uniform(0, 0.2, n)
+    relative_risk, fairly_relative_risk = rng.uniform(1, 2, n), rng.uniform(1, 1.5, n)
+
+    table = keys.copy()
+    for prefix, scale in [('risk', 0.02), ('daly', 0.01), ('death', 0.002)]:
+        active, fairly_active, inactive = calculate_adjusted_risk_rates(
+            rng.uniform(0.1, 1, n) * scale, activity_rate, relative_risk, fairly_activity_rate, fairly_relative_risk
+        )
+        table[f'{prefix}_active'], table[f'{prefix}_fairly_active'], table[f'{prefix}_inactive'] = active, fairly_active, inactive
+    table['direct_cost_per_case'] = rng.uniform(500, 20000, n)
+    table['indirect_cost_per_case'] = rng.uniform(0, 10000, n)
+    return table
+
+def synthetic_scenarios(n, geographies, seed=0):
+    """Gender scenarios with newly active and fairly active customers."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'scenario_id': np.arange(n).astype(str),
+        'gender': rng.choice(['female', 'male'], n),
+        'geography': rng.choice(geographies, n),
+        'newly_active_customers': rng.uniform(0, 2e5, n),
+        'newly_fairly_active_customers': rng.uniform(-5e4, 1e5, n)
+    })
+
+def synthetic_projection_inputs(n, seed=0):
+    """Year-one figures of n scenarios, as build_projection_inputs."""
+    rng = np.random.default_rng(seed)
+    inputs = pd.DataFrame({
+        'scenario_id': np.arange(n).astype(str),
+        'price': rng.choice(['10%', '20%', '40%', '60%', '80%'], n),
+        'new_customers': rng.uniform(1e3, 1e6, n),
+        'newly_active_customers': rng.uniform(0, 2e5, n),
+        'spend': rng.uniform(1e5, 1e9, n),
+        'health_saving': rng.uniform(1e4, 1e8, n)
+    })
+    inputs['discount'] = inputs['price'].str.rstrip('%').astype(float) / 100
+    inputs['investment'] = inputs['spend'] * inputs['discount']
+    return inputs
+
+def cohort_totals(scenarios_df, risk_table, horizon=COHORT_SETTINGS['horizon'], precision=None):
+    """Totals over the horizon of simulate_cohorts, with the default assumptions."""
+    rows, outcomes, _ = simulate_cohorts(scenarios_df, risk_table, dict(COHORT_SETTINGS, horizon=horizon), precision=precision)
+    return summarise_cohorts(rows, outcomes, precision=precision)
+
+def workloads(settings=BENCHMARK_SETTINGS):
+    """
+    Function, arguments, size label and options of every workload. The options are the keywords
+    the function takes of 'precision' and 'backend'.
+    """
+    geographies = [f'geography {position}' for position in range(settings['geographies'])]
+    survey_df = synthetic_survey(settings['respondents'])
+    customers = survey_df[(survey_df['dSEGMENT'] == 1) & survey_df['gender'].isin(['Male', 'Female'])]
+    gender = MODE_CONFIGS['gender']
+    variants = np.linspace(0.5, 0.9, settings['variants'])
+
+    return {
+        'activity': (calculate_activity_levels, (survey_df,), {},
+                     f"{settings['respondents']:,} respondents", ['precision', 'backend']),
+        'elasticity': (calculate_elasticity, (survey_df, gender['group_cols'], gender['filter_col'], gender['valid_values']), {},
+                       f"{settings['respondents']:,} respondents", ['precision', 'backend']),
+        'spending': (calculate_spending_summary, (customers, ['market', 'gender']), {},
+                     f"{len(customers):,} customers", ['backend']),
+        'health': (evaluate_health_outcomes, (synthetic_scenarios(settings['scenarios'], geographies), synthetic_risk_table(geographies)), {},
+                   f"{settings['scenarios']:,} scenarios x {len(ADULT_HEALTH_LIST)} diseases", ['precision']),
+        'projection': (project_sroi, (synthetic_projection_inputs(settings['projection_scenarios']),),
+                       {'horizons': [settings['horizon']], 'discount_rates': np.linspace(0.01, 0.05, settings['variants']),
+                        'retention': variants, 'activity_decay': 1 - variants},
+                       f"{settings['variants'] ** 3} variants x {settings['projection_scenarios']:,} scenarios x {settings['horizon']} years",
+                       ['precision']),
+        'cohort': (cohort_totals, (synthetic_scenarios(settings['cohort_scenarios'], geographies), synthetic_risk_table(geographies)),
+                   {'horizon': settings['horizon']},
+                   f"{settings['cohort_scenarios']:,} scenarios x {len(ADULT_HEALTH_LIST)} diseases x {settings['horizon']} years",
+                   ['precision'])
+    }
+
+def measure(function, args, kwargs, repeats=3):
+    """
+    Result of a warm-up call, best wall time in seconds of repeats more and peak traced allocations
+    in bytes of one call.
+    """
+    result = function(*args, **kwargs)
+
+    seconds = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        seconds = min(seconds, time.perf_counter() - start)
+
+    # Tracing slows allocations down, so memory is measured on a further call
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+def run_benchmarks(names=None, settings=BENCHMARK_SETTINGS, precisions=tuple(PRECISIONS), backends=None,
+                   tolerances=FLOAT32_TOLERANCES):
+    """
+    Benchmark table (BENCHMARK_COLUMNS) of every workload in every precision and kernel backend it
+    supports (installed backends by default), compared with the first precision on the first backend.
+    """
+    backends = backends or available_backends()
+    rows = []
+    for name, (function, args, kwargs, size, options) in workloads(settings).items():
+        if names and name not in names:
+            continue
+
+        expected, expected_seconds, expected_peak = None, None, None
+        for precision in precisions if 'precision' in options else [None]:
+            for backend in backends if 'backend' in options else [None]:
+                options_kwargs = {key: value for key, value in [('precision', precision), ('backend', backend)] if value}
+                result, seconds, peak = measure(function, args, dict(kwargs, **options_kwargs))
+                if expected is None:
+                    expected, expected_seconds, expected_peak = result, seconds, peak
+                max_abs, max_rel, mismatch = compare_outputs(expected, result, **tolerances)
+
+                rows.append({
+                    'workload': name, 'size': size, 'precision': precision or '-', 'backend': backend or '-',
+                    'seconds': seconds, 'speedup': expected_seconds / seconds,
+                    'peak_mb': peak / 2**20, 'memory_ratio': peak / expected_peak,
+                    'max_abs_diff': max_abs, 'max_rel_diff': max_rel, 'within_tolerance': mismatch is None
+                })
+
+    return pd.DataFrame(rows, columns=BENCHMARK_COLUMNS)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the array engines in every precision and kernel backend.')
+    parser.add_argument('--workloads', nargs='+', choices=['activity', 'elasticity', 'spending', 'health', 'projection', 'cohort'])
+    parser.add_argument('--backends', nargs='+', choices=KERNEL_BACKENDS, help='kernel backends (installed ones by default)')
+    parser.add_argument('--respondents', type=int, default=BENCHMARK_SETTINGS['respondents'])
+    parser.add_argument('--scenarios', type=int, default=BENCHMARK_SETTINGS['scenarios'])
+    parser.add_argument('--variants', type=int, default=BENCHMARK_SETTINGS['variants'],
+                        help='values of each projection assumption (variants = values ^ 3)')
+    args = parser.parse_args(argv)
+
+    settings = dict(BENCHMARK_SETTINGS, respondents=args.respondents, scenarios=args.scenarios, variants=args.variants)
+    report = run_benchmarks(args.workloads, settings, backends=args.backends)
+    with pd.option_context('display.width', 200, 'display.max_colwidth', 60):
+        print(report.to_string(index=False, float_format=lambda value: f'{value:.3g}'))
+
+if __name__ == "__main__":
+    main()
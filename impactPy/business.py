@@ -0,0 +1,34 @@
+
+"""
+Business Outcome Calculation: Gender, Age Group, and Income Segmentation
+
+- Merge elasticity scenario data with spending data by market and group (gender, age, income).
+- Calculate business outcomes by estimating total spending (median and average) for new customers in local and USD currencies.
+"""
+
+
+import pandas as pd
+
+# Function to calculate business outcomes
+def calculate_business_outcomes(scenarios_df, spending_df, group_column):
+    
+    # Perform a left join on 'market' and the group column (gender or age_group)
+    merged_df = pd.merge(scenarios_df,
+                        spending_df[['market', group_column, 
+                                   'median_spent_local', 'median_spent_$',
+                                   'avg_spent_local', 'avg_spent_$']],
+                        on=['market', group_column],
+                        how='left')
+    
+    # Calculate economic outcomes
+    merged_df['economic_outcome_median_local'] = merged_df['new_customers'] * merged_df['median_spent_local']
+    merged_df['economic_outcome_median_$'] = merged_df['new_customers'] * merged_df['median_spent_$']
+    merged_df['economic_outcome_avg_local'] = merged_df['new_customers'] * merged_df['avg_spent_local']
+    merged_df['economic_outcome_avg_$'] = merged_df['new_customers'] * merged_df['avg_spent_$']
+    
+    # Select relevant columns for business outcome
+    business_outcome = merged_df[['scenario_id', 'price', group_column, 'new_customers', 
+                                'economic_outcome_median_local', 'economic_outcome_median_$',
+                                'economic_outcome_avg_local', 'economic_outcome_avg_$']]
+    
+    return business_outcome
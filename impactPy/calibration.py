@@ -0,0 +1,233 @@
+
+"""
+Survey weight calibration to population margins.
+
+The vendor WEIGHT column matches each market's sample to its population. When waves are pooled
+or markets subset, weights are re-calibrated so that the weighted totals of every category of
+gender, age group and income level match population margins within each market:
+
+- raking (iterative proportional fitting): weights are scaled to each variable's margins in turn
+  until every margin matches, with weights trimmed to bounds x their base weight after each cycle;
+- linear calibration: weights = base weight x (1 + a sum of one coefficient per margin), solved
+  exactly with Newton steps; bounds truncate the factor and the solve is repeated on the rest.
+
+Margins are read from a CSV with columns market, variable, category and target. Targets are
+population counts or shares; they are used as shares within (market, variable), so each market
+keeps its weight total. Categories without a margin (e.g. "Prefer not to answer") keep their
+weight total, and markets without margins keep their weights.
+
+Every (market, category) cell of a variable is an integer code, so the weighted totals of all
+cells are one np.bincount over the respondents and a raking step is one gather and multiply.
+"""
+
+
+import numpy as np
+import pandas as pd
+
+CALIBRATION_SETTINGS = {
+    'variables': ['gender', 'age_group', 'income_level'],
+    'method': 'raking',
+    'bounds': (0.2, 5.0),
+    'max_iterations': 100,
+    'tolerance': 1e-6
+}
+
+CALIBRATED_WEIGHT = 'CALIBRATED_WEIGHT'
+
+RESPONDENT_KEYS = ['S1', 'dSEGMENT', 'uuid']
+
+MARGIN_COLUMNS = ['market', 'variable', 'category', 'target']
+
+def read_margins(path):
+    margins = pd.read_csv(path)
+    missing = [column for column in MARGIN_COLUMNS if column not in margins.columns]
+    if missing:
+        raise ValueError(f"Population margins in {path} are missing columns {missing}")
+    return margins[MARGIN_COLUMNS]
+
+class WeightCalibration:
+    """
+    Margin codes and targets of one respondent frame, calibrated with raking or linear calibration.
+
+    df: respondents with weight_column, group_column (market) and the variables
+    margins: population margins (see read_margins)
+    """
+
+    def __init__(self, df, margins, variables=CALIBRATION_SETTINGS['variables'], group_column='market',
+                 weight_column='WEIGHT'):
+        self.base_weights = df[weight_column].to_numpy(dtype=float)
+        self.variables = list(variables)
+
+        self.codes, self.targets, cells = [], [], []
+        for variable in self.variables:
+            codes, targets, variable_cells = self._encode(df, margins, variable, group_column)
+            self.codes.append(codes)
+            self.targets.append(targets)
+            cells.append(variable_cells.assign(variable=variable))
+
+        self.cells = pd.concat(cells, ignore_index=True)[['variable', group_column, 'category', 'target', 'base_total']]
+
+        # Respondents of each variable's calibrated cells, so steps only touch those rows
+        self.rows = [np.flatnonzero(codes >= 0) for codes in self.codes]
+        self.cell_codes = [codes[rows] for codes, rows in zip(self.codes, self.rows)]
+        self.summary = None
+
+    def _encode(self, df, margins, variable, group_column):
+        """
+        Cell code of every respondent (-1 in groups without margins for the variable) and target
+        weight total of every cell. Categories without a margin are cells whose target is their
+        current total, so every variable's targets add up to the group's weight total.
+        """
+        groups = df.groupby([group_column, variable], dropna=False, sort=True)
+        codes = groups.ngroup().to_numpy()
+        cells = groups.size().index.to_frame(index=False).rename(columns={variable: 'category'})
+        cells['base_total'] = np.bincount(codes, weights=self.base_weights, minlength=len(cells))
+
+        variable_margins = margins[margins['variable'] == variable].rename(columns={'market': group_column})
+        targets = variable_margins.groupby([group_column, 'category'])['target'].sum().reset_index()
+        cells = cells.merge(targets, on=[group_column, 'category'], how='left')
+
+        missing = targets.merge(cells[[group_column, 'category']], on=[group_column, 'category'], how='left', indicator=True)
+        for row in missing[(missing['_merge'] == 'left_only') & (missing['target'] > 0)].itertuples(index=False):
+            print(f"No respondents for {variable} '{row.category}' in {getattr(row, group_column)}; its margin is skipped")
+
+        # Targets are shares of the group's listed categories, scaled to their current weight total
+        listed = cells['target'].notna()
+        listed_target = cells['target'].groupby(cells[group_column], dropna=False).transform('sum')
+        listed_base = cells['base_total'].where(listed, 0).groupby(cells[group_column], dropna=False).transform('sum')
+        cells['target'] = np.where(listed, cells['target'] / listed_target * listed_base, cells['base_total'])
+
+        calibrated = listed.groupby(cells[group_column], dropna=False).transform('any').to_numpy()
+        new_codes = np.where(calibrated, np.cumsum(calibrated) - 1, -1)
+        cells = cells[calibrated].reset_index(drop=True)
+
+        return new_codes[codes], cells['target'].to_numpy(dtype=float), cells
+
+    def totals(self, weights):
+        """Weighted total of every cell of every variable."""
+        return [np.bincount(codes, weights=weights[rows], minlength=len(targets))
+                for codes, rows, targets in zip(self.cell_codes, self.rows, self.targets)]
+
+    def max_error(self, weights):
+        """Largest relative difference between a calibrated cell total and its target."""
+        errors = [np.abs(totals - targets)[targets > 0] / targets[targets > 0]
+                  for totals, targets in zip(self.totals(weights), self.targets)]
+        return max((error.max() for error in errors if len(error)), default=0.0)
+
+    def rake(self, bounds=CALIBRATION_SETTINGS['bounds'], max_iterations=CALIBRATION_SETTINGS['max_iterations'],
+             tolerance=CALIBRATION_SETTINGS['tolerance']):
+        """Iterative proportional fitting, trimming weights to bounds x base weight after every cycle."""
+        weights = self.base_weights.copy()
+        lower, upper = self._limits(bounds)
+
+        converged = False
+        for iteration in range(1, max_iterations + 1):
+            largest_step = 0.0
+            for codes, rows, targets in zip(self.cell_codes, self.rows, self.targets):
+                totals = np.bincount(codes, weights=weights[rows], minlength=len(targets))
+                ratios = np.divide(targets, totals, out=np.ones_like(targets), where=totals > 0)
+                weights[rows] *= ratios[codes]
+                largest_step = max(largest_step, np.abs(ratios - 1).max(initial=0.0))
+
+            if lower is not None:
+                np.clip(weights, lower, upper, out=weights)
+
+            if largest_step < tolerance:
+                converged = True
+                break
+
+        return weights, self._summarise('raking', weights, iteration, converged, bounds)
+
+    def linear(self, bounds=CALIBRATION_SETTINGS['bounds'], max_iterations=CALIBRATION_SETTINGS['max_iterations'],
+               tolerance=CALIBRATION_SETTINGS['tolerance']):
+        """
+        Linear calibration: one coefficient per cell, weights = base x clip(1 + sum of the
+        respondent's coefficients, bounds). Newton steps solve the calibration equations; cross
+        products of the cell indicators are bincounts over pairs of cell codes.
+        """
+        offsets = np.concatenate([[0], np.cumsum([len(targets) for targets in self.targets])])
+        n_cells = offsets[-1]
+        target = np.concatenate(self.targets)
+        codes = [np.where(variable_codes >= 0, variable_codes + offset, -1)
+                 for variable_codes, offset in zip(self.codes, offsets[:-1])]
+
+        lower, upper = bounds if bounds is not None else (-np.inf, np.inf)
+        coefficients = np.zeros(n_cells)
+        weights = self.base_weights.copy()
+
+        converged = False
+        for iteration in range(1, max_iterations + 1):
+            factors = 1 + sum(np.where(code >= 0, coefficients[np.maximum(code, 0)], 0.0) for code in codes)
+            weights = self.base_weights * np.clip(factors, lower, upper)
+
+            residual = target - np.concatenate(self.totals(weights))
+            if np.abs(residual[target > 0] / target[target > 0]).max(initial=0.0) < tolerance:
+                converged = True
+                break
+
+            # Only respondents whose factor is within bounds respond to a change of coefficients
+            free = self.base_weights * ((factors > lower) & (factors < upper))
+            jacobian = np.zeros(n_cells * n_cells)
+            for first in codes:
+                for second in codes:
+                    pairs = (first >= 0) & (second >= 0)
+                    jacobian += np.bincount(first[pairs] * n_cells + second[pairs], weights=free[pairs],
+                                            minlength=n_cells * n_cells)
+
+            # Margins are redundant (each variable's cells add up to the market), so least squares
+            coefficients += np.linalg.lstsq(jacobian.reshape(n_cells, n_cells), residual, rcond=None)[0]
+
+        return weights, self._summarise('linear', weights, iteration, converged, bounds)
+
+    def calibrate(self, method=CALIBRATION_SETTINGS['method'], bounds=CALIBRATION_SETTINGS['bounds'],
+                  max_iterations=CALIBRATION_SETTINGS['max_iterations'], tolerance=CALIBRATION_SETTINGS['tolerance']):
+        """Calibrated weights by method ('raking' or 'linear'); the run's diagnostics are kept in summary."""
+        if method == 'raking':
+            weights, self.summary = self.rake(bounds, max_iterations, tolerance)
+        elif method == 'linear':
+            weights, self.summary = self.linear(bounds, max_iterations, tolerance)
+        else:
+            raise ValueError(f"Unknown calibration method '{method}', expected 'raking' or 'linear'")
+
+        if not self.summary['converged']:
+            print(f"Weight calibration did not converge in {max_iterations} iterations "
+                  f"(largest margin error {self.summary['max_error']:.2e}); the bounds may be too tight")
+        return weights
+
+    def margin_report(self, weights):
+        """Target, base and calibrated weight total of every calibrated cell."""
+        report = self.cells.copy()
+        report['calibrated_total'] = np.concatenate(self.totals(weights))
+        return report
+
+    def _limits(self, bounds):
+        if bounds is None:
+            return None, None
+        return self.base_weights * bounds[0], self.base_weights * bounds[1]
+
+    def _summarise(self, method, weights, iterations, converged, bounds):
+        ratios = np.divide(weights, self.base_weights, out=np.ones_like(weights), where=self.base_weights > 0)
+        at_bounds = 0 if bounds is None else int(np.sum(np.isclose(ratios, bounds[0]) | np.isclose(ratios, bounds[1])))
+
+        return {
+            'method': method,
+            'iterations': iterations,
+            'converged': converged,
+            'max_error': float(self.max_error(weights)),
+            'trimmed': at_bounds,
+            'min_ratio': float(ratios.min()),
+            'max_ratio': float(ratios.max()),
+            # Kish design effect of unequal weights: 1 + squared coefficient of variation
+            'design_effect': float(len(weights) * np.sum(weights ** 2) / np.sum(weights) ** 2)
+        }
+
+def apply_weights(survey_df, weights_df, weight_column=CALIBRATED_WEIGHT):
+    """Survey with WEIGHT replaced by weight_column of weights_df, matched on the respondent keys."""
+    weights = survey_df[RESPONDENT_KEYS].merge(weights_df[RESPONDENT_KEYS + [weight_column]], on=RESPONDENT_KEYS, how='left')
+    if weights[weight_column].isna().any():
+        raise ValueError(f"{int(weights[weight_column].isna().sum())} respondents have no {weight_column}; "
+                         "rerun the calibration stage")
+
+    survey_df = survey_df.copy()
+    survey_df['WEIGHT'] = weights[weight_column].to_numpy()
+    return survey_df
@@ -0,0 +1,186 @@
+
+"""
+Markov cohort model of multi-year health outcomes.
+
+evaluate_health_outcomes counts the cases saved by newly active customers in a single year. The
+cohort model follows the same people over a horizon instead. Every year they move between the
+activity states (COHORT_STATES) by a transition matrix, die of the modelled diseases (and of
+background mortality), and the cases, deaths and DALYs of every disease accumulate.
+
+The model is linear in the people of each state, so it tracks the difference between a scenario
+and its counterfactual, in which the same people stay inactive: newly active customers start as
++1 active and -1 inactive person, newly fairly active customers as +1 fairly active and -1
+inactive (a negative fairly active change moves people from the fairly active to the active
+tier). Each year, by state,
+
+    cases saved                 = -(difference in people at risk of the disease) . incidence
+    deaths saved, DALYs saved   = -(difference in people alive) . disease mortality, DALY rates
+
+People at risk of a disease leave it on incidence and death; the survivors then move by the
+transitions. Cases postponed rather than prevented are counted again when they occur, so the
+cases saved of a late year can be negative. The rates of every state are the risk decompositions
+of the risk table (calculate_adjusted_risk_rates, through get_risk_table), and the rates of the
+new states apply after a lag of settings['lag'] years. With no lag, year one cases saved are those of
+evaluate_health_outcomes (active plus fairly active); its deaths and DALYs saved also count the
+fairly active tier.
+
+All scenarios and diseases are evaluated together: every year is one product of the (scenario x
+disease, states) differences with the (states, states) transition matrix, in the compute precision
+(see impactPy.precision); totals and present values are summed in float64.
+"""
+
+
+import numpy as np
+import pandas as pd
+
+from .kernels import group_sums
+from .precision import ACCUMULATOR, as_compute, compute_dtype
+from .projection import PROJECTION_SETTINGS, discount_factors
+
+COHORT_STATES = ['active', 'fairly_active', 'inactive']
+
+# Default assumptions: active and fairly active people become inactive at the activity decay of
+# the projection; background_mortality is the yearly mortality of causes outside the modelled diseases
+COHORT_SETTINGS = {
+    'horizon': 20,
+    'activity_decay': PROJECTION_SETTINGS['activity_decay'][0],
+    'fairly_decay': PROJECTION_SETTINGS['activity_decay'][0],
+    'background_mortality': 0.0,
+    'lag': 0,
+    'discount_rate': PROJECTION_SETTINGS['discount_rates'][0]
+}
+
+COHORT_COLUMNS = ['cases_saved', 'deaths_saved', 'dalys_saved', 'total_saving']
+
+def transition_matrix(activity_decay=COHORT_SETTINGS['activity_decay'], fairly_decay=COHORT_SETTINGS['fairly_decay']):
+    """
+    Yearly transitions between COHORT_STATES (rows from, columns to): active and fairly active
+    people become inactive at their decay rates, inactive people stay inactive.
+    """
+    return np.array([
+        [1 - activity_decay, 0.0, activity_decay],
+        [0.0, 1 - fairly_decay, fairly_decay],
+        [0.0, 0.0, 1.0]
+    ])
+
+def check_transitions(transitions):
+    """transitions as a float array, raising ValueError unless it is a (states, states) matrix of probabilities."""
+    transitions = np.asarray(transitions, dtype=float)
+    n = len(COHORT_STATES)
+    if transitions.shape != (n, n):
+        raise ValueError(f"Transitions must be a {n} x {n} matrix over {COHORT_STATES}, got shape {transitions.shape}")
+    if (transitions < 0).any() or not np.allclose(transitions.sum(axis=1), 1):
+        raise ValueError("Transitions must be non-negative and every row must add up to 1")
+    return transitions
+
+def state_rates(merged_df, prefix):
+    """Rates of every row in each of COHORT_STATES, shape (rows, states)."""
+    return np.stack([merged_df[f'{prefix}_{state}'].to_numpy(dtype=float) for state in COHORT_STATES], axis=1)
+
+def simulate_cohorts(scenarios_df, risk_table, settings=COHORT_SETTINGS, transitions=None,
+                     precision=None):
+    """
+    Year-by-year outcomes of every scenario and disease.
+
+    scenarios_df and risk_table are those of evaluate_health_outcomes; transitions defaults to
+    transition_matrix of the decays in settings. Returns the rows (scenario columns and factor,
+    one row per scenario and factor, indexed by the position of their scenario in scenarios_df),
+    the outcomes of every row as arrays of shape (rows, years) keyed by COHORT_COLUMNS, and the
+    difference in people alive in every state, of shape (scenarios, states, years).
+    """
+    horizon, lag = int(settings['horizon']), int(settings['lag'])
+    if horizon < 1:
+        raise ValueError("The horizon must be at least one year")
+    if transitions is None:
+        transitions = transition_matrix(settings['activity_decay'], settings['fairly_decay'])
+    dtype = compute_dtype(precision)
+    transitions = as_compute(check_transitions(transitions), precision)
+
+    scenarios_df = scenarios_df.reset_index(drop=True)
+    merged_df = pd.merge(
+        scenarios_df.assign(health_age_group=scenarios_df.get('health_age_group', 'adult'), scenario_row=np.arange(len(scenarios_df))),
+        risk_table.rename(columns={'age_group': 'health_age_group'}),
+        on=['gender', 'geography', 'health_age_group'],
+        how='inner'
+    )
+    codes = merged_df['scenario_row'].to_numpy()
+    n_scenarios, n_rows = len(scenarios_df), len(merged_df)
+
+    incidence = as_compute(state_rates(merged_df, 'risk'), precision)
+    mortality = as_compute(state_rates(merged_df, 'death'), precision)
+    dalys = as_compute(state_rates(merged_df, 'daly'), precision)
+    cost_per_case = as_compute(merged_df['direct_cost_per_case'] + merged_df['indirect_cost_per_case'], precision)
+
+    # Everyone of a scenario dies of any of its diseases, and of other causes. Missing rates (e.g.
+    # of a disease of the other sex) leave their own outcomes blank without stopping the cohort
+    scenario_mortality = as_compute(group_sums(codes, np.nan_to_num(mortality).T, n_scenarios).T
+                                    + settings['background_mortality'], precision)
+
+    # Differences from the counterfactual in people alive (per scenario) and at risk (per row)
+    newly_active = as_compute(scenarios_df['newly_active_customers'], precision)
+    if 'newly_fairly_active_customers' in scenarios_df.columns:
+        newly_fairly_active = as_compute(scenarios_df['newly_fairly_active_customers'], precision)
+    else:
+        newly_fairly_active = np.zeros_like(newly_active)
+    alive = np.stack([newly_active, newly_fairly_active, -(newly_active + newly_fairly_active)], axis=1)
+    at_risk = np.take(alive, codes, axis=0)
+
+    # Rates of each phase: before the lag every state has the rates of the inactive state. People at
+    # risk of a disease survive a year without it or death, people alive a year without death
+    inactive = [COHORT_STATES.index('inactive')] * len(COHORT_STATES)
+    phases = []
+    for rates in [(incidence[:, inactive], mortality[:, inactive], dalys[:, inactive], scenario_mortality[:, inactive]),
+                  (incidence, mortality, dalys, scenario_mortality)]:
+        phase_incidence, phase_mortality, phase_dalys, phase_scenario_mortality = rates
+        phases.append((phase_incidence, phase_mortality, phase_dalys,
+                       1 - np.nan_to_num(phase_incidence) - np.take(phase_scenario_mortality, codes, axis=0),
+                       1 - phase_scenario_mortality))
+
+    outcomes = {column: np.empty((n_rows, horizon), dtype=dtype) for column in COHORT_COLUMNS}
+    people = np.empty((n_scenarios, len(COHORT_STATES), horizon), dtype=dtype)
+    for year in range(horizon):
+        year_incidence, year_mortality, year_dalys, at_risk_survival, alive_survival = phases[year >= lag]
+
+        people[:, :, year] = alive
+        alive_rows = np.take(alive, codes, axis=0)
+        outcomes['cases_saved'][:, year] = -np.einsum('rs,rs->r', at_risk, year_incidence)
+        outcomes['deaths_saved'][:, year] = -np.einsum('rs,rs->r', alive_rows, year_mortality)
+        outcomes['dalys_saved'][:, year] = -np.einsum('rs,rs->r', alive_rows, year_dalys)
+
+        at_risk = (at_risk * at_risk_survival) @ transitions
+        alive = (alive * alive_survival) @ transitions
+
+    outcomes['total_saving'] = outcomes['cases_saved'] * cost_per_case[:, None]
+
+    rows = merged_df[list(scenarios_df.columns.drop('health_age_group', errors='ignore')) + ['factor']].set_index(codes)
+    return rows, outcomes, people
+
+def summarise_cohorts(rows, outcomes, discount_rate=COHORT_SETTINGS['discount_rate'], precision=None):
+    """
+    Totals over the horizon of every scenario and disease (rows of simulate_cohorts), with the
+    present value of the savings ('pv_total_saving', year one discounted by one period).
+    """
+    horizon = outcomes['total_saving'].shape[1]
+    factors = discount_factors([discount_rate], horizon, precision)[0, 0]
+
+    summary = rows.reset_index(drop=True).assign(horizon=horizon)
+    for column in COHORT_COLUMNS:
+        summary[column] = outcomes[column].sum(axis=1, dtype=ACCUMULATOR)
+    summary['pv_total_saving'] = (outcomes['total_saving'] * factors).sum(axis=1, dtype=ACCUMULATOR)
+    return summary
+
+def cohort_yearly_table(rows, outcomes, people):
+    """
+    Year-by-year outcomes as a long table (rows of simulate_cohorts x year), with the difference
+    in people alive in every state of the scenario.
+    """
+    n_rows, horizon = outcomes['total_saving'].shape
+    scenario_rows = rows.index.to_numpy()
+
+    table = rows.iloc[np.repeat(np.arange(n_rows), horizon)].reset_index(drop=True)
+    table['year'] = np.tile(np.arange(1, horizon + 1), n_rows)
+    for position, state in enumerate(COHORT_STATES):
+        table[state] = people[scenario_rows, position, :].ravel()
+    for column in COHORT_COLUMNS:
+        table[column] = outcomes[column].ravel()
+    return table
@@ -0,0 +1,164 @@
+
+"""
+Consolidated SROI results.
+
+Elasticity scenarios, business outcomes, social change and health outcomes are combined into
+one long table with a row per (market, price, segment, value), where segment is the dimension
+(gender, age_group or income_level) and value its label (e.g. Female):
+
+- Business outcomes are matched to scenarios by scenario_id within their segment.
+- Social change is broadcast onto every price of its (market, segment, value); segments without a
+  social breakdown (income level) get the market-level social change.
+- Health outcomes are summed across diseases (and across genders for age group scenarios) for the
+  segments the health stage evaluates, with a per-disease table for drill-down.
+
+Every key is encoded as one integer (market, segment, value and price codes in mixed radix), so
+the joins are integer index lookups and broadcasting social change is an integer division.
+"""
+
+
+import numpy as np
+import pandas as pd
+
+KEY_COLUMNS = ['market', 'price', 'segment', 'value']
+
+# Order of the codes in the integer key; price is last so that key // number of prices
+# is the key of (market, segment, value)
+KEY_ORDER = ['market', 'segment', 'value', 'price']
+
+SCENARIO_COLUMNS = ['non-customers', '% yes', '% price_barrier', 'new_customers', 'change', 'newly_active_customers',
+                    'fairly change', 'newly_fairly_active_customers']
+
+BUSINESS_COLUMNS = ['economic_outcome_median_local', 'economic_outcome_median_$',
+                    'economic_outcome_avg_local', 'economic_outcome_avg_$']
+
+SOCIAL_COLUMNS = ['life_satisfaction_change', 'community_trust_change', 'social_change']
+
+HEALTH_COLUMNS = ['active_cases_saved', 'fairly_active_cases_saved', 'active_dalys_saved', 'active_deaths_saved',
+                  'direct_cost_saving', 'indirect_cost_saving', 'total_saving']
+
+def build_categories(scenarios):
+    """Sorted labels of every key column; a label's position is its code."""
+    categories = {column: pd.Index(sorted(scenarios[column].unique())) for column in ['market', 'segment', 'value']}
+    categories['price'] = pd.Index(sorted(scenarios['price'].unique(), key=lambda price: float(str(price).rstrip('%'))))
+    return categories
+
+def encode_keys(frame, categories, columns=KEY_ORDER):
+    """Integer key of every row over the given columns, -1 where a label is not in categories."""
+    keys = np.zeros(len(frame), dtype=np.int64)
+    valid = np.ones(len(frame), dtype=bool)
+
+    for column in columns:
+        codes = categories[column].get_indexer(frame[column])
+        valid &= codes >= 0
+        keys = keys * len(categories[column]) + codes
+
+    return np.where(valid, keys, -1)
+
+def stack_segments(tables, columns=None):
+    """
+    Stack per-segment tables into one, renaming each segment column to 'value'; columns, if given,
+    are the columns kept besides it.
+    """
+    return pd.concat([
+        (table if columns is None else table[[column for column in columns if column in table.columns] + [segment]])
+        .rename(columns={segment: 'value'})
+        .assign(segment=segment)
+        for segment, table in tables.items()
+    ], ignore_index=True)
+
+def scenario_rows(results, segment, scenario_ids):
+    """Row positions in results of the scenario_ids of one segment (-1 where missing)."""
+    segment_rows = np.flatnonzero(results['segment'].to_numpy() == segment)
+    positions = pd.Index(results['scenario_id'].to_numpy()[segment_rows]).get_indexer(scenario_ids)
+    return np.where(positions >= 0, segment_rows[positions], -1)
+
+def gather(values, rows):
+    """values[rows] as floats, NaN where rows is -1."""
+    gathered = np.asarray(values, dtype=float)[np.maximum(rows, 0)]
+    gathered[rows < 0] = np.nan
+    return gathered
+
+def consolidate_results(scenarios, business, social, health_df, market_social=None):
+    """
+    One row per (market, price, segment, value) with scenario, business, social and health outcomes.
+
+    scenarios and business: dicts of elasticity scenario and business outcome tables by segment
+    social: dict of social change tables by segment (segments may be missing)
+    health_df: health outcomes, one row per scenario and factor (and gender for age group scenarios),
+               with the scenario's segment in 'segment' (gender when missing)
+    market_social: market-level social change, used for segments missing from social
+
+    Returns the results table and the per-disease health table, both sorted by key.
+    """
+    results = stack_segments(scenarios, ['scenario_id', 'market', 'price'] + SCENARIO_COLUMNS)
+
+    categories = build_categories(results)
+    results['scenario_key'] = encode_keys(results, categories)
+    results = results.sort_values('scenario_key', kind='stable').reset_index(drop=True)
+    results = results.reindex(columns=['scenario_key', 'scenario_id'] + KEY_COLUMNS + SCENARIO_COLUMNS)
+
+    # Business outcomes: matched by scenario_id within each segment
+    business_values = {column: np.full(len(results), np.nan) for column in BUSINESS_COLUMNS}
+    for segment, table in business.items():
+        rows = scenario_rows(results, segment, table['scenario_id'])
+        matched = rows >= 0
+        for column in BUSINESS_COLUMNS:
+            business_values[column][rows[matched]] = table[column].to_numpy(dtype=float)[matched]
+    for column in BUSINESS_COLUMNS:
+        results[column] = business_values[column]
+
+    # Social change: broadcast onto every price of (market, segment, value)
+    n_prices = len(categories['price'])
+    group_keys = results['scenario_key'].to_numpy() // n_prices
+    social_level = np.full(len(results), None, dtype=object)
+
+    social_values = {column: np.full(len(results), np.nan) for column in SOCIAL_COLUMNS}
+    if social:
+        social_table = stack_segments(social, ['market'] + SOCIAL_COLUMNS)
+        social_keys = encode_keys(social_table, categories, ['market', 'segment', 'value'])
+        rows = pd.Index(social_keys).get_indexer(group_keys)
+        for column in SOCIAL_COLUMNS:
+            social_values[column] = gather(social_table[column], rows)
+        social_level[rows >= 0] = 'segment'
+
+    if market_social is not None:
+        market_codes = categories['market'].get_indexer(market_social['market'])
+        known = market_codes >= 0
+        market_keys = group_keys // (len(categories['segment']) * len(categories['value']))
+        rows = pd.Index(market_codes[known]).get_indexer(market_keys)
+        fallback = pd.isna(social_level) & (rows >= 0)
+        for column in SOCIAL_COLUMNS:
+            market_values = market_social[column].to_numpy(dtype=float)[known]
+            social_values[column][fallback] = market_values[rows[fallback]]
+        social_level[fallback] = 'market'
+
+    for column in SOCIAL_COLUMNS:
+        results[column] = social_values[column]
+
+    results['social_level'] = social_level
+
+    # Health outcomes: per disease drill-down, summed per scenario
+    health_segments = health_df['segment'].to_numpy() if 'segment' in health_df.columns else np.full(len(health_df), 'gender')
+    health_rows = np.full(len(health_df), -1)
+    for segment in pd.unique(health_segments):
+        in_segment = health_segments == segment
+        health_rows[in_segment] = scenario_rows(results, segment, health_df['scenario_id'].to_numpy()[in_segment])
+    matched = health_rows >= 0
+    health_rows = health_rows[matched]
+
+    by_disease = results.loc[health_rows, ['scenario_key', 'scenario_id'] + KEY_COLUMNS].reset_index(drop=True)
+    by_disease['gender'] = health_df['gender'].to_numpy()[matched]
+    by_disease['factor'] = health_df['factor'].to_numpy()[matched]
+
+    has_health = np.bincount(health_rows, minlength=len(results)) > 0
+    for column in HEALTH_COLUMNS:
+        values = health_df[column].to_numpy(dtype=float)[matched]
+        by_disease[column] = values
+        # Missing values (e.g. no cost per case for a disease) are skipped, as in a pandas sum
+        totals = np.bincount(health_rows, weights=np.nan_to_num(values), minlength=len(results))
+        results[column] = np.where(has_health, totals, np.nan)
+
+    by_disease = by_disease.sort_values('scenario_key', kind='stable').reset_index(drop=True)
+
+    return results, by_disease
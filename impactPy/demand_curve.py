@@ -0,0 +1,152 @@
+
+"""
+Demand curves over discount levels.
+
+The survey asks about five discounts (10, 20, 40, 60 and 80%). For every market and segment value
+the weighted share of "Yes" answers at those discounts is turned into a monotone piecewise-linear
+curve through (0%, 0), the five survey points and (100%, share at 80%), so that:
+
+- forward queries give the share of price-sensitive non-customers converting at any discount,
+  and from it new customers and newly active customers;
+- inverse queries give the smallest discount reaching a target share or number of new customers;
+- price_grid evaluates every curve on any list of discounts in the shape of calculate_elasticity,
+  so process_market_data (and the business and health stages after it) can run on that grid.
+
+The curve passes through the survey points, so at the survey discounts results are unchanged.
+All queries take arrays and are evaluated without Python loops.
+"""
+
+
+import numpy as np
+import pandas as pd
+
+from .mappings import DISCOUNTS
+
+SCENARIO_BY_PRICE = {float(price.rstrip('%')): scenario for scenario, price in DISCOUNTS.items()}
+
+CURVE_COLUMNS = ['% price_barrier', '% non_price_barrier', 'total_respondents']
+
+def price_to_discount(price):
+    return float(str(price).rstrip('%'))
+
+def discount_to_price(discount):
+    return f"{discount:g}%"
+
+class DemandCurve:
+    """Monotone share-of-yes curves for every (market, segment value) of one mode."""
+
+    def __init__(self, mode, keys, discounts, shares):
+        self.mode = mode
+        self.keys = keys.reset_index(drop=True)
+        self.discounts = np.asarray(discounts, dtype=float)
+        self.shares = np.asarray(shares, dtype=float)
+        self._index = pd.MultiIndex.from_arrays([self.keys['market'], self.keys[mode]])
+
+    @classmethod
+    def fit(cls, final_results, mode):
+        """Fit curves to the survey points of calculate_elasticity output."""
+        points = final_results.assign(discount=final_results['price'].map(price_to_discount))
+        shares = points.pivot_table(index=['market', mode], columns='discount', values='% yes', aggfunc='first', dropna=False)
+        keys = points.groupby(['market', mode], sort=True)[CURVE_COLUMNS].first().reindex(shares.index).reset_index()
+
+        survey_discounts = shares.columns.to_numpy(dtype=float)
+        if survey_discounts.min() <= 0 or survey_discounts.max() >= 100:
+            raise ValueError("Survey discounts must lie strictly between 0% and 100%")
+
+        # Cumulative "Yes" answers make the shares non-decreasing; enforce it against rounding
+        survey_shares = np.fmax.accumulate(shares.to_numpy(dtype=float), axis=1)
+
+        discounts = np.concatenate([[0.0], survey_discounts, [100.0]])
+        curve_shares = np.column_stack([np.zeros(len(keys)), survey_shares, survey_shares[:, -1]])
+
+        return cls(mode, keys, discounts, curve_shares)
+
+    def curve_index(self, markets, values):
+        markets, values = np.broadcast_arrays(np.asarray(markets, dtype=object), np.asarray(values, dtype=object))
+        index = self._index.get_indexer(pd.MultiIndex.from_arrays([markets.ravel(), values.ravel()]))
+        if (index < 0).any():
+            missing = list(zip(markets.ravel()[index < 0], values.ravel()[index < 0]))
+            raise ValueError(f"No demand curve for {missing[:5]}")
+        return index.reshape(markets.shape)
+
+    def share_yes(self, markets, values, discounts):
+        """Share of price-sensitive non-customers saying yes at each discount (given in %), broadcast over the inputs."""
+        curves, discounts = np.broadcast_arrays(self.curve_index(markets, values), np.asarray(discounts, dtype=float))
+        if ((discounts < 0) | (discounts > 100)).any():
+            raise ValueError("Discounts must be between 0% and 100%")
+
+        upper = np.clip(np.searchsorted(self.discounts, discounts, side='right'), 1, len(self.discounts) - 1)
+        x0, x1 = self.discounts[upper - 1], self.discounts[upper]
+        y0, y1 = self.shares[curves, upper - 1], self.shares[curves, upper]
+
+        return y0 + (discounts - x0) / (x1 - x0) * (y1 - y0)
+
+    def discount_for_share(self, markets, values, shares):
+        """Smallest discount (in %) reaching each target share; NaN where even 100% does not."""
+        curves, shares = np.broadcast_arrays(self.curve_index(markets, values), np.asarray(shares, dtype=float))
+        rows = self.shares[curves]
+
+        # First knot at or above the target
+        upper = (rows < shares[..., None]).sum(axis=-1)
+        reachable = (upper < len(self.discounts)) & ~np.isnan(rows[..., -1]) & ~np.isnan(shares)
+        upper = np.clip(upper, 1, len(self.discounts) - 1)
+
+        x0, x1 = self.discounts[upper - 1], self.discounts[upper]
+        y0 = np.take_along_axis(rows, (upper - 1)[..., None], axis=-1)[..., 0]
+        y1 = np.take_along_axis(rows, upper[..., None], axis=-1)[..., 0]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            discounts = np.where(shares <= 0, 0.0, x0 + (shares - y0) / (y1 - y0) * (x1 - x0))
+
+        return np.where(reachable, discounts, np.nan)
+
+    def price_grid(self, discounts):
+        """Every curve evaluated at every discount, with the columns of calculate_elasticity."""
+        discounts = np.asarray(discounts, dtype=float)
+        n_curves = len(self.keys)
+
+        grid = self.keys.iloc[np.tile(np.arange(n_curves), len(discounts))].reset_index(drop=True)
+        grid_discounts = np.repeat(discounts, n_curves)
+        grid['% yes'] = self.share_yes(grid['market'].to_numpy(), grid[self.mode].to_numpy(), grid_discounts)
+        grid['price'] = [discount_to_price(discount) for discount in grid_discounts]
+        grid['scenario'] = [SCENARIO_BY_PRICE.get(discount, f"curve_{discount:g}") for discount in grid_discounts]
+
+        return grid[['scenario', 'market', self.mode, 'price', '% yes'] + CURVE_COLUMNS]
+
+def curve_market_data(curve, market_data):
+    """Non-customers and activity changes of every curve, in curve order."""
+    merge_cols = ['market', curve.mode]
+    data = curve.keys[merge_cols + ['% price_barrier']].merge(
+        market_data[curve.mode]['penetration'][merge_cols + ['non-customers']], on=merge_cols, how='left'
+    ).merge(
+        market_data[curve.mode]['activity'][merge_cols + ['change', 'fairly change']], on=merge_cols, how='left'
+    )
+    return data
+
+def predict_customers(curve, market_data, markets, values, discounts):
+    """New, newly active and newly fairly active customers at each (market, value, discount), as in process_market_data."""
+    data = curve_market_data(curve, market_data)
+    curves, discounts = np.broadcast_arrays(curve.curve_index(markets, values), np.asarray(discounts, dtype=float))
+
+    new_customers = (data['non-customers'].to_numpy()[curves] * curve.share_yes(markets, values, discounts)
+                     * data['% price_barrier'].to_numpy()[curves])
+
+    return pd.DataFrame({
+        'market': curve.keys['market'].to_numpy()[curves].ravel(),
+        curve.mode: curve.keys[curve.mode].to_numpy()[curves].ravel(),
+        'price': [discount_to_price(discount) for discount in discounts.ravel()],
+        'new_customers': new_customers.ravel(),
+        'newly_active_customers': (new_customers * data['change'].to_numpy()[curves]).ravel(),
+        'newly_fairly_active_customers': (new_customers * data['fairly change'].to_numpy()[curves]).ravel()
+    })
+
+def discount_for_customers(curve, market_data, markets, values, new_customers):
+    """Smallest discount (in %) that brings each target number of new customers; NaN if unreachable."""
+    data = curve_market_data(curve, market_data)
+    curves = curve.curve_index(markets, values)
+    scale = data['non-customers'].to_numpy()[curves] * data['% price_barrier'].to_numpy()[curves]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = np.asarray(new_customers, dtype=float) / scale
+
+    return curve.discount_for_share(markets, values, shares)
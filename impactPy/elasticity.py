@@ -0,0 +1,297 @@
+
+"""
+Price Elasticity Model: Analysis for Non-Customers Across 5 Pricing Tiers and 10 Markets
+
+- Focus on non-customers (dSEGMENT == 2).
+- Define 5 pricing scenarios (10%, 20%, 40%, 60%, 80% discount).
+- Apply cumulative response logic: "Yes" for a lower price implies "Yes" for all higher discounts.
+- Calculate weighted "Yes" responses for each pricing scenario, segmented by market and gender, age group or
+  income level, using survey weights.
+- Merge results with urban population data to estimate potential new customers.
+- Other discounts are read off a monotone demand curve through the survey points (see demand_curve).
+
+Calculations are focused only on non-customers who identify price as a barrier.
+"""
+
+
+import numpy as np
+import pandas as pd
+
+from .demand_curve import DemandCurve
+from .mappings import SCENARIOS, DISCOUNTS
+from .kernels import group_sums
+from .precision import as_compute
+
+# Configuration for each mode
+MODE_CONFIGS = {
+    'gender': {
+        'group_cols': ['market', 'gender'],
+        'filter_col': 'gender',
+        'valid_values': ["Female", "Male"]
+    },
+    'age_group': {
+        'group_cols': ['market', 'age_group'],
+        'filter_col': 'age_group',
+        'valid_values': ["Young Adults (16-35)", "Old Adults (>35)"]
+    },
+    'income_level': {
+        'group_cols': ['market', 'income_level'],
+        'filter_col': 'income_level',
+        'valid_values': ["Low", "Middle", "High"]
+    }
+}
+
+# Respondent counts and weighted sums of every group behind the elasticity rates: all weights, weights
+# of respondents who do and don't name price as a barrier, and weighted yes responses of the former
+ELASTICITY_SUM_COLUMNS = (['respondents', 'WEIGHT', 'price_barrier_weight', 'non_price_barrier_weight']
+                          + [f'weighted_yes_{scenario}' for scenario in SCENARIOS])
+
+# Tables returned by calculate_survey_rates
+SURVEY_RATE_TABLES = ['age_proportions', 'gender_age_proportions'] + list(MODE_CONFIGS)
+
+def select_non_customers(df):
+    # Only non customers respond to price discounts
+    return df[df.dSEGMENT == 2].copy()
+
+def calculate_age_group_proportions(df):
+    # Create age group versions
+    age_group_stats = df.groupby(['market', 'age_group']).agg({
+        'WEIGHT': 'sum'
+    }).reset_index()
+
+    # Calculate total weight per market for age groups
+    market_totals = age_group_stats.groupby('market')['WEIGHT'].sum().reset_index()
+    age_group_stats = age_group_stats.merge(market_totals, on='market', suffixes=('', '_total'))
+    age_group_stats['proportion'] = age_group_stats['WEIGHT'] / age_group_stats['WEIGHT_total']
+
+    return age_group_stats
+
+def calculate_gender_proportions(df, group_column='age_group', genders=MODE_CONFIGS['gender']['valid_values']):
+    """Weighted share of each gender among the (market, group) non-customers, used to split group scenarios by gender."""
+    gender_stats = df[df['gender'].isin(genders)].groupby(['market', group_column, 'gender'])['WEIGHT'].sum().reset_index()
+    gender_stats['proportion'] = gender_stats['WEIGHT'] / gender_stats.groupby(['market', group_column])['WEIGHT'].transform('sum')
+
+    return gender_stats
+
+def with_fairly_change(activity_summary):
+    """Activity summary with a 'fairly change' column; summaries saved before the fairly active tier get no change."""
+    if 'fairly change' in activity_summary.columns:
+        return activity_summary
+    print("Activity summary has no fairly active tier; assuming no change in fairly active customers")
+    return activity_summary.assign(**{'fairly change': 0.0})
+
+def prepare_market_data(age_group_stats, market_penetration_gender, market_penetration_age,
+                        activity_summarised_gender, activity_summarised_age,
+                        market_penetration_income=None, activity_summarised_income=None):
+    activity_summarised_gender = with_fairly_change(activity_summarised_gender)
+    activity_summarised_age = with_fairly_change(activity_summarised_age)
+
+    # Prepare age group market penetration
+    age_penetration = []
+
+    for market in market_penetration_age['market'].unique():
+        market_row = market_penetration_age[market_penetration_age['market'] == market].iloc[0]
+        market_stats = age_group_stats[age_group_stats['market'] == market]
+
+        for _, age_stat in market_stats.iterrows():
+            age_penetration.append({
+                'market': market,
+                'age_group': age_stat['age_group'],
+                'non-customers': market_row['non-customers'] * age_stat['proportion']
+            })
+
+    age_penetration_df = pd.DataFrame(age_penetration)
+
+    # Prepare gender market penetration
+    gender_penetration_df = market_penetration_gender[['market', 'gender', 'non-customers']].copy()
+
+    # Process activity data for age groups using actual age group data
+    age_activity = []
+    for market in activity_summarised_age['market'].unique():
+        market_rows = activity_summarised_age[activity_summarised_age['market'] == market]
+        market_stats = age_group_stats[age_group_stats['market'] == market]
+
+        for _, age_stat in market_stats.iterrows():
+            matching_row = market_rows[market_rows['age_group'] == age_stat['age_group']]
+            if not matching_row.empty:
+                change = matching_row['change'].iloc[0]
+                fairly_change = matching_row['fairly change'].iloc[0]
+            else:
+                change = market_rows['change'].mean()
+                fairly_change = market_rows['fairly change'].mean()
+
+            age_activity.append({
+                'market': market,
+                'age_group': age_stat['age_group'],
+                'change': change,
+                'fairly change': fairly_change
+            })
+
+    age_activity_df = pd.DataFrame(age_activity)
+
+    # Also need to ensure gender activity data has required columns
+    gender_activity = activity_summarised_gender[['market', 'gender', 'change', 'fairly change']].copy()
+
+    market_data = {
+        'gender': {
+            'penetration': gender_penetration_df,
+            'activity': gender_activity
+        },
+        'age_group': {
+            'penetration': age_penetration_df,
+            'activity': age_activity_df
+        }
+    }
+
+    if market_penetration_income is not None and activity_summarised_income is not None:
+        market_data['income_level'] = {
+            'penetration': market_penetration_income,
+            'activity': with_fairly_change(activity_summarised_income)
+        }
+
+    return market_data
+
+def calculate_elasticity(df, group_cols, filter_col, valid_values, precision=None, backend=None):
+    """
+    Weighted share of yes responses of every (group_cols) group in every price scenario, among
+    non-customers who name price as a barrier, with the weighted share of those who do and don't.
+
+    Yes responses are cumulative over the scenarios (a yes at a lower discount is a yes at every
+    higher one). The weighted responses are one respondents x scenarios array in the compute
+    precision (see impactPy.precision), summed per group in float64 by the group_sums kernel
+    (see impactPy.kernels).
+    """
+    grouped = df.groupby(group_cols)
+    groups = grouped.size().index.to_frame(index=False)
+    codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    n_groups = len(groups)
+
+    # Only consider responses where price is a barrier (Section_B_Q13r5 is not empty)
+    weights = as_compute(df['WEIGHT'], precision)
+    price_barrier = df['Section_B_Q13r5'].notna().to_numpy()
+    barrier_weights = np.where(price_barrier, weights, weights.dtype.type(0))
+
+    # Apply cumulative logic
+    yes = np.logical_or.accumulate((df[SCENARIOS] == 1).to_numpy().T, axis=0)
+    weighted_yes = yes * barrier_weights
+
+    weight_sums = group_sums(codes, np.stack([weights, barrier_weights, np.where(price_barrier, 0, weights)]), n_groups, backend)
+    sums = pd.DataFrame(
+        dict(zip(ELASTICITY_SUM_COLUMNS, [np.bincount(codes[codes >= 0], minlength=n_groups), *weight_sums,
+                                          *group_sums(codes, weighted_yes, n_groups, backend)])),
+        index=pd.MultiIndex.from_frame(groups)
+    )
+    return elasticity_from_sums(sums, filter_col, valid_values)
+
+def elasticity_from_sums(sums, filter_col, valid_values):
+    """
+    Elasticity rates (as calculate_elasticity) of the respondent counts and weighted sums
+    (ELASTICITY_SUM_COLUMNS) of every group, indexed by the group columns: as summed by
+    calculate_elasticity or merged from survey waves (see impactPy.waves).
+    """
+    groups = sums.index.to_frame(index=False)
+    group_cols = list(groups.columns)
+    price_barrier_weight = sums['price_barrier_weight'].to_numpy()
+    total_weight = sums['WEIGHT'].to_numpy()
+
+    results = []
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for scenario in SCENARIOS:
+            weighted_sums = groups.assign(
+                scenario=scenario,
+                price=DISCOUNTS[scenario],
+                **{'% yes': sums[f'weighted_yes_{scenario}'].to_numpy() / price_barrier_weight,
+                   '% price_barrier': price_barrier_weight / total_weight,
+                   '% non_price_barrier': sums['non_price_barrier_weight'].to_numpy() / total_weight,
+                   'total_respondents': sums['respondents'].to_numpy()}
+            )
+            results.append(weighted_sums[['scenario'] + group_cols + ['price', '% yes', '% price_barrier', '% non_price_barrier', 'total_respondents']])
+
+    final_results = pd.concat(results, ignore_index=True)
+    final_results = final_results[final_results[filter_col].isin(valid_values)]
+
+    return final_results
+
+def calculate_survey_rates(df, modes=MODE_CONFIGS, precision=None):
+    """Survey-derived rates for every mode plus the age group (and gender within age group) proportions of non-customers."""
+    non_customers = select_non_customers(df)
+
+    rates = {
+        'age_proportions': calculate_age_group_proportions(non_customers),
+        'gender_age_proportions': calculate_gender_proportions(non_customers, 'age_group')
+    }
+    for mode, config in modes.items():
+        rates[mode] = calculate_elasticity(
+            non_customers,
+            config['group_cols'],
+            config['filter_col'],
+            config['valid_values'],
+            precision
+        )
+    return rates
+
+def create_scenario_id(row, mode):
+    if mode == 'gender':
+        segment = row['gender'][0]
+    elif mode == 'age_group':
+        segment = 'Y' if 'Young' in row[mode] else 'O'
+    else:
+        segment = row[mode][0].upper()
+    return f"{row['market'][:3].upper()}{row['price'].rstrip('%')}{segment}"
+
+def process_market_data(final_results, mode, market_data, discounts=None):
+    merge_cols = ['market', mode]
+
+    # Evaluate any other price grid on the demand curves through the survey points
+    if discounts is not None:
+        final_results = DemandCurve.fit(final_results, mode).price_grid(discounts)
+
+    # Get the appropriate market data based on mode
+    penetration_data = market_data[mode]['penetration']
+    activity_data = market_data[mode]['activity']
+
+    # Merge the dataframes
+    merged_df = pd.merge(
+        final_results,
+        penetration_data[merge_cols + ['non-customers']],
+        on=merge_cols,
+        how='left'
+    )
+
+    merged_df = pd.merge(
+        merged_df,
+        activity_data[merge_cols + ['change', 'fairly change']],
+        on=merge_cols,
+        how='left'
+    )
+
+    # Calculate metrics
+    merged_df['new_customers'] = merged_df['non-customers'] * merged_df['% yes'] * merged_df['% price_barrier']
+    merged_df['newly_active_customers'] = merged_df['new_customers'] * merged_df['change']
+    merged_df['newly_fairly_active_customers'] = merged_df['new_customers'] * merged_df['fairly change']
+
+    # Create scenario ID
+    merged_df['scenario_id'] = merged_df.apply(create_scenario_id, axis=1, mode=mode)
+
+    # Remove duplicates if any exist
+    merged_df = merged_df.drop_duplicates()
+
+    # Select final columns
+    final_df = merged_df[[
+        'scenario_id',
+        'scenario',
+        'market',
+        'price',
+        mode,
+        'non-customers',
+        '% yes',
+        '% price_barrier',
+        '% non_price_barrier',
+        'new_customers',
+        'change',
+        'newly_active_customers',
+        'fairly change',
+        'newly_fairly_active_customers'
+    ]]
+
+    return final_df
@@ -0,0 +1,431 @@
+
+"""
+Numerical equivalence harness.
+
+Every optimised engine has to reproduce today's numbers. For each target the frozen reference
+implementation (impactPy.reference) and every candidate (the live function, and any faster engine
+registered next to it) run on the same cases, real inputs when the data files are present and
+synthetic inputs built to hit the edge cases:
+
+    activity_levels      calculate_activity_levels: invalid and missing codes, walks of exactly 10 minutes
+    weighted_median      weighted_median: exact weighted midpoints, a dominant weight, ties, one value
+    spending_summary     calculate_spending_summary: equal weights (exact midpoints in every group)
+    elasticity           calculate_elasticity: a group where nobody names price as a barrier
+    adjusted_risk_rates  calculate_adjusted_risk_rates: two and three tiers, relative risks of 1
+    health_outcomes      find_health_outcomes: adult and youth, negative fairly active changes
+    cost_adjustment      adjust_market_costs: missing base years, CPI and expenditure, osteoporosis
+
+Outputs are compared column by column: numbers within rtol/atol (NaN equal to NaN), relative to
+each value or, for lower precision candidates, to the largest value of the column; everything
+else exactly. A case where the reference refuses its inputs names the exception both sides must
+raise; any other exception fails the comparison. Engines with kernels (impactPy.kernels) are
+checked on every installed backend. Each comparison also times both sides (best of a few runs
+after a warm-up call), so the report gives a correctness and performance verdict per (target,
+candidate, case).
+
+Run with python -m impactPy.equivalence from the repository root; mismatches raise AssertionError.
+"""
+
+
+import argparse
+import contextlib
+import io
+import os
+import time
+import warnings
+from functools import lru_cache, partial
+
+import numpy as np
+import pandas as pd
+
+from . import reference
+from .activity import ACTIVITY_QUESTIONS, calculate_activity_levels, calculate_spending_summary, weighted_median
+from .elasticity import MODE_CONFIGS, calculate_elasticity, select_non_customers
+from .health_functions import (HEALTH_LISTS, HEALTH_PARAMETERS, HEALTH_SOURCES, calculate_adjusted_risk_rates, find_health_outcomes,
+                               load_health_tables, parameter_values, resolve_health_parameters)
+from .kernels import available_backends
+from .mappings import GENDER_MAPPING, MARKET_MAPPING, SCENARIOS
+from .precision import FLOAT32_TOLERANCES
+from .survey import SURVEY_PATH, SURVEY_SHEET, load_survey, process_data
+from .updated_adjusted_cost import adjust_market_costs
+
+TOLERANCES = {'rtol': 1e-9, 'atol': 1e-12}
+
+REPORT_COLUMNS = ['target', 'candidate', 'case', 'passed', 'max_abs_diff', 'max_rel_diff',
+                  'reference_ms', 'candidate_ms', 'speedup', 'detail']
+
+COST_INPUTS = {
+    'costs': 'data/inputs/cost_per_case.csv',
+    'cpi': 'data/inputs/cpi.csv',
+    'expenditure': 'data/inputs/predicted_healthcare_expenditure.xlsx',
+    'income_adjustment': 'data/inputs/income_adjustment_factor.xlsx'
+}
+
+# Comparison
+
+def _columns(output):
+    """Labelled 1-d arrays of an output (DataFrame, Series, array, tuple or scalar)."""
+    if isinstance(output, pd.DataFrame):
+        return [(str(column), output[column].to_numpy()) for column in output.columns]
+    if isinstance(output, pd.Series):
+        return [(str(output.name), output.to_numpy())]
+    if isinstance(output, tuple):
+        return [(f'{position}.{label}', values) for position, item in enumerate(output) for label, values in _columns(item)]
+    return [('value', np.atleast_1d(np.asarray(output)))]
+
+def compare_outputs(expected, actual, rtol=TOLERANCES['rtol'], atol=TOLERANCES['atol'], scale='element'):
+    """
+    Largest absolute and relative differences between two outputs, and the first mismatch (None if equivalent).
+
+    Differences are relative to each value (scale='element'), or to the largest absolute value of
+    its column (scale='column'), for lower precision outputs that are differences of large numbers.
+    """
+    if scale not in ('element', 'column'):
+        raise ValueError(f"Unknown scale '{scale}', expected 'element' or 'column'")
+    expected_columns, actual_columns = _columns(expected), _columns(actual)
+    if [label for label, _ in expected_columns] != [label for label, _ in actual_columns]:
+        return np.nan, np.nan, (f"columns differ: {[label for label, _ in expected_columns]} != "
+                                f"{[label for label, _ in actual_columns]}")
+
+    max_abs, max_rel, mismatch = 0.0, 0.0, None
+    for (label, left), (_, right) in zip(expected_columns, actual_columns):
+        if left.shape != right.shape:
+            return np.nan, np.nan, f"{label}: shape {left.shape} != {right.shape}"
+
+        if left.dtype.kind in 'biuf' and right.dtype.kind in 'biuf':
+            left, right = left.astype(float), right.astype(float)
+            both_nan = np.isnan(left) & np.isnan(right)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                difference = np.where(both_nan | (left == right), 0.0, np.abs(left - right))
+                if scale == 'column':
+                    finite = np.abs(left[np.isfinite(left)])
+                    magnitude = np.full(left.shape, finite.max() if finite.size else 0.0)
+                else:
+                    magnitude = np.maximum(np.abs(left), np.abs(right))
+                relative = np.where(difference > 0, difference / magnitude, 0.0)
+            if difference.size:
+                max_abs = max(max_abs, float(np.nanmax(np.where(np.isnan(difference), np.inf, difference))))
+                max_rel = max(max_rel, float(np.nanmax(np.where(np.isnan(relative), np.inf, relative))))
+            if scale == 'column':
+                failing = ~(both_nan | (difference <= atol + rtol * magnitude))
+            else:
+                failing = ~(both_nan | np.isclose(left, right, rtol=rtol, atol=atol))
+        else:
+            failing = ~((pd.isna(left) & pd.isna(right)) | (left == right))
+
+        if mismatch is None and failing.any():
+            row = int(np.flatnonzero(failing)[0])
+            mismatch = f"{label}[{row}]: {left[row]!r} != {right[row]!r} ({int(failing.sum())} values)"
+
+    return max_abs, max_rel, mismatch
+
+def timed(function, args, kwargs, repeats):
+    """
+    Result of one call (the warm-up) and the best time in ms of repeats more. An exception raised
+    by the call is returned as the result (see error_mismatch).
+    """
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter('ignore', pd.errors.PerformanceWarning)
+        try:
+            result = function(*args, **kwargs)
+        except Exception as e:
+            return e, np.nan
+
+        best = np.inf
+        for _ in range(repeats):
+            start = time.perf_counter()
+            function(*args, **kwargs)
+            best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+def error_mismatch(expected, actual, error=None):
+    """
+    Mismatch of a comparison where either side raised (None if none). It passes only when the case
+    expects an error (an exception class) and both sides raise it; any other exception fails.
+    """
+    def outcome(result):
+        return repr(result) if isinstance(result, Exception) else 'a result'
+
+    if error is None:
+        return f"unexpected error: reference gave {outcome(expected)}, candidate {outcome(actual)}"
+    if isinstance(expected, error) and isinstance(actual, error):
+        return None
+    return (f"expected both to raise {error.__name__}: reference gave {outcome(expected)}, "
+            f"candidate {outcome(actual)}")
+
+# Cases
+
+def synthetic_survey(n=2000, seed=0):
+    """Survey-shaped respondents covering every code, missing answers and the documented edge cases."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'S1': rng.choice(list(MARKET_MAPPING), n),
+        'dSEGMENT': rng.choice([1, 2], n),
+        'uuid': np.arange(n),
+        'WEIGHT': rng.uniform(0.2, 3.0, n),
+        'S4': rng.choice([1, 2, 3], n),
+        'dS3_RECODE': rng.choice([2, 3, 4, 5, 6, 7], n)
+    })
+
+    for questions in ACTIVITY_QUESTIONS.values():
+        for item, column in questions.items():
+            if item.endswith('_freq'):
+                values = rng.choice([0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, np.nan], n)
+            elif item.endswith('_intensity'):
+                values = rng.choice([1, 2, 3, 4, np.nan], n)
+            else:
+                # Durations around the 10 minute walking threshold, and missing
+                values = rng.choice([0, 5, 9, 10, 11, 30, 45, 60, 90, np.nan], n)
+            df[column] = values
+
+    for scenario in SCENARIOS:
+        df[scenario] = rng.choice([1, 2, np.nan], n, p=[0.3, 0.6, 0.1])
+    df['Section_B_Q13r5'] = np.where(rng.random(n) < 0.5, 1.0, np.nan)
+
+    # Nobody in the first market names price as a barrier
+    df.loc[df['S1'] == 1, 'Section_B_Q13r5'] = np.nan
+    df['gender'] = df['S4'].map(GENDER_MAPPING)
+    df['market'] = df['S1'].map(MARKET_MAPPING)
+    df['age_group'] = np.where(df['dS3_RECODE'] <= 3, 'Young Adults (16-35)', 'Old Adults (>35)')
+    df['income_level'] = rng.choice(['Low', 'Middle', 'High', 'Prefer not to answer'], n)
+
+    # Monthly spend in whole amounts, so that groups have tied values
+    df['Q2r1'] = rng.choice([0, 10, 25, 40, 50, 75, 100, 150, 300], n)
+    return df
+
+def activity_cases(survey_df=None):
+    cases = {'synthetic': ((synthetic_survey(),), {})}
+    if survey_df is not None:
+        cases['survey'] = ((survey_df,), {})
+    return cases
+
+def weighted_median_cases(survey_df=None):
+    rng = np.random.default_rng(1)
+    cases = {
+        'exact midpoint': (([1, 2, 3, 4], [1, 1, 1, 1]), {}),
+        'exact midpoint unequal': (([10, 20, 30], [2, 1, 1]), {}),
+        'dominant weight': (([5, 1, 9], [1, 10, 1]), {}),
+        'unsorted ties': (([3, 1, 3, 2, 1], [0.5, 1.5, 0.5, 1.0, 0.5]), {}),
+        # The reference raises on a single value; candidates must too
+        'single value': (([7.5], [2.0]), {}, TypeError),
+        'random': ((rng.integers(0, 200, 999), rng.uniform(0.1, 3, 999)), {})
+    }
+    if survey_df is not None and 'Q2r1' in survey_df.columns:
+        customers = survey_df[(survey_df['dSEGMENT'] == 1) & survey_df['Q2r1'].notna()]
+        for market, group in customers.groupby('S1'):
+            cases[f'survey {MARKET_MAPPING.get(market, market)}'] = ((group['Q2r1'], group['WEIGHT']), {})
+    return cases
+
+def spending_cases(survey_df=None):
+    synthetic = synthetic_survey()
+    frames = {'synthetic': synthetic, 'equal weights': synthetic.assign(WEIGHT=1.0)}
+    if survey_df is not None and 'Q2r1' in survey_df.columns:
+        frames['survey'] = process_data(survey_df)
+
+    cases = {}
+    for source, df in frames.items():
+        # Customers as in create_spending_summaries
+        customers = df[(df['dSEGMENT'] == 1) & df['gender'].isin(['Male', 'Female'])]
+        for group in ['gender', 'age_group', 'income_level']:
+            cases[f'{source} {group}'] = ((customers, ['market', group]), {})
+    return cases
+
+def elasticity_cases(survey_df=None):
+    cases = {}
+    frames = {'synthetic': select_non_customers(synthetic_survey())}
+    if survey_df is not None:
+        frames['survey'] = select_non_customers(process_data(survey_df))
+    for source, df in frames.items():
+        for mode, config in MODE_CONFIGS.items():
+            cases[f'{source} {mode}'] = ((df, config['group_cols'], config['filter_col'], config['valid_values']), {})
+    return cases
+
+def adjusted_risk_rates_cases(survey_df=None):
+    rng = np.random.default_rng(2)
+    n = 10000
+    population_risk, active_rate = rng.uniform(1e-4, 0.05, n), rng.uniform(0.05, 0.7, n)
+    fairly_rate = rng.uniform(0, 0.25, n)
+    relative_risk, fairly_relative_risk = rng.uniform(1, 2, n), rng.uniform(1, 1.5, n)
+    relative_risk[:100] = 1.0
+    return {
+        'two tiers': ((population_risk, active_rate, relative_risk), {}),
+        'three tiers': ((population_risk, active_rate, relative_risk, fairly_rate, fairly_relative_risk), {}),
+        'scalars': ((0.01, 0.4, 1.3, 0.1, 1.1), {})
+    }
+
+@lru_cache(maxsize=None)
+def _health_parameters(gender, geography, age_group):
+    keys = pd.DataFrame({'factor': HEALTH_LISTS[age_group], 'gender': gender, 'geography': geography, 'age_group': age_group})
+    resolution = resolve_health_parameters(load_health_tables(), keys, report=False)
+
+    # Missing required parameters stop the health stage, as in calculate_risk_table
+    required = [parameter for parameter, spec in HEALTH_PARAMETERS.items() if 'default' not in spec]
+    if resolution.loc[resolution['parameter'].isin(required), 'source_row'].isna().any():
+        raise ValueError(f"Missing health parameters for {gender}, {geography}, {age_group}")
+    return keys.merge(parameter_values(resolution), on=list(keys.columns), how='left')
+
+def reference_health_outcomes(additional_active, additional_fairly_active, youth=False, gender='female', geography='global'):
+    """find_health_outcomes on the frozen arithmetic, with the parameters resolved as the health stage does."""
+    parameters = _health_parameters(gender, geography, 'youth' if youth else 'adult')
+    return reference.health_outcomes(parameters, additional_active, 0 if youth else additional_fairly_active)
+
+def health_outcomes_cases(survey_df=None):
+    if not all(os.path.exists(path) for path in HEALTH_SOURCES.values()):
+        return {}
+    return {
+        'adult female Spain': ((125000.0, 40000.0), {'gender': 'female', 'geography': 'Spain'}),
+        'adult male Japan negative fairly': ((98000.0, -25000.0), {'gender': 'male', 'geography': 'Japan'}),
+        'youth female england': ((50000.0, 0.0), {'youth': True, 'gender': 'female', 'geography': 'england'}),
+        # No youth activity levels outside England: both sides must refuse
+        'youth female Canada': ((50000.0, 0.0), {'youth': True, 'gender': 'female', 'geography': 'Canada'}, ValueError),
+        'no change': ((0.0, 0.0), {'gender': 'male', 'geography': 'Australia'})
+    }
+
+def synthetic_costs():
+    factors = ['stroke', 'osteoporosis', 'depression', 'colon cancer']
+    costs = pd.DataFrame([(factor, 'adult', 'all', direct, base_year, 1000.0 * (position + 1))
+                          for position, factor in enumerate(factors)
+                          for direct in (True, False) for base_year in (2015, 2019, np.nan)],
+                         columns=['factor', 'age_group', 'gender', 'direct', 'base_year', 'cost_per_case_unflated'])
+    costs['cost_per_case'] = costs['cost_per_case_unflated'] * 1.7
+    costs['forex_rate'] = 1.7
+    cpi = pd.DataFrame({'2015': [100.0, 90.0], '2019': [110.0, np.nan], '2024': [130.0, 120.0]}, index=['Spain', 'Japan'])
+    expenditure = pd.DataFrame({'Country Name': ['Spain'], '2024': [0.56]})
+    uk = pd.DataFrame({'Country Name': ['Spain', 'Japan'], 'income_adjustment_factor': [0.8, 1.1]})
+    usa = pd.DataFrame({'Country Name': ['Spain'], 'income_adjustment_factor': [0.4]})
+    return costs, cpi, expenditure, uk, usa
+
+def cost_adjustment_cases(survey_df=None):
+    costs, cpi, expenditure, uk, usa = synthetic_costs()
+    cases = {
+        # Japan has no 2019 CPI, no expenditure forecast and no USA income factor
+        f'synthetic {market}': ((costs, market, cpi, expenditure, uk, usa), {}) for market in ['Spain', 'Japan', 'Ireland']
+    }
+
+    if all(os.path.exists(path) for path in COST_INPUTS.values()):
+        from .updated_adjusted_cost import read_cpi_data, read_income_adjustment_factor
+
+        real = pd.read_csv(COST_INPUTS['costs'])
+        real = real[(real['age_group'] == 'adult') & (real['category'] == 'health')].copy()
+        # A fixed exchange rate stands in for the online rates, which do not affect the adjustment
+        real['forex_rate'] = 1.5
+        real['cost_per_case'] = real['cost_per_case_unflated'] * real['forex_rate']
+        cpi, expenditure = read_cpi_data(COST_INPUTS['cpi']), pd.read_excel(COST_INPUTS['expenditure'])
+        uk, usa = read_income_adjustment_factor(COST_INPUTS['income_adjustment'])
+        for market in ['Spain', 'Japan', 'America']:
+            cases[f'inputs {market}'] = ((real, market, cpi, expenditure, uk, usa), {})
+    return cases
+
+def kernel_candidates(function):
+    """Candidates running function on every installed kernel backend."""
+    return {backend: partial(function, backend=backend) for backend in available_backends()}
+
+# Targets: the frozen reference and the candidates that must reproduce it. Faster engines are
+# registered as further candidates, with their own tolerances if they compute in lower precision
+TARGETS = {
+    'activity_levels': {
+        'reference': reference.calculate_activity_levels,
+        'candidates': {'current': calculate_activity_levels,
+                       'float32': partial(calculate_activity_levels, precision='float32'),
+                       **kernel_candidates(calculate_activity_levels)},
+        'cases': activity_cases,
+        'tolerances': {'float32': FLOAT32_TOLERANCES}
+    },
+    'weighted_median': {
+        'reference': reference.weighted_median,
+        'candidates': {'current': weighted_median},
+        'cases': weighted_median_cases
+    },
+    'spending_summary': {
+        'reference': reference.calculate_spending_summary,
+        'candidates': {'current': calculate_spending_summary, **kernel_candidates(calculate_spending_summary)},
+        'cases': spending_cases
+    },
+    'elasticity': {
+        'reference': reference.calculate_elasticity,
+        'candidates': {'current': calculate_elasticity,
+                       'float32': partial(calculate_elasticity, precision='float32'),
+                       **kernel_candidates(calculate_elasticity)},
+        'cases': elasticity_cases,
+        'tolerances': {'float32': FLOAT32_TOLERANCES}
+    },
+    'adjusted_risk_rates': {
+        'reference': reference.calculate_adjusted_risk_rates,
+        'candidates': {'current': calculate_adjusted_risk_rates},
+        'cases': adjusted_risk_rates_cases
+    },
+    'health_outcomes': {
+        'reference': reference_health_outcomes,
+        'candidates': {'current': find_health_outcomes,
+                       'float32': partial(find_health_outcomes, precision='float32')},
+        'cases': health_outcomes_cases,
+        'tolerances': {'float32': FLOAT32_TOLERANCES}
+    },
+    'cost_adjustment': {
+        'reference': reference.adjust_market_costs,
+        'candidates': {'current': adjust_market_costs},
+        'cases': cost_adjustment_cases
+    }
+}
+
+def run_equivalence(targets=None, survey_df=None, repeats=3, tolerances=TOLERANCES):
+    """
+    Report (REPORT_COLUMNS) of every candidate of every target against its reference on every case.
+
+    targets: names of TARGETS to run (all by default)
+    survey_df: the survey as loaded, for the real-input cases (synthetic cases only when None)
+    """
+    rows = []
+    for name in targets or list(TARGETS):
+        target = TARGETS[name]
+        for case, (args, kwargs, *error) in target['cases'](survey_df).items():
+            # A case may name the exception both sides must raise
+            error = error[0] if error else None
+            expected, reference_ms = timed(target['reference'], args, kwargs, repeats)
+
+            for candidate, function in target['candidates'].items():
+                tolerance = target.get('tolerances', {}).get(candidate, tolerances)
+                actual, candidate_ms = timed(function, args, kwargs, repeats)
+                if error is not None or isinstance(expected, Exception) or isinstance(actual, Exception):
+                    max_abs, max_rel = np.nan, np.nan
+                    mismatch = error_mismatch(expected, actual, error)
+                else:
+                    max_abs, max_rel, mismatch = compare_outputs(expected, actual, **tolerance)
+
+                rows.append({
+                    'target': name, 'candidate': candidate, 'case': case, 'passed': mismatch is None,
+                    'max_abs_diff': max_abs, 'max_rel_diff': max_rel,
+                    'reference_ms': reference_ms, 'candidate_ms': candidate_ms,
+                    'speedup': reference_ms / candidate_ms, 'detail': mismatch
+                })
+
+    return pd.DataFrame(rows, columns=REPORT_COLUMNS)
+
+def raise_for_mismatches(report):
+    """Raise AssertionError listing every failed comparison of an equivalence report."""
+    failed = report[~report['passed']]
+    if failed.empty:
+        return
+
+    lines = [f"- {row.target} [{row.candidate}] on {row.case}: {row.detail}" for row in failed.itertuples(index=False)]
+    raise AssertionError(f"{len(failed)} comparisons differ from the reference:\n" + '\n'.join(lines))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check optimised engines against the frozen reference implementations.')
+    parser.add_argument('--targets', nargs='+', choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument('--repeats', type=int, default=3, help='timed runs per comparison (the best is reported)')
+    parser.add_argument('--synthetic-only', action='store_true', help='do not load the survey')
+    args = parser.parse_args(argv)
+
+    survey_df = None
+    if not args.synthetic_only and os.path.exists(SURVEY_PATH):
+        survey_df = load_survey(SURVEY_PATH, SURVEY_SHEET)
+
+    report = run_equivalence(args.targets, survey_df, args.repeats)
+    with pd.option_context('display.width', 200, 'display.max_colwidth', 60):
+        print(report.drop(columns='detail').to_string(index=False, float_format=lambda value: f'{value:.3g}'))
+    print(f"{int(report['passed'].sum())} of {len(report)} comparisons match the reference")
+    raise_for_mismatches(report)
+
+if __name__ == "__main__":
+    main()
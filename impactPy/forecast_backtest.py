@@ -0,0 +1,238 @@
+
+"""
+Rolling-origin backtesting and model selection for the healthcare expenditure forecasts.
+
+healthcare_expenditure_predictor.py forecasts 2022-2024 with a linear trend whose last 6 years
+weigh 3 times as much. This module tests that choice against alternatives on the 2008-2021
+history of every country:
+
+- linear: (weighted) least squares trend; weight 1 is the unweighted regression;
+- log_linear: the same on log values, i.e. a constant growth rate;
+- damped: Holt's exponential smoothing with a damped trend (alpha, beta, phi).
+
+Every origin (last training year, from min_train_years on) forecasts up to horizon years ahead,
+and the forecasts are scored against the years that followed. Each forecaster is vectorised over
+countries and origins: the trend fits are closed-form weighted sums over an (origin, country,
+year) weight array, and one smoothing pass over the years yields the state at every origin. The
+model grid is split across a process pool.
+
+Run with python -m impactPy.forecast_backtest from the repository root; the best model of each
+country (lowest mean absolute percentage error by default) is saved with its 2022-2024 forecast.
+"""
+
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product, repeat
+
+import numpy as np
+import pandas as pd
+
+from .healthcare_expenditure_predictor import INPUT_FILE_PATH, YEARS_RANGE
+
+BACKTEST_SETTINGS = {
+    'horizon': 3,
+    'min_train_years': 6,
+    'metric': 'mape',
+    'workers': None
+}
+
+OUTPUT_PATH = 'data/inputs/healthcare_expenditure_backtest.xlsx'
+
+def model_grid(weights=(1, 2, 3, 5), recent_years=(3, 6, 9), alphas=(0.2, 0.4, 0.6, 0.8),
+               betas=(0.1, 0.2, 0.4), phis=(0.8, 0.9, 0.98)):
+    """Every forecaster to backtest; the predictor's current choice is linear with weight 3 on 6 recent years."""
+    models = []
+    for model in ['linear', 'log_linear']:
+        models.append({'name': f'{model} unweighted', 'model': model, 'weight_recent_years': 1, 'num_recent_years': 0})
+        for weight, years in product(weights, recent_years):
+            if weight != 1:
+                models.append({'name': f'{model} w{weight:g} x{years}', 'model': model,
+                               'weight_recent_years': weight, 'num_recent_years': years})
+
+    for alpha, beta, phi in product(alphas, betas, phis):
+        models.append({'name': f'damped a{alpha:g} b{beta:g} phi{phi:g}', 'model': 'damped',
+                       'alpha': alpha, 'beta': beta, 'phi': phi})
+    return models
+
+def trend_forecasts(values, origins, horizon, weight_recent_years=1, num_recent_years=0, log=False):
+    """
+    Weighted least squares trend forecasts, as predict_next_years, from every origin at once.
+
+    values: (countries, years) array, NaN where missing
+    origins: number of training years of every origin
+    Returns an (origins, countries, horizon) array.
+    """
+    n_years = values.shape[1]
+    t = np.arange(n_years, dtype=float)
+    y = np.log(values) if log else values
+    valid = ~np.isnan(y)
+
+    # Weight of every year at every origin: 0 after the origin, weight_recent_years on its last num_recent_years
+    origins = np.asarray(origins)
+    weights = np.where(t[None, :] < origins[:, None], 1.0, 0.0)
+    weights[(t[None, :] >= origins[:, None] - num_recent_years) & (weights > 0)] = weight_recent_years
+    w = weights[:, None, :] * valid[None, :, :]
+    y = np.where(valid, y, 0.0)[None, :, :]
+
+    s0, s1, s2 = w.sum(axis=2), (w * t).sum(axis=2), (w * t ** 2).sum(axis=2)
+    sy, sty = (w * y).sum(axis=2), (w * t * y).sum(axis=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (s0 * sty - s1 * sy) / (s0 * s2 - s1 ** 2)
+        intercept = (sy - slope * s1) / s0
+
+    future = origins[:, None, None] - 1 + np.arange(1, horizon + 1)[None, None, :]
+    forecasts = intercept[:, :, None] + slope[:, :, None] * future
+    return np.exp(forecasts) if log else forecasts
+
+def damped_forecasts(values, origins, horizon, alpha, beta, phi):
+    """
+    Holt's damped trend exponential smoothing forecasts from every origin at once.
+
+    One pass over the years updates the level and trend of every country, starting at its first
+    observed year; the state after the last training year of an origin gives its forecasts.
+    Missing years carry the forecast forward.
+    """
+    n_countries, n_years = values.shape
+    countries = np.arange(n_countries)
+    observed = ~np.isnan(values)
+    start = np.where(observed.any(axis=1), observed.argmax(axis=1), n_years)
+    first = values[countries, np.minimum(start, n_years - 1)]
+    second = values[countries, np.minimum(start + 1, n_years - 1)]
+    initial_trend = np.where(start + 1 < n_years, np.nan_to_num(second - first), 0.0)
+
+    level, trend = np.full(n_countries, np.nan), np.full(n_countries, np.nan)
+    states = np.full((n_years, 2, n_countries), np.nan)
+    for year in range(n_years):
+        actual = values[:, year]
+        predicted = level + phi * trend
+        new_level = np.where(np.isnan(actual), predicted, alpha * actual + (1 - alpha) * predicted)
+        new_trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        level = np.where(start == year, first, new_level)
+        trend = np.where(start == year, initial_trend, new_trend)
+        states[year] = level, trend
+
+    damping = np.cumsum(phi ** np.arange(1, horizon + 1))
+    origin_states = states[np.asarray(origins) - 1]
+    return origin_states[:, 0, :, None] + origin_states[:, 1, :, None] * damping[None, None, :]
+
+def forecast(values, origins, horizon, spec):
+    """Forecasts of one model of model_grid, an (origins, countries, horizon) array."""
+    if spec['model'] == 'damped':
+        return damped_forecasts(values, origins, horizon, spec['alpha'], spec['beta'], spec['phi'])
+    if spec['model'] in ('linear', 'log_linear'):
+        return trend_forecasts(values, origins, horizon, spec['weight_recent_years'], spec['num_recent_years'],
+                               log=spec['model'] == 'log_linear')
+    raise ValueError(f"Unknown forecaster '{spec['model']}', expected 'linear', 'log_linear' or 'damped'")
+
+def backtest_models(values, countries, years, specs, horizon=BACKTEST_SETTINGS['horizon'],
+                    min_train_years=BACKTEST_SETTINGS['min_train_years']):
+    """Forecast errors of every model, origin, country and horizon with an actual value to compare with."""
+    n_years = values.shape[1]
+    origins = np.arange(min_train_years, n_years)
+    target = origins[:, None] - 1 + np.arange(1, horizon + 1)[None, :]
+    in_sample = target < n_years
+    actual = np.where(in_sample[:, None, :], values[:, np.minimum(target, n_years - 1)].transpose(1, 0, 2), np.nan)
+
+    origin_index, country_index, horizon_index = np.nonzero(~np.isnan(actual))
+    tables = []
+    for spec in specs:
+        predicted = forecast(values, origins, horizon, spec)[origin_index, country_index, horizon_index]
+        tables.append(pd.DataFrame({
+            'model': spec['name'],
+            'country': countries[country_index],
+            'origin': np.asarray(years)[origins[origin_index] - 1],
+            'horizon': horizon_index + 1,
+            'actual': actual[origin_index, country_index, horizon_index],
+            'forecast': predicted
+        }))
+
+    errors = pd.concat(tables, ignore_index=True)
+    errors['error'] = errors['forecast'] - errors['actual']
+    return errors
+
+def summarise_errors(errors):
+    """MAE, RMSE, MAPE (%) and bias of every model and country."""
+    scored = errors.assign(abs_error=errors['error'].abs(), squared_error=errors['error'] ** 2,
+                           abs_percentage_error=(errors['error'] / errors['actual']).abs() * 100)
+    metrics = scored.groupby(['model', 'country'], sort=False).agg(
+        mae=('abs_error', 'mean'), rmse=('squared_error', 'mean'), mape=('abs_percentage_error', 'mean'),
+        bias=('error', 'mean'), forecasts=('error', 'size')
+    ).reset_index()
+    metrics['rmse'] = np.sqrt(metrics['rmse'])
+    return metrics
+
+def select_models(metrics, metric=BACKTEST_SETTINGS['metric']):
+    """Best model of every country by metric (absolute value for bias), with the current predictor's score beside it."""
+    score = metrics[metric].abs() if metric == 'bias' else metrics[metric]
+    best = metrics.loc[score.groupby(metrics['country'], sort=False).idxmin()].reset_index(drop=True)
+
+    current = metrics.loc[metrics['model'] == 'linear w3 x6', ['country', metric]]
+    return best.merge(current.rename(columns={metric: f'current_{metric}'}), on='country', how='left')
+
+def backtest(df, years=YEARS_RANGE, specs=None, settings=BACKTEST_SETTINGS):
+    """
+    Rolling-origin backtest of every model of specs (model_grid by default) over the countries of df.
+
+    The model grid is split into one chunk per worker of a process pool (settings['workers'],
+    all CPUs by default; 1 runs in this process). Returns the forecast errors, the metrics of every
+    model and country, and the best model of every country.
+    """
+    specs = specs or model_grid()
+    values = df[years].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    countries = df['Country Name'].to_numpy()
+    workers = min(settings['workers'] or os.cpu_count() or 1, len(specs))
+
+    if workers == 1:
+        errors = backtest_models(values, countries, years, specs, settings['horizon'], settings['min_train_years'])
+    else:
+        chunks = [specs[start::workers] for start in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(backtest_models, repeat(values), repeat(countries), repeat(years), chunks,
+                               repeat(settings['horizon']), repeat(settings['min_train_years']))
+            errors = pd.concat(results, ignore_index=True)
+
+    metrics = summarise_errors(errors)
+    return errors, metrics, select_models(metrics, settings['metric'])
+
+def forecast_best(df, best, specs=None, years=YEARS_RANGE, future_years=range(2022, 2025)):
+    """Forecast of future_years for every country with its best model, fitted on every year of years."""
+    specs = {spec['name']: spec for spec in (specs or model_grid())}
+    values = df[years].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    horizon = len(future_years)
+
+    forecasts = df[['Country Name']].copy()
+    forecasts['model'] = forecasts['Country Name'].map(best.set_index('country')['model'])
+    predicted = np.full((len(df), horizon), np.nan)
+    for name, rows in forecasts.groupby('model').groups.items():
+        rows = forecasts.index.get_indexer(rows)
+        predicted[rows] = forecast(values[rows], [len(years)], horizon, specs[name])[0]
+
+    for offset, year in enumerate(future_years):
+        forecasts[str(year)] = predicted[:, offset]
+    return forecasts
+
+def main():
+    df = pd.read_excel(INPUT_FILE_PATH, sheet_name="normalised")
+
+    # The UK is the normalisation baseline (1 in every year), so it is not forecast
+    df = df[df['Country Name'] != 'United Kingdom'].reset_index(drop=True)
+
+    specs = model_grid()
+    errors, metrics, best = backtest(df, specs=specs)
+    forecasts = forecast_best(df, best, specs)
+
+    with pd.ExcelWriter(OUTPUT_PATH) as writer:
+        best.to_excel(writer, sheet_name='best', index=False)
+        forecasts.to_excel(writer, sheet_name='forecasts', index=False)
+        metrics.to_excel(writer, sheet_name='metrics', index=False)
+        errors.to_excel(writer, sheet_name='errors', index=False)
+
+    metric = BACKTEST_SETTINGS['metric']
+    for row in best.itertuples(index=False):
+        print(f"{row.country}: {row.model} ({metric} {getattr(row, metric):.2f}, "
+              f"current model {getattr(row, f'current_{metric}'):.2f})")
+    print(f"Backtest of {len(specs)} models saved to {OUTPUT_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+
+"""
+Geographies of the health model: names, the region -> country -> global hierarchy and populations.
+
+The health parameter tables name geographies inconsistently ('England' and 'england',
+'West \nMidlands'), so geographies are matched on geography_key. A geography without its own
+data for a parameter takes the data of its parent (GEOGRAPHY_PARENTS), then of the parent's
+parent, and then global data (see resolve_rows in impactPy.health_functions). Populations of the
+population table (data/health_data/gdp.csv) scale the customers of a scenario to the geographies
+below its own (see calculate_geography_health_outcomes).
+"""
+
+
+import pandas as pd
+
+from .mappings import GEOGRAPHY_PARENTS
+
+POPULATION_SOURCE = 'data/health_data/gdp.csv'
+
+def geography_key(geographies):
+    """Geography names as matched across tables: lower case, with runs of whitespace as one space."""
+    if isinstance(geographies, str):
+        return ' '.join(geographies.lower().split())
+    return pd.Series(geographies).str.lower().str.replace(r'\s+', ' ', regex=True).str.strip()
+
+def geography_lineage(geographies, hierarchy=GEOGRAPHY_PARENTS):
+    """
+    Every geography with itself and each of its ancestors in hierarchy (child -> parent names):
+    'geography' (as given), 'ancestor' (a geography_key) and 'depth' (0 for the geography
+    itself, 1 for its parent, ...). Global data is the last fallback of every geography, so
+    'global' is never listed as an ancestor.
+    """
+    parents = {geography_key(child): geography_key(parent) for child, parent in hierarchy.items()}
+
+    rows = []
+    for geography in dict.fromkeys(geographies):
+        ancestor, depth = geography_key(geography), 0
+        while ancestor is not None and ancestor != 'global':
+            if depth > len(parents):
+                raise ValueError(f"The geography hierarchy has a cycle through '{geography}'")
+            rows.append((geography, ancestor, depth))
+            ancestor, depth = parents.get(ancestor), depth + 1
+
+    return pd.DataFrame(rows, columns=['geography', 'ancestor', 'depth'])
+
+def load_populations(source=POPULATION_SOURCE):
+    """Population (persons: value x multiplier) of every geography of the population table, indexed by geography_key."""
+    table = pd.read_csv(source, encoding='utf-8-sig')
+    rows = table[table['indicator'] == 'population']
+
+    return pd.Series((rows['value'] * rows['multiplier']).to_numpy(dtype=float),
+                     index=geography_key(rows['geography']).to_numpy(), name='population')
+
+def population_shares(lineage, populations):
+    """
+    Population of every (geography, ancestor) pair of a lineage as a share of the ancestor's
+    population (1 for the geography itself). Geographies without a population raise ValueError.
+    """
+    below = lineage['depth'].to_numpy() > 0
+    keys = geography_key(lineage['geography']).to_numpy()
+
+    needed = set(keys[below]) | set(lineage.loc[below, 'ancestor'])
+    missing = sorted(needed - set(populations.index))
+    if missing:
+        raise ValueError(f"No population found for {missing}")
+
+    shares = pd.Series(1.0, index=lineage.index)
+    shares[below] = populations.reindex(keys[below]).to_numpy() / populations.reindex(lineage.loc[below, 'ancestor']).to_numpy()
+    return shares
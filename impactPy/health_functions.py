@@ -1,5 +1,59 @@
+import os
+import numpy as np
 import pandas as pd
 
+from .geography import geography_key, geography_lineage, load_populations, population_shares
+from .mappings import COUNTRY_MAP, GEOGRAPHY_PARENTS
+from .precision import compute_dtype
+
+# Health parameter tables used by the adult health model
+HEALTH_SOURCES = {
+    'activity_levels': 'data/health_data/activity_levels.csv',
+    'relative_risks': 'data/health_data/relative_risks.csv',
+    'population_risks': 'data/health_data/population_risks.csv',
+    'population_mortality_risks': 'data/health_data/population_mortality_risks.csv',
+    'population_dalys': 'data/health_data/population_dalys.csv',
+    'cost_per_case': 'data/health_data/cost_per_case_adjusted.csv'
+}
+
+ADULT_HEALTH_LIST = ['coronary heart disease',
+                     'anxiety',
+                     'depression',
+                     'stroke',
+                     'diabetes (type 2)',
+                     'breast cancer',
+                     'endometrial uterine cancer',
+                     'colon cancer',
+                     'alzheimer and other dementia',
+                     'osteoporosis']
+
+YOUTH_HEALTH_LIST = ['anxiety', 'depression', 'obesity']
+
+# Conditions evaluated for each age stratum of the health parameter tables
+HEALTH_LISTS = {'adult': ADULT_HEALTH_LIST, 'youth': YOUTH_HEALTH_LIST}
+
+# Age stratum of the health parameter tables behind each survey age group. Every respondent is
+# an adult; youth (age 5-18) parameters are used through find_health_outcomes(youth=True)
+HEALTH_AGE_STRATA = {'Young Adults (16-35)': 'adult', 'Old Adults (>35)': 'adult'}
+
+# Labels the parameter tables use for the same stratum
+AGE_GROUP_ALIASES = {'age 5-18': 'youth'}
+
+COST_NUMERIC_COLUMNS = ['cost_per_case_uk', 'forex_rate', 'cost_per_case_local', 'inflation_rate', 'cost_inflated',
+                        'healthcare_expenditure_factor', 'income_adjustment_factor', 'cost_per_case_adjusted']
+
+HEALTH_OUTCOME_COLUMNS = ['factor', 'risk_active', 'risk_inactive', 'active_cases_saved', 'fairly_active_cases_saved',
+                          'active_dalys_saved', 'active_deaths_saved', 'direct_cost_per_case', 'direct_cost_saving', 'indirect_cost_per_case',
+                          'indirect_cost_saving', 'total_saving']
+
+# Risk decomposition columns the outcomes of evaluate_health_outcomes are calculated from
+OUTCOME_RISK_COLUMNS = ['risk_active', 'risk_fairly_active', 'risk_inactive', 'daly_active', 'daly_inactive',
+                        'death_active', 'death_inactive', 'direct_cost_per_case', 'indirect_cost_per_case']
+
+# Risk decompositions keyed by (factor, gender, geography, age_group). Each entry keeps the
+# fingerprint of the source CSVs and geography hierarchy it was built from so that edits invalidate it.
+_RISK_CACHE = {}
+
 def calculate_adjusted_risk_rates(PopulationRisk, PopulationActiveRate, RelativeRisk, PopulationFairlyActiveRate=None, FairlyActiveRelativeRisk=None):
 
 
@@ -32,99 +86,136 @@ def calculate_cases_saved(ActiveRisk, InactiveRisk, ActiveNum):
     return CasesSaved
 
 
-def read_relative_risks(source, factor, age_group, gender, geography, activity_level = 'active', local = False):
+def read_cost_per_case_table(source):
+    """Read cost_per_case_adjusted.csv, which may be a formatted export (padded headers, " 6,323.49 ", " -   ")."""
 
-    if local:
-        risks_df = pd.read_csv(source)
-    
-    filtered_df = risks_df[(risks_df['factor'] == factor) & (risks_df['age_group'] == age_group) & (risks_df['activity_level'] == activity_level)].reset_index()
+    costs_df = pd.read_csv(source, dtype=str)
+    costs_df.columns = costs_df.columns.str.strip()
+    costs_df = costs_df.apply(lambda column: column.str.strip())
 
-    if len(filtered_df[(filtered_df['gender'] == gender)].index) > 0:
-        filtered_df = filtered_df[(filtered_df['gender'] == gender)].reset_index()
+    for column in COST_NUMERIC_COLUMNS:
+        if column in costs_df.columns:
+            values = costs_df[column].str.replace(',', '', regex=False).replace('-', np.nan)
+            costs_df[column] = pd.to_numeric(values, errors='coerce')
 
-    elif len(filtered_df[(filtered_df['gender'] == "all")].index) > 0:
-        filtered_df = filtered_df[(filtered_df['gender'] == "all")].reset_index()
-    
-    else:
-        print("Using assumptions from opposite gender for relative risk")
+    costs_df['direct'] = costs_df['direct'].str.upper() == 'TRUE'
 
-    if len(filtered_df[(filtered_df['geography'] == geography)].index) > 0:
-        filtered_df = filtered_df[(filtered_df['geography'] == geography)]
-    
-    elif len(filtered_df[(filtered_df['geography'] == "global")].index) > 0:
-        filtered_df = filtered_df[(filtered_df['geography'] == "global")]
+    return costs_df
 
-        print("Using global assumptions (not region-specific) for relative risk")
-    
-    else:
-        filtered_df = filtered_df.head(1)
+def resolve_rows(table, requests, match_columns, fallback=True, hierarchy=GEOGRAPHY_PARENTS):
+    """
+    Find the source row used for every request, with the fallback tier it was found at.
 
-        print(f"Using geography data from {filtered_df['geography'].values} for relative risk")
+    Rows must match the request on match_columns. Among those the most specific gender wins
+    (exact, then "all", then any other gender), then the most specific geography (exact, then
+    the nearest ancestor in hierarchy, e.g. the country of a region, then "global", then the
+    first listed), then the first row in the table. Geographies are matched on geography_key.
+    Without fallback only exact gender matches in the requested geography or an ancestor are
+    used. Returns requests with 'source_row' (a position in table, NaN when nothing matches),
+    'gender_tier' and 'geography_tier' (0 exact, 1 ancestor, 2 global, 3 other) columns.
+    """
 
-    return filtered_df
+    candidates = table[match_columns + ['gender', 'geography']].reset_index(drop=True)
+    candidates['source_row'] = np.arange(len(candidates))
+    candidates['geography_key'] = geography_key(candidates['geography']).to_numpy()
 
-def read_cost_per_case(source, factor, age_group, gender, geography, direct = True, local = False):
+    # Requests that differ only in columns that are not matched (e.g. the geographies of a
+    # parameter read from fixed england data) share one resolution
+    request_columns = match_columns + ['gender', 'geography']
+    requests = requests.reset_index(drop=True)
+    distinct = requests[request_columns].drop_duplicates(ignore_index=True)
+    distinct['request'] = np.arange(len(distinct))
 
-    if local:
-        costs_df = pd.read_csv(source)
-    
-    filtered_df = costs_df[(costs_df['factor'] == factor) & (costs_df['age_group'] == age_group) & (costs_df['direct'] == direct)].reset_index()
+    merged = distinct.assign(geography_key=geography_key(distinct['geography']).to_numpy()).merge(
+        candidates, on=match_columns, suffixes=('', '_source')
+    )
 
-    if len(filtered_df[(filtered_df['gender'] == gender)].index) > 0:
-        filtered_df = filtered_df[(filtered_df['gender'] == gender)].reset_index()
+    # Distance from the requested geography to each candidate geography above it (NaN elsewhere)
+    lineage = geography_lineage(distinct['geography'].unique(), hierarchy)
+    merged = merged.merge(lineage, left_on=['geography', 'geography_key_source'], right_on=['geography', 'ancestor'], how='left')
 
-    elif len(filtered_df[(filtered_df['gender'] == "all")].index) > 0:
-        filtered_df = filtered_df[(filtered_df['gender'] == "all")].reset_index()
-    
-    else:
-        print("Using assumptions from opposite gender for cost per case")
+    merged['gender_tier'] = np.select(
+        [merged['gender_source'] == merged['gender'], merged['gender_source'] == 'all'], [0, 1], 2
+    )
+    merged['geography_tier'] = np.select(
+        [merged['geography_key_source'] == merged['geography_key'], merged['depth'] > 0,
+         merged['geography_key_source'] == 'global'], [0, 1, 2], 3
+    )
 
-    if len(filtered_df[(filtered_df['geography'] == geography)].index) > 0:
-        filtered_df = filtered_df[(filtered_df['geography'] == geography)]
-    
-    elif len(filtered_df[(filtered_df['geography'] == "global")].index) > 0:
-        filtered_df = filtered_df[(filtered_df['geography'] == "global")]
+    if not fallback:
+        merged = merged[(merged['gender_tier'] == 0) & (merged['geography_tier'] <= 1)]
 
-        print("Using global assumptions (not region-specific) for cost per case")
-    
-    else:
-        filtered_df = filtered_df.head(1)
+    winners = merged.sort_values(['request', 'gender_tier', 'geography_tier', 'depth', 'source_row']).drop_duplicates('request')
 
-        print(f"Using geography data from {filtered_df['geography'].values} for cost per case")
+    distinct = distinct.merge(winners[['request', 'source_row', 'gender_tier', 'geography_tier']], on='request', how='left')
 
-    return filtered_df
+    return requests.merge(distinct.drop(columns='request'), on=request_columns, how='left')
 
+def report_fallbacks(resolution, label):
+    """Print which assumptions were borrowed from another gender or geography."""
 
-def read_population_risks(source, factor, age_group, gender, geography, local = False):
+    if (resolution['gender_tier'] == 2).any():
+        print(f"Using assumptions from opposite gender for {label}")
+
+    parents = resolution.loc[resolution['geography_tier'] == 1, 'geography_source']
+    if not parents.empty:
+        print(f"Using data of the parent geographies {', '.join(parents.unique().tolist())} for {label}")
+
+    if (resolution['geography_tier'] == 2).any():
+        print(f"Using global assumptions (not region-specific) for {label}")
+
+    borrowed = resolution.loc[resolution['geography_tier'] == 3, 'geography_source']
+    if not borrowed.empty:
+        print(f"Using geography data from {', '.join(borrowed.unique().tolist())} for {label}")
+
+def read_resolved_row(table, request, match_columns, label):
+    """Scalar lookup: the winning row of table for a single request (empty if none)."""
+
+    resolution = resolve_rows(table, pd.DataFrame([request]), match_columns)
+    source_row = resolution['source_row'].iloc[0]
+
+    if pd.isna(source_row):
+        return table.iloc[[]]
+
+    resolved_df = table.iloc[[int(source_row)]]
+    resolution['geography_source'] = resolved_df['geography'].values
+    report_fallbacks(resolution, label)
+
+    return resolved_df
+
+def read_relative_risks(source, factor, age_group, gender, geography, activity_level = 'active', local = False):
 
     if local:
         risks_df = pd.read_csv(source)
+    else:
+        risks_df = source
 
-    filtered_df = risks_df[(risks_df['factor'] == factor) & (risks_df['age_group'] == age_group)].reset_index()
+    request = {'factor': factor, 'age_group': age_group, 'activity_level': activity_level, 'gender': gender, 'geography': geography}
 
-    if len(filtered_df[(filtered_df['gender'] == gender)].index) > 0:
-        filtered_df = filtered_df[(filtered_df['gender'] == gender)].reset_index()
+    return read_resolved_row(risks_df, request, ['factor', 'age_group', 'activity_level'], 'relative risk')
 
-    elif len(filtered_df[(filtered_df['gender'] == "all")].index) > 0:
-        filtered_df = filtered_df[(filtered_df['gender'] == "all")].reset_index()
-    
+def read_cost_per_case(source, factor, age_group, gender, geography, direct = True, local = False):
+
+    if local:
+        costs_df = read_cost_per_case_table(source)
     else:
-        print("Using assumptions from opposite gender for population risks")
+        costs_df = source
 
-    if len(filtered_df[(filtered_df['geography'] == geography)].index) > 0:
-        filtered_df = filtered_df[(filtered_df['geography'] == geography)]
-    
-    elif len(filtered_df[(filtered_df['geography'] == "global")].index) > 0:
-        filtered_df = filtered_df[(filtered_df['geography'] == "global")]
+    request = {'factor': factor, 'age_group': age_group, 'direct': direct, 'gender': gender, 'geography': geography}
 
-        print("Using global assumptions (not region-specific) for population risks")
-    
+    return read_resolved_row(costs_df, request, ['factor', 'age_group', 'direct'], 'cost per case')
+
+
+def read_population_risks(source, factor, age_group, gender, geography, local = False):
+
+    if local:
+        risks_df = pd.read_csv(source)
     else:
-        filtered_df = filtered_df.head(1)
+        risks_df = source
 
-        print(f"Using geography data from {filtered_df['geography'].values} for population risks")
+    request = {'factor': factor, 'age_group': age_group, 'gender': gender, 'geography': geography}
 
-    return filtered_df
+    return read_resolved_row(risks_df, request, ['factor', 'age_group'], 'population risks')
 
 
 
@@ -134,7 +225,7 @@ def read_activity_levels(source,age_group,gender, geography, activity_level='act
     if local:
         activity_df = pd.read_csv(source)
     else:
-        activity_df = pd.DataFrame()
+        activity_df = source
 
     filtered_df = activity_df[(activity_df['age_group'] == age_group) & 
                               (activity_df['gender'] == gender) & 
@@ -148,120 +239,420 @@ def read_activity_levels(source,age_group,gender, geography, activity_level='act
 
 
 
-
+# Parameters behind each risk decomposition: source table, value column, columns that must match,
+# fixed request values (None keeps the requested geography), whether gender/geography may fall back
+# and the label used in messages. Parameters with a default take it when no row matches (strata
+# without fairly active data get a two-tier decomposition); the others are required
+HEALTH_PARAMETERS = {
+    'activity_rate': {
+        'table': 'activity_levels', 'value': 'activity_rate', 'match': ['age_group', 'activity_level'],
+        'request': {'activity_level': 'active'}, 'fallback': False, 'label': 'activity levels'
+    },
+    # Use England data for fairly active levels if market-specific data is not available
+    'fairly_activity_rate': {
+        'table': 'activity_levels', 'value': 'activity_rate', 'match': ['age_group', 'activity_level'],
+        'request': {'activity_level': 'fairly active', 'geography': 'england'}, 'fallback': False,
+        'label': 'fairly active levels', 'default': 0.0
+    },
+    # Use global or UK data for relative risks
+    'relative_risk': {
+        'table': 'relative_risks', 'value': 'relative_risk', 'match': ['factor', 'age_group', 'activity_level'],
+        'request': {'activity_level': 'active', 'geography': 'england'}, 'fallback': True, 'label': 'relative risk'
+    },
+    'fairly_relative_risk': {
+        'table': 'relative_risks', 'value': 'relative_risk', 'match': ['factor', 'age_group', 'activity_level'],
+        'request': {'activity_level': 'fairly active', 'geography': 'england'}, 'fallback': True,
+        'label': 'relative risk', 'default': 1.0
+    },
+    # Use market-specific data for population risks
+    'population_risk': {
+        'table': 'population_risks', 'value': 'population_rate', 'match': ['factor', 'age_group'],
+        'request': {}, 'fallback': True, 'label': 'population risks'
+    },
+    # Use global data for mortality risks and DALYs
+    'population_mortality_risk': {
+        'table': 'population_mortality_risks', 'value': 'population_rate', 'match': ['factor', 'age_group'],
+        'request': {'geography': 'global'}, 'fallback': True, 'label': 'population risks'
+    },
+    'population_daly_risk': {
+        'table': 'population_dalys', 'value': 'population_rate', 'match': ['factor', 'age_group'],
+        'request': {'geography': 'global'}, 'fallback': True, 'label': 'population risks', 'default': np.nan
+    },
+    # Use market-specific data for cost per case if available, otherwise use global
+    'direct_cost_per_case': {
+        'table': 'cost_per_case', 'value': 'cost_per_case_adjusted', 'match': ['factor', 'age_group', 'direct'],
+        'request': {'gender': 'all', 'direct': True}, 'fallback': True, 'label': 'cost per case', 'default': np.nan
+    },
+    'indirect_cost_per_case': {
+        'table': 'cost_per_case', 'value': 'cost_per_case_adjusted', 'match': ['factor', 'age_group', 'direct'],
+        'request': {'gender': 'all', 'direct': False}, 'fallback': True, 'label': 'cost per case', 'default': np.nan
+    }
+}
+
+RISK_KEY_COLUMNS = ['factor', 'gender', 'geography', 'age_group']
+
+def resolve_health_parameters(tables, keys, parameters=HEALTH_PARAMETERS, report=True, hierarchy=GEOGRAPHY_PARENTS):
+    """
+    Resolution table for every requested (factor, gender, geography, age_group) and parameter.
+
+    Each row records the source table and row that supplied the parameter, the gender and
+    geography tiers it was found at (see resolve_rows: a region falls back to its country
+    in hierarchy, then to global data) and its value (population rates per person). Parameters
+    with no matching row have no source_row and their default value, if they have one.
+    Fallbacks are printed unless report is False.
+    """
+
+    if 'age_group' not in keys.columns:
+        keys = keys.assign(age_group='adult')
+    keys = keys.reset_index(drop=True)
+
+    resolutions = []
+    for parameter, spec in parameters.items():
+        table = tables[spec['table']]
+
+        requests = keys[RISK_KEY_COLUMNS].copy()
+        for column, value in spec['request'].items():
+            requests[column] = value
+
+        resolution = resolve_rows(table, requests, spec['match'], spec['fallback'], hierarchy)
+        resolved = resolution['source_row'].notna().values
+        source_rows = resolution.loc[resolved, 'source_row'].astype(int).values
+
+        geography_source = np.full(len(resolution), None, dtype=object)
+        geography_source[resolved] = table['geography'].values[source_rows]
+        resolution['geography_source'] = geography_source
+
+        values = np.full(len(resolution), np.nan)
+        values[resolved] = table[spec['value']].values[source_rows].astype(float)
+        if 'rate_per' in table.columns:
+            values[resolved] /= table['rate_per'].values[source_rows]
+        if 'default' in spec:
+            values[~resolved] = spec['default']
+        resolution['value'] = values
+
+        if report:
+            report_fallbacks(resolution[resolved], spec['label'])
+
+        # Report the key that was requested, not the fixed value it was resolved with
+        resolution[RISK_KEY_COLUMNS] = keys[RISK_KEY_COLUMNS].values
+        resolutions.append(resolution[RISK_KEY_COLUMNS + ['geography_source', 'source_row', 'gender_tier',
+                                                          'geography_tier', 'value']].assign(parameter=parameter, source=spec['table']))
+
+    return pd.concat(resolutions, ignore_index=True)
+
+def parameter_values(resolution):
+    """One row per (factor, gender, geography, age_group) of a resolution table, with a column per parameter."""
+
+    return (resolution.drop_duplicates(RISK_KEY_COLUMNS + ['parameter'])
+            .set_index(RISK_KEY_COLUMNS + ['parameter'])['value']
+            .unstack('parameter')
+            .reset_index())
+
+def calculate_risk_table(tables, keys, resolution=None, report=True, hierarchy=GEOGRAPHY_PARENTS):
+    """
+    Decompose incidence, DALY and mortality rates of every (factor, gender, geography, age_group) key into activity tiers.
+
+    The input data of every key and the fallbacks are printed unless report is False.
+    """
+
+    if 'age_group' not in keys.columns:
+        keys = keys.assign(age_group='adult')
+    keys = keys.reset_index(drop=True)
+
+    if resolution is None:
+        resolution = resolve_health_parameters(tables, keys, report=report, hierarchy=hierarchy)
+
+    required = [parameter for parameter, spec in HEALTH_PARAMETERS.items() if 'default' not in spec]
+    missing = resolution[resolution['source_row'].isna() & resolution['parameter'].isin(required)]
+    if not missing.empty:
+        first = missing.iloc[0]
+        raise ValueError(f"No {first['parameter']} data found for: age_group={first['age_group']}, gender={first['gender']}, "
+                         f"geography={first['geography']}, factor={first['factor']}")
+
+    params = keys.merge(parameter_values(resolution), on=RISK_KEY_COLUMNS, how='left')
+
+    decompositions = {}
+    for prefix, rate in [('risk', 'population_risk'), ('daly', 'population_daly_risk'), ('death', 'population_mortality_risk')]:
+        active, fairly_active, inactive = calculate_adjusted_risk_rates(
+            params[rate], params['activity_rate'], params['relative_risk'],
+            params['fairly_activity_rate'], params['fairly_relative_risk']
+        )
+        decompositions[f'{prefix}_active'] = active
+        decompositions[f'{prefix}_fairly_active'] = fairly_active
+        decompositions[f'{prefix}_inactive'] = inactive
+
+    # Print the input data for activity levels, population risk, cost per case, and relative risk
+    for row in params.itertuples(index=False) if report else []:
+        print(f"Input Data for {row.geography}, disease {row.factor}, gender {row.gender} and age group {row.age_group}:")
+        print(f"Population Risk: {row.population_risk}")
+        print(f"Activity Rate: {row.activity_rate}")
+        print(f"Relative Risk: {row.relative_risk}")
+        print(f"Cost per case: {row.direct_cost_per_case}\n")
+
+    risk_table = params[RISK_KEY_COLUMNS].assign(**decompositions)
+    risk_table['direct_cost_per_case'] = params['direct_cost_per_case']
+    risk_table['indirect_cost_per_case'] = params['indirect_cost_per_case']
+
+    return risk_table
+
+def load_health_tables(sources=HEALTH_SOURCES):
+    """Read every health parameter table once, with one age group label per stratum."""
+
+    tables = {name: pd.read_csv(path) for name, path in sources.items() if name != 'cost_per_case'}
+    tables['cost_per_case'] = read_cost_per_case_table(sources['cost_per_case'])
+
+    for table in tables.values():
+        table['age_group'] = table['age_group'].replace(AGE_GROUP_ALIASES)
+
+    return tables
+
+def source_fingerprint(sources=HEALTH_SOURCES):
+    """Identify the current version of the health CSVs by path, modification time and size."""
+
+    fingerprint = []
+    for name in sorted(sources):
+        stat = os.stat(sources[name])
+        fingerprint.append((sources[name], stat.st_mtime_ns, stat.st_size))
+
+    return tuple(fingerprint)
+
+def calculate_risk_entry(tables, factor, gender, geography, age_group='adult'):
+    """Decompose incidence, DALY and mortality rates of one (factor, gender, geography, age_group) into activity tiers."""
+
+    keys = pd.DataFrame([{'factor': factor, 'gender': gender, 'geography': geography, 'age_group': age_group}])
+
+    return calculate_risk_table(tables, keys).iloc[0].to_dict()
+
+def get_risk_table(genders, geographies, health_list=None, sources=HEALTH_SOURCES, age_groups=('adult',), report=True,
+                   hierarchy=GEOGRAPHY_PARENTS):
+    """
+    Return the risk decomposition for every (factor, gender, geography, age_group) requested.
+
+    Each age stratum covers the conditions of HEALTH_LISTS unless health_list is given. Entries
+    are memoised across calls and rebuilt only when the source CSVs or the geography hierarchy
+    change, so the returned table can be inspected or saved as the parameter set behind a run.
+    Entries missing from the cache are resolved and decomposed together in one batch, whatever
+    their strata and geographies; their input data is printed unless report is False.
+    """
+    return pd.DataFrame(get_risk_rows(genders, geographies, health_list, sources, age_groups, report, hierarchy))
+
+def get_risk_rows(genders, geographies, health_list=None, sources=HEALTH_SOURCES, age_groups=('adult',), report=True,
+                  hierarchy=GEOGRAPHY_PARENTS):
+    """The rows of get_risk_table as the memoised dicts, for callers that need no frame."""
+
+    fingerprint = (source_fingerprint(sources), tuple(sorted(hierarchy.items())))
+    keys = [(factor, gender, geography, age_group)
+            for geography in geographies for gender in genders for age_group in age_groups
+            for factor in (health_list or HEALTH_LISTS[age_group])]
+
+    missing = [key for key in keys if key not in _RISK_CACHE or _RISK_CACHE[key]['fingerprint'] != fingerprint]
+    if missing:
+        missing_df = pd.DataFrame(list(dict.fromkeys(missing)), columns=RISK_KEY_COLUMNS)
+        risk_table = calculate_risk_table(load_health_tables(sources), missing_df, report=report, hierarchy=hierarchy)
+
+        for key, risks in zip(dict.fromkeys(missing), risk_table.to_dict('records')):
+            _RISK_CACHE[key] = {'fingerprint': fingerprint, 'risks': risks}
+
+    return [_RISK_CACHE[key]['risks'] for key in keys]
+
+def clear_risk_cache():
+    _RISK_CACHE.clear()
+
+def evaluate_health_outcomes(scenarios_df, risk_table, precision=None):
+    """
+    Calculate health outcomes for many scenarios at once.
+
+    scenarios_df needs 'gender', 'geography' and 'newly_active_customers' columns and may carry
+    'newly_fairly_active_customers' and the age stratum of the risk table in 'health_age_group'
+    (adult when missing). Returns one row per scenario and factor, with the risks, cases saved
+    and savings in the compute precision (see impactPy.precision).
+    """
+    # Every scenario x factor row carries its factor's decomposition and costs, in the compute precision
+    decomposition = [column for column in risk_table.columns if column not in RISK_KEY_COLUMNS]
+    dtype = compute_dtype(precision)
+    risk_table = risk_table.astype(dict.fromkeys(decomposition, dtype))
+
+    merged_df = pd.merge(
+        scenarios_df.assign(health_age_group=scenarios_df.get('health_age_group', 'adult')),
+        risk_table.rename(columns={'age_group': 'health_age_group'}),
+        on=['gender', 'geography', 'health_age_group'],
+        how='inner'
+    )
+
+    affected_pop = merged_df['newly_active_customers'].astype(dtype)
+    if 'newly_fairly_active_customers' in merged_df.columns:
+        fairly_affected_pop = merged_df['newly_fairly_active_customers'].astype(dtype)
+    else:
+        fairly_affected_pop = 0
+
+    for column, values in health_outcome_values(merged_df, affected_pop, fairly_affected_pop).items():
+        merged_df[column] = values
+
+    return merged_df[list(scenarios_df.columns) + HEALTH_OUTCOME_COLUMNS]
+
+def health_outcome_values(risks, affected_pop, fairly_affected_pop):
+    """
+    Cases, deaths and DALYs saved and the savings of newly active and fairly active people, from
+    the risk decomposition columns of risks (a DataFrame or a dict of arrays) row by row.
+    """
+    cases_saved = calculate_cases_saved(risks['risk_active'], risks['risk_inactive'], affected_pop)
+    fairly_cases_saved = calculate_cases_saved(risks['risk_fairly_active'], risks['risk_inactive'], fairly_affected_pop)
+    total_cases_saved = fairly_cases_saved + cases_saved
+
+    return {
+        'active_cases_saved': cases_saved,
+        'fairly_active_cases_saved': fairly_cases_saved,
+        'active_dalys_saved': calculate_cases_saved(risks['daly_active'], risks['daly_inactive'], affected_pop),
+        'active_deaths_saved': calculate_cases_saved(risks['death_active'], risks['death_inactive'], affected_pop),
+        'direct_cost_saving': total_cases_saved * risks['direct_cost_per_case'],
+        'indirect_cost_saving': total_cases_saved * risks['indirect_cost_per_case'],
+        'total_saving': total_cases_saved * (risks['direct_cost_per_case'] + risks['indirect_cost_per_case'])
+    }
 
 def find_health_outcomes(additional_active, 
                          additional_fairly_active, 
                          youth=False,
-                         health_list=['coronary heart disease', 
-                                      'anxiety',
-                                      'depression',
-                                      'stroke',
-                                      'diabetes (type 2)',
-                                      'breast cancer',
-                                      'endometrial uterine cancer',
-                                      'colon cancer',
-                                      'alzheimer and other dementia',
-                                      'osteoporosis'],
-                         youth_health_list=['anxiety', 'depression', 'obesity'],
+                         health_list=ADULT_HEALTH_LIST,
+                         youth_health_list=YOUTH_HEALTH_LIST,
                          gender='female',
-                         geography='global'):
-
-    cases_saved_list = []
-
+                         geography='global',
+                         precision=None):
+    """
+    Health outcomes (HEALTH_OUTCOME_COLUMNS, one row per disease) of additional active and fairly
+    active people of one gender and geography.
+
+    youth evaluates the youth stratum (youth_health_list). Its parameters have no fairly active
+    tier, so a non-zero additional_fairly_active raises ValueError rather than being dropped.
+    """
     if youth:
-        pass
+        if additional_fairly_active != 0:
+            raise ValueError("Youth health parameters have no fairly active tier; "
+                             "pass additional_fairly_active=0 with youth=True")
+        age_group = 'youth'
+        health_list = youth_health_list
+        affected_pop = additional_active
+        fairly_affected_pop = 0
     else:
+        age_group = 'adult'
         affected_pop = additional_active
         fairly_affected_pop = additional_fairly_active
 
-    # Get market specific activity data
-    activity_df = read_activity_levels(age_group='adult', gender=gender, geography=geography, source='data/health_data/activity_levels.csv', local=True)
-
-    # Use England data for fairly active levels if market-specific data is not available
-    fairly_activity_df = read_activity_levels(age_group='adult', gender=gender, geography='england', activity_level='fairly active', source='data/health_data/activity_levels.csv', local=True)
-
-    for h in health_list:
-        print(h)
-
-        # Use global or UK data for relative risks
-        risks_df = read_relative_risks(factor=h, age_group='adult', gender=gender, geography='england', source='data/health_data/relative_risks.csv', local=True)
-        fairly_risks_df = read_relative_risks(factor=h, age_group='adult', gender=gender, geography='england', activity_level='fairly active', source='data/health_data/relative_risks.csv', local=True)
-
-        # Use market-specific data for population risks
-        pop_df = read_population_risks(factor=h, age_group='adult', gender=gender, geography=geography, source='data/health_data/population_risks.csv', local=True)
-
-        # Use global data for mortality risks and DALYs
-        pop_deaths_df = read_population_risks(factor=h, age_group='adult', gender=gender, geography='global', source='data/health_data/population_mortality_risks.csv', local=True)
-        pop_dalys_df = read_population_risks(factor=h, age_group='adult', gender=gender, geography='global', source='data/health_data/population_dalys.csv', local=True)
-
-        
-
-
-        # Calculate adjusted risk rates
-        a, b, c = calculate_adjusted_risk_rates(
-            pop_df['population_rate'].iloc[0] / pop_df['rate_per'].iloc[0],
-            activity_df['activity_rate'].values[0],
-            risks_df['relative_risk'].iloc[0],
-            fairly_activity_df['activity_rate'].iloc[0],
-            fairly_risks_df['relative_risk'].iloc[0]
-        )
-
-        a_daly, b_daly, c_daly = calculate_adjusted_risk_rates(
-            pop_dalys_df['population_rate'].iloc[0] / pop_dalys_df['rate_per'].iloc[0],
-            activity_df['activity_rate'].values[0],
-            risks_df['relative_risk'].iloc[0],
-            fairly_activity_df['activity_rate'].iloc[0],
-            fairly_risks_df['relative_risk'].iloc[0]
-        )
-
-        a_d, b_d, c_d = calculate_adjusted_risk_rates(
-            pop_deaths_df['population_rate'].iloc[0] / pop_deaths_df['rate_per'].iloc[0],
-            activity_df['activity_rate'].values[0],
-            risks_df['relative_risk'].iloc[0],
-            fairly_activity_df['activity_rate'].iloc[0],
-            fairly_risks_df['relative_risk'].iloc[0]
-        )
-
-        # Use market-specific data for cost per case if available, otherwise use global
-        cost_per_case = read_cost_per_case(factor=h, age_group='adult', gender='all', geography=geography, source='data/health_data/cost_per_case_adjusted.csv', local=True)
-        indirect_cost_per_case = read_cost_per_case(factor=h, age_group='adult', gender='all', geography=geography, direct=False, source='data/health_data/cost_per_case_adjusted.csv', local=True)
-
-        # Calculate cases, deaths, and DALYs saved
-        cases_saved, fairly_cases_saved = calculate_cases_saved(a, c, affected_pop), calculate_cases_saved(b, c, fairly_affected_pop)
-        deaths_saved, fairly_deaths_saved = calculate_cases_saved(a_d, c_d, affected_pop), calculate_cases_saved(b_d, c_d, fairly_affected_pop)
-        dalys_saved, fairly_dalys_saved = calculate_cases_saved(a_daly, c_daly, affected_pop), calculate_cases_saved(b_daly, c_daly, fairly_affected_pop)
-
-
-        # Print the input data for activity levels, population risk, cost per case, and relative risk
-        print(f"Input Data for {geography}, disease {h} and gender {gender}:")
-        print(f"Population Risk: {pop_df['population_rate'].iloc[0]}")
-        print(f"Activity Rate: {activity_df['activity_rate'].values[0]}")
-        print(f"Relative Risk: {risks_df['relative_risk'].iloc[0]}")
-        print(f"Cost per case: {cost_per_case.iloc[0,14]}\n")
-
-
-
-        cases_saved_dict = {
-            'factor': h,
-            'risk_active': a,
-            'risk_inactive': c,
-            'active_cases_saved': cases_saved,
-            'active_dalys_saved': dalys_saved,
-            'active_deaths_saved': deaths_saved,
-            'direct_cost_per_case': cost_per_case.iloc[0, 14],
-            'direct_cost_saving': (fairly_cases_saved + cases_saved) * cost_per_case.iloc[0, 14],
-            'indirect_cost_per_case': indirect_cost_per_case.iloc[0, 14],
-            'indirect_cost_saving': (fairly_cases_saved + cases_saved) * indirect_cost_per_case.iloc[0, 14],
-            'total_saving': (fairly_cases_saved + cases_saved) * (cost_per_case.iloc[0, 14] + indirect_cost_per_case.iloc[0, 14])
-        }
-
-        cases_saved_list.append(cases_saved_dict)
-
-    cases_saved_df = pd.DataFrame(cases_saved_list)
-    youth_cases_saved_df = pd.DataFrame()
-
-    if youth:
-        youth_cases_saved_df = pd.DataFrame()
-
-    return cases_saved_df
\ No newline at end of file
+    # One scenario: the memoised risk rows are evaluated directly, as evaluate_health_outcomes
+    # would, without building and merging frames
+    rows = get_risk_rows([gender], [geography], health_list, age_groups=[age_group])
+    dtype = compute_dtype(precision)
+    risks = {column: np.array([row[column] for row in rows], dtype=dtype) for column in OUTCOME_RISK_COLUMNS}
+
+    outcomes = {'factor': [row['factor'] for row in rows]}
+    outcomes.update(risks)
+    outcomes.update(health_outcome_values(risks, dtype.type(affected_pop), dtype.type(fairly_affected_pop)))
+
+    return pd.DataFrame(outcomes, columns=HEALTH_OUTCOME_COLUMNS)
+
+def get_country_by_code(code, country_map=COUNTRY_MAP):
+    """Retrieve country name by code."""
+    return country_map.get(code.upper(), "Country code not found")
+
+def split_scenarios_by_gender(scenarios_df, gender_shares, group_column='age_group'):
+    """
+    One row per scenario and gender, with the newly active (and fairly active) customers of each
+    (market, group) scenario split by gender_shares (market, group_column, gender and proportion columns).
+    """
+    shares = gender_shares[['market', group_column, 'gender', 'proportion']].rename(columns={'proportion': 'gender_share'})
+    split = scenarios_df.merge(shares, on=['market', group_column], how='inner')
+    for column in ['newly_active_customers', 'newly_fairly_active_customers']:
+        if column in split.columns:
+            split[column] = split[column] * split['gender_share']
+
+    return split
+
+def health_age_groups(scenarios_df):
+    """Age stratum of the health parameters for every scenario: survey age groups mapped by HEALTH_AGE_STRATA, adult when none."""
+    if 'age_group' not in scenarios_df.columns:
+        return pd.Series('adult', index=scenarios_df.index)
+
+    age_groups = scenarios_df['age_group']
+    return age_groups.map(HEALTH_AGE_STRATA).fillna(age_groups).fillna('adult')
+
+def calculate_country_health_outcomes(code, scenarios_df, country_map=COUNTRY_MAP, precision=None):
+    """
+    Health outcomes of every scenario of one market, identified by its scenario_id prefix.
+
+    scenarios_df needs 'scenario_id', 'gender' and 'newly_active_customers' columns and may carry
+    'newly_fairly_active_customers'. An 'age_group' column (survey age groups, see
+    split_scenarios_by_gender) selects the age stratum of the health parameters; scenarios
+    without one are evaluated as adults. A health parameter missing for the market raises
+    ValueError (the validation stage reports such gaps before the health stage runs).
+    """
+    geography = get_country_by_code(code, country_map)
+
+    # Filter data for the specified market
+    market_df = scenarios_df[scenarios_df['scenario_id'].str.startswith(code)].copy()
+    market_df['gender'] = market_df['gender'].str.lower()
+    market_df['geography'] = geography
+    market_df['health_age_group'] = health_age_groups(market_df)
+
+    if market_df.empty:
+        return pd.DataFrame()
+
+    # Risk decompositions are shared by every price scenario of the market, so they are
+    # resolved once (and memoised across calls) for every gender and age stratum present,
+    # and all scenarios are evaluated together
+    risk_table = get_risk_table(market_df['gender'].unique(), [geography],
+                                age_groups=market_df['health_age_group'].unique())
+
+    results = evaluate_health_outcomes(market_df, risk_table, precision)
+
+    return results.drop(columns=['geography', 'health_age_group'])
+
+def calculate_scenario_health_outcomes(scenarios_df, country_map=COUNTRY_MAP, precision=None):
+    """Health outcomes of all scenarios, one row per scenario and factor, with the market code in 'code'."""
+    results = []
+    for code in country_map:
+        country_results = calculate_country_health_outcomes(code, scenarios_df, country_map, precision)
+        if not country_results.empty:
+            results.append(country_results.assign(code=code))
+
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+def calculate_geography_health_outcomes(scenarios_df, geographies, populations=None, hierarchy=GEOGRAPHY_PARENTS,
+                                        precision=None, report=False):
+    """
+    Health outcomes of scenarios in any list of geographies, one row per scenario, geography and factor.
+
+    scenarios_df needs 'gender', 'geography' (where its customers are counted) and
+    'newly_active_customers' columns and may carry 'newly_fairly_active_customers' and survey
+    age groups in 'age_group', as calculate_country_health_outcomes. Each scenario is evaluated
+    in every one of geographies that is its own geography or lies below it in hierarchy (the
+    regions of England for an England scenario), with its customers scaled by the population
+    share of that geography ('population_share', from populations, which defaults to
+    load_populations). The parameters of every geography are resolved in one batch, a region
+    without its own data taking those of its country and then global data (see resolve_rows),
+    and every scenario and geography is evaluated in one pass, so a breakdown into hundreds of
+    geographies costs about as much as one country. Input data and fallbacks are printed when
+    report is True.
+    """
+    lineage = geography_lineage(geographies, hierarchy)
+    if populations is None and (lineage['depth'] > 0).any():
+        populations = load_populations()
+    lineage['population_share'] = population_shares(lineage, populations) if populations is not None else 1.0
+
+    scenarios = scenarios_df.rename(columns={'geography': 'scenario_geography'})
+    scenarios['ancestor'] = geography_key(scenarios['scenario_geography']).to_numpy()
+    expanded = scenarios.merge(lineage, on='ancestor', how='inner').drop(columns=['ancestor', 'depth'])
+
+    if expanded.empty:
+        return pd.DataFrame()
+
+    for column in ['newly_active_customers', 'newly_fairly_active_customers']:
+        if column in expanded.columns:
+            expanded[column] = expanded[column] * expanded['population_share']
+    expanded['gender'] = expanded['gender'].str.lower()
+    expanded['health_age_group'] = health_age_groups(expanded)
+
+    risk_table = get_risk_table(expanded['gender'].unique(), expanded['geography'].unique(),
+                                age_groups=expanded['health_age_group'].unique(), report=report, hierarchy=hierarchy)
+
+    results = evaluate_health_outcomes(expanded, risk_table, precision)
+
+    return results.drop(columns='health_age_group')
@@ -24,12 +24,12 @@ This output serves as input to adjusted_cost_per_case_calculator.py.
 
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
 import os
 
-# Load the data
-input_file_path = 'data/inputs/healthcare_expenditure.xlsx'
-df = pd.read_excel(input_file_path, sheet_name="normalised")
+INPUT_FILE_PATH = 'data/inputs/healthcare_expenditure.xlsx'
+
+# Define the years range
+YEARS_RANGE = [str(year) for year in range(2008, 2022)]  # Columns for years 2008 to 2021
 
 def predict_next_years(country_data, years, n_years=3, mode="normal", weight_recent_years=3.0, num_recent_years=3):
     
@@ -37,6 +37,9 @@ def predict_next_years(country_data, years, n_years=3, mode="normal", weight_rec
     Predict the next n_years of data using simple or weighted linear regression.
     """
 
+    # Imported here so the rest of the model does not pay for loading sklearn
+    from sklearn.linear_model import LinearRegression
+
     # Extract years and values for fitting the model
     historical_years = np.array(years, dtype=int)
     historical_values = pd.to_numeric(country_data[years], errors='coerce').values
@@ -69,37 +72,42 @@ def predict_next_years(country_data, years, n_years=3, mode="normal", weight_rec
     
     return predictions.flatten()
 
-# Define the years range
-years_range = [str(year) for year in range(2008, 2022)]  # Columns for years 2008 to 2021
+def predict_healthcare_expenditure(df, years_range=YEARS_RANGE, mode="weighted", weight_recent_years=3, num_recent_years=6):
+    """Add 2022-2024 predictions to every country of df, excluding the UK baseline from the result."""
 
-# Create a copy of the original dataframe to add predictions
-predictions_df = df.copy()
+    # Create a copy of the original dataframe to add predictions
+    predictions_df = df.copy()
 
-# Add columns for predicted years
-for year in range(2022, 2025):
-    predictions_df[str(year)] = np.nan
+    # Add columns for predicted years
+    for year in range(2022, 2025):
+        predictions_df[str(year)] = np.nan
 
-# Loop through each row and apply the prediction model
-mode = "weighted"  # Change to "normal" for unweighted mode
-weight_recent_years = 3  # Adjust this value to change the emphasis in weighted mode
-num_recent_years = 6  # Last X years will get the weight
+    # Loop through each row and apply the prediction model
+    for index, row in predictions_df.iterrows():
+        predicted_values = predict_next_years(row, years_range, mode=mode, weight_recent_years=weight_recent_years, num_recent_years=num_recent_years)
 
-for index, row in predictions_df.iterrows():
-    historical_values = row[years_range]
-    predicted_values = predict_next_years(row, years_range, mode=mode, weight_recent_years=weight_recent_years, num_recent_years=num_recent_years)
-    
-    # Fill in historical values
-    for year, value in zip(years_range, historical_values):
-        predictions_df.at[index, year] = value
-    
-    # Fill in predicted values
-    for year, value in zip(range(2022, 2025), predicted_values):
-        predictions_df.at[index, str(year)] = value
+        # Fill in predicted values
+        for year, value in zip(range(2022, 2025), predicted_values):
+            predictions_df.at[index, str(year)] = value
+
+    return predictions_df[predictions_df['Country Name'] != 'United Kingdom']
+
+def main():
+    # Load the data
+    df = pd.read_excel(INPUT_FILE_PATH, sheet_name="normalised")
+
+    mode = "weighted"  # Change to "normal" for unweighted mode
+    weight_recent_years = 3  # Adjust this value to change the emphasis in weighted mode
+    num_recent_years = 6  # Last X years will get the weight
+
+    predictions_df = predict_healthcare_expenditure(df, YEARS_RANGE, mode, weight_recent_years, num_recent_years)
+
+    # Save the results
+    output_dir = os.path.dirname(INPUT_FILE_PATH)
+    output_file_path = os.path.join(output_dir, 'predicted_healthcare_expenditure.xlsx')
+    predictions_df.to_excel(output_file_path, index=False)
 
-# Save the results
-predictions_df=predictions_df[predictions_df['Country Name']!='United Kingdom']
-output_dir = os.path.dirname(input_file_path)
-output_file_path = os.path.join(output_dir, 'predicted_healthcare_expenditure.xlsx')
-predictions_df.to_excel(output_file_path, index=False)
+    print(f"Predictions have been saved to: {output_file_path}")
 
-print(f"Predictions have been saved to: {output_file_path}")
+if __name__ == "__main__":
+    main()
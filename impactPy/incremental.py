@@ -0,0 +1,144 @@
+
+"""
+Helpers for re-evaluating only what changed between runs.
+
+The survey-derived rates (% yes, % price_barrier, age proportions) are persisted separately from the
+market multipliers (non-customers from the penetration workbooks, change from the activity summaries),
+so a penetration or activity update only re-applies the join and multiply in the elasticity stage.
+Downstream stages then recalculate the scenario_ids whose inputs changed and keep their previous
+results for every other scenario.
+
+Stored outputs are stale when a source file is newer, and also when they were calculated with other
+run parameters (e.g. the compute precision): the parameters of every output are recorded next to
+it, in <output>.parameters.json.
+"""
+
+
+import json
+import os
+import numpy as np
+import pandas as pd
+
+def parameters_path(output_path):
+    """Path of the file recording the run parameters of output_path."""
+    return f'{output_path}.parameters.json'
+
+def save_parameters(output_path, parameters):
+    """Record the run parameters (a JSON-serialisable dict) output_path was calculated with."""
+    with open(parameters_path(output_path), 'w') as f:
+        json.dump(parameters, f, sort_keys=True)
+
+def stored_parameters(output_path):
+    """Run parameters recorded for output_path, or None if there is no readable record."""
+    try:
+        with open(parameters_path(output_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def is_current(output_path, source_paths, parameters=None):
+    """
+    True if output_path exists and is at least as recent as every source file and, when parameters
+    are given, was calculated with the same parameters (see save_parameters).
+    """
+    if not os.path.exists(output_path):
+        return False
+
+    if parameters is not None and stored_parameters(output_path) != json.loads(json.dumps(parameters)):
+        return False
+
+    output_time = os.path.getmtime(output_path)
+    return all(os.path.getmtime(path) <= output_time for path in source_paths)
+
+def load_or_calculate_rates(rates_path, source_paths, calculate, tables=(), parameters=None):
+    """
+    Return the survey-derived rates stored in rates_path (one sheet per table), recalculating
+    and saving them only when one of the source files is newer than the stored rates, they were
+    calculated with other parameters or one of the expected tables is missing from them.
+    """
+    if is_current(rates_path, source_paths, parameters):
+        rates = pd.read_excel(rates_path, sheet_name=None)
+        if all(table in rates for table in tables):
+            print(f"Survey unchanged, reusing rates from {rates_path}")
+            return rates
+
+    rates = calculate()
+
+    with pd.ExcelWriter(rates_path) as writer:
+        for name, table in rates.items():
+            table.to_excel(writer, sheet_name=name, index=False)
+    if parameters is not None:
+        save_parameters(rates_path, parameters)
+
+    return rates
+
+def read_previous_outcomes(output_path, source_paths, sheet_name=0, parameters=None):
+    """
+    Read the outcomes of the previous run, or None if they are missing, older than any source or
+    were calculated with other parameters.
+    """
+    if not is_current(output_path, source_paths, parameters):
+        return None
+
+    previous = pd.read_excel(output_path, sheet_name=sheet_name)
+
+    if isinstance(previous, dict):
+        previous = pd.concat(previous.values(), ignore_index=True) if previous else None
+
+    return previous
+
+def distinct_rows(df, value_columns, key='scenario_id'):
+    """The distinct value_columns rows of every key, sorted and indexed by (key, position within the key)."""
+    rows = df[[key] + value_columns].drop_duplicates().sort_values([key] + value_columns, kind='stable')
+    return rows.set_index([key, rows.groupby(key).cumcount()])[value_columns]
+
+def changed_scenario_ids(previous_df, current_df, value_columns, key='scenario_id'):
+    """
+    Return the scenario_ids of current_df that are new or whose value_columns differ from previous_df.
+    Every distinct row of a scenario is compared (e.g. the Female and Male rows of an age group scenario).
+    """
+    if previous_df is None or previous_df.empty:
+        return set(current_df[key])
+
+    current_values = distinct_rows(current_df, value_columns, key)
+    previous_values = distinct_rows(previous_df, value_columns, key)
+    aligned = previous_values.reindex(current_values.index)
+
+    unchanged = np.isclose(current_values.to_numpy(dtype=float), aligned.to_numpy(dtype=float),
+                           rtol=1e-9, atol=0, equal_nan=True).all(axis=1)
+    changed = set(current_values.index.get_level_values(0)[~unchanged])
+
+    # Scenarios that lost rows since the previous run
+    row_counts = current_values.groupby(level=0).size()
+    previous_counts = previous_values.groupby(level=0).size().reindex(row_counts.index, fill_value=0)
+    return changed | set(row_counts.index[row_counts != previous_counts])
+
+def update_outcomes(previous_outcomes, scenarios_df, calculate, value_columns, key='scenario_id'):
+    """
+    Recalculate outcomes only for the scenarios whose inputs changed.
+
+    calculate receives the subset of scenarios_df to evaluate and returns outcome rows carrying `key`.
+    Outcomes of unchanged scenarios are taken from previous_outcomes; scenarios no longer present are dropped.
+    """
+    changed = changed_scenario_ids(previous_outcomes, scenarios_df, value_columns, key)
+    print(f"Recalculating {len(changed)} of {scenarios_df[key].nunique()} scenarios")
+
+    if previous_outcomes is None:
+        return calculate(scenarios_df)
+
+    kept = previous_outcomes[previous_outcomes[key].isin(set(scenarios_df[key]) - changed)]
+    results = [kept]
+
+    if changed:
+        results.append(calculate(scenarios_df[scenarios_df[key].isin(changed)]))
+
+    combined = pd.concat(results, ignore_index=True)
+
+    if combined.empty:
+        return combined
+
+    # Keep the scenario order of the current inputs
+    order = {scenario_id: i for i, scenario_id in enumerate(pd.unique(scenarios_df[key]))}
+    combined = combined.sort_values(key, key=lambda ids: ids.map(order), kind='stable')
+
+    return combined.reset_index(drop=True)
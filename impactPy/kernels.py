@@ -0,0 +1,250 @@
+
+"""
+Grouped weighted statistics and activity minutes, with an optional compiled backend.
+
+The hot reductions of the summaries and elasticity stages are expressed on integer group codes
+(0..n_groups-1, negative codes left out) instead of pandas groupbys:
+
+- group_sums: weighted sums of one or more series per group, accumulated in float64;
+- group_weighted_quantiles: weighted quantiles per group, the median as weighted_median;
+- weekly_activity: weekly minutes, intensity and weighted minutes of one activity per respondent.
+
+Each has two backends. 'numpy' is whole-array NumPy. 'numba' compiles the plain loops below
+with Numba: one pass over the rows, with no temporaries beyond the outputs. The backend is chosen
+by KERNEL_SETTINGS['backend']: 'auto' uses Numba when it is installed and NumPy otherwise, so the
+model runs unchanged without it. Both backends give the same numbers (see impactPy.equivalence),
+and python -m impactPy.benchmark compares them.
+"""
+
+
+import importlib.util
+from functools import lru_cache
+
+import numpy as np
+
+from .precision import ACCUMULATOR
+
+KERNEL_BACKENDS = ['numpy', 'numba']
+
+KERNEL_SETTINGS = {
+    'backend': 'auto'
+}
+
+def numba_available():
+    return importlib.util.find_spec('numba') is not None
+
+def available_backends():
+    """Kernel backends that can run here."""
+    return [backend for backend in KERNEL_BACKENDS if backend != 'numba' or numba_available()]
+
+def resolve_backend(backend=None):
+    """Backend to run: backend, or KERNEL_SETTINGS['backend'] when None, with 'auto' resolved."""
+    backend = backend or KERNEL_SETTINGS['backend']
+    if backend == 'auto':
+        return 'numba' if numba_available() else 'numpy'
+    if backend not in KERNEL_BACKENDS:
+        raise ValueError(f"Unknown kernel backend '{backend}', expected 'auto' or one of {KERNEL_BACKENDS}")
+    if backend == 'numba' and not numba_available():
+        raise ValueError("The numba kernel backend needs Numba installed (pip install numba)")
+    return backend
+
+# Loops compiled by Numba
+
+def _group_sums_loop(codes, values, n_groups):
+    sums = np.zeros((values.shape[0], n_groups))
+    for row in range(codes.shape[0]):
+        code = codes[row]
+        if code >= 0:
+            for series in range(values.shape[0]):
+                sums[series, code] += values[series, row]
+    return sums
+
+def _group_quantiles_loop(starts, ends, values, weights, quantiles):
+    """Quantiles of the groups laid end to end, group g at rows starts[g]..ends[g]-1 in any order."""
+    result = np.full((quantiles.shape[0], starts.shape[0]), np.nan)
+    for group in range(starts.shape[0]):
+        start, end = starts[group], ends[group]
+        if end == start:
+            continue
+
+        # Sort by value, then by weight among equal values
+        order = np.argsort(values[start:end], kind='mergesort')
+        group_values, group_weights = values[start:end][order], weights[start:end][order]
+        run = 0
+        for row in range(1, end - start + 1):
+            if row == end - start or group_values[row] != group_values[run]:
+                if row - run > 1:
+                    group_weights[run:row] = np.sort(group_weights[run:row])
+                run = row
+
+        total = 0.0
+        for row in range(end - start):
+            total += group_weights[row]
+
+        for position in range(quantiles.shape[0]):
+            target = quantiles[position] * total
+
+            # Last row whose cumulative weight is at most the target
+            cumulative, last = 0.0, -1
+            at_target = False
+            for row in range(end - start):
+                cumulative += group_weights[row]
+                if cumulative <= target:
+                    last = row
+                    at_target = cumulative == target
+                else:
+                    break
+
+            if at_target and last + 1 < end - start:
+                result[position, group] = (group_values[last] + group_values[last + 1]) / 2
+            else:
+                result[position, group] = group_values[min(last + 1, end - start - 1)]
+    return result
+
+def _weekly_activity_loop(customers, a_frequency, a_duration, a_intensity, b_frequency, b_duration, b_intensity,
+                          day_table, position_table, intensity_weights, min_duration, minutes, positions, weighted):
+    for row in range(customers.shape[0]):
+        if customers[row]:
+            frequency, duration, intensity = a_frequency[row], a_duration[row], a_intensity[row]
+        else:
+            frequency, duration, intensity = b_frequency[row], b_duration[row], b_intensity[row]
+
+        # Codes index the tables; missing and other codes count 0 days and position 0
+        days = 0.0
+        if frequency >= 0 and frequency < day_table.shape[0] and frequency == int(frequency):
+            days = day_table[int(frequency)]
+        position = 0
+        if intensity >= 0 and intensity < position_table.shape[0] and intensity == int(intensity):
+            position = position_table[int(intensity)]
+
+        if min_duration > 0 and not duration >= min_duration:
+            minutes[row] = 0
+        else:
+            minutes[row] = days * duration
+        positions[row] = position
+
+        value = minutes[row]
+        weighted[row] = value * intensity_weights[position] if value > 0 else 0.0
+
+@lru_cache(maxsize=None)
+def numba_kernels():
+    """The loops above compiled with Numba, imported here so the model runs without it installed."""
+    import numba
+
+    return {
+        'group_sums': numba.njit(cache=True)(_group_sums_loop),
+        'group_quantiles': numba.njit(cache=True)(_group_quantiles_loop),
+        'weekly_activity': numba.njit(cache=True)(_weekly_activity_loop)
+    }
+
+# Kernels
+
+def group_sums(codes, values, n_groups, backend=None):
+    """
+    Sums of values per group code 0..n_groups-1, accumulated in float64; negative codes are left out.
+
+    values: one series (n,) or several (series, n); the sums have shape (n_groups,) or (series, n_groups).
+    """
+    codes, values = np.asarray(codes, dtype=np.int64), np.asarray(values)
+    series = np.atleast_2d(values)
+
+    if resolve_backend(backend) == 'numba':
+        sums = numba_kernels()['group_sums'](codes, series, n_groups)
+    else:
+        if codes.size and codes.min() < 0:
+            kept = codes >= 0
+            codes, series = codes[kept], series[:, kept]
+        sums = np.stack([np.bincount(codes, weights=row, minlength=n_groups) for row in series]).astype(ACCUMULATOR, copy=False)
+
+    return sums[0] if values.ndim == 1 else sums
+
+def group_weighted_quantiles(codes, values, weights, n_groups, quantiles=(0.5,), backend=None):
+    """
+    Weighted quantiles of values per group code, shape (len(quantiles), n_groups); NaN for empty groups.
+
+    The quantile q of a group is its smallest value whose cumulative weight (in value order) passes
+    q x total weight, or the mean of that value and the previous one when a cumulative weight equals
+    it exactly. For q = 0.5 this is weighted_median, of every group at once.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    values, weights = np.asarray(values, dtype=float), np.asarray(weights, dtype=float)
+    quantiles = np.atleast_1d(np.asarray(quantiles, dtype=float))
+
+    kept = codes >= 0
+    counts = np.bincount(codes[kept], minlength=n_groups)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+
+    if resolve_backend(backend) == 'numba':
+        # Groups end to end, sorted within each group by the compiled loop
+        order = np.flatnonzero(kept)[np.argsort(codes[kept], kind='stable')]
+        return numba_kernels()['group_quantiles'](starts, ends, values[order], weights[order], quantiles)
+
+    order = np.flatnonzero(kept)[np.lexsort((weights[kept], values[kept], codes[kept]))]
+    sorted_values, sorted_weights = values[order], weights[order]
+
+    result = np.full((len(quantiles), n_groups), np.nan)
+    for group in np.flatnonzero(ends > starts):
+        group_values = sorted_values[starts[group]:ends[group]]
+        cumulative = np.cumsum(sorted_weights[starts[group]:ends[group]])
+        targets = quantiles * cumulative[-1]
+
+        last = np.searchsorted(cumulative, targets, side='right') - 1
+        following = np.minimum(last + 1, len(group_values) - 1)
+        at_target = (last >= 0) & (cumulative[np.maximum(last, 0)] == targets)
+        result[:, group] = np.where(at_target, (group_values[np.maximum(last, 0)] + group_values[following]) / 2,
+                                    group_values[following])
+    return result
+
+def weekly_activity(customers, section_a, section_b, frequency_days, intensity_codes, intensity_weights,
+                    min_duration=0, dtype=np.float64, backend=None):
+    """
+    Weekly minutes, intensity position and weighted minutes of one activity for every respondent.
+
+    customers: True where the respondent answers section_a, otherwise section_b
+    section_a, section_b: (frequency, duration, intensity) answer arrays
+    frequency_days: days per week of each (non-negative integer) frequency code; other codes count 0 days
+    intensity_codes: (non-negative integer) intensity codes in position order from 1; other codes get position 0
+    intensity_weights: weight of each intensity position, from 0
+    min_duration: sessions shorter than this many minutes do not count (0 for no minimum)
+
+    Weekly minutes = days x duration, in dtype; weighted minutes = weekly minutes x intensity
+    weight where positive, in float64.
+    """
+    customers = np.asarray(customers, dtype=bool)
+    dtype = np.dtype(dtype)
+    day_codes = np.array(list(frequency_days), dtype=float)
+    day_values = np.array(list(frequency_days.values()), dtype=float)
+    intensity_codes = np.asarray(intensity_codes, dtype=float)
+    intensity_weights = np.asarray(intensity_weights, dtype=float)
+
+    if resolve_backend(backend) == 'numba':
+        # Lookup tables indexed by the (non-negative integer) codes
+        day_table = np.zeros(int(max(day_codes.max(), 0)) + 1)
+        day_table[day_codes.astype(int)] = day_values
+        position_table = np.zeros(int(max(intensity_codes.max(), 0)) + 1, dtype=np.int8)
+        position_table[intensity_codes.astype(int)] = np.arange(1, len(intensity_codes) + 1)
+
+        answers = [np.asarray(answer, dtype=float) for answer in (*section_a, *section_b)]
+        minutes = np.empty(len(customers), dtype=dtype)
+        positions = np.empty(len(customers), dtype=np.int8)
+        weighted = np.empty(len(customers), dtype=ACCUMULATOR)
+        numba_kernels()['weekly_activity'](customers, *answers, day_table, position_table, intensity_weights,
+                                           float(min_duration), minutes, positions, weighted)
+        return minutes, positions, weighted
+
+    frequency, duration, intensity = (np.where(customers, np.asarray(a, dtype=dtype), np.asarray(b, dtype=dtype))
+                                      for a, b in zip(section_a, section_b))
+
+    days = np.zeros(len(customers), dtype=dtype)
+    for code, value in zip(day_codes, day_values):
+        days[frequency == code] = value
+    positions = np.zeros(len(customers), dtype=np.int8)
+    for position, code in enumerate(intensity_codes, start=1):
+        positions[intensity == code] = position
+
+    minutes = days * duration
+    if min_duration > 0:
+        minutes = np.where(duration >= min_duration, minutes, dtype.type(0))
+    weighted = np.where(minutes > 0, minutes * intensity_weights.astype(dtype)[positions], 0).astype(ACCUMULATOR)
+    return minutes, positions, weighted
@@ -0,0 +1,57 @@
+
+"""
+Survey code mappings and market constants shared by every stage of the model.
+"""
+
+
+GENDER_MAPPING = {1: "Male", 2: "Female", 3: "Others", 4: "Prefer not to answer"}
+AGE_MAPPING = {2: "Young Adults (16-35)", 3: "Young Adults (16-35)",
+               4: "Old Adults (>35)", 5: "Old Adults (>35)", 6: "Old Adults (>35)", 7: "Old Adults (>35)"}
+MARKET_MAPPING = {1: "Australia", 2: "Canada", 3: "Germany", 4: "Ireland", 5: "Japan",
+                  6: "KSA (Saudi Arabia)", 7: "New Zealand", 8: "Singapore", 9: "Spain",
+                  10: "USA (United States of America)"}
+COLUMN_MAPPING = {1: "AU", 2: "CA", 3: "DE", 4: "IE", 5: "JP", 6: "SA", 7: "NZ", 8: "SG", 9: "ES", 10: "US"}
+
+# Income level mapping
+INCOME_MAPPINGS = {
+    1: {1: 'Low', 2: 'Middle', 3: 'Middle', 4: 'Middle', 5: 'Middle', 6: 'Middle', 7: 'High', 8: 'High'},  # Australia
+    2: {1: 'Low', 2: 'Middle', 3: 'Middle', 4: 'Middle', 5: 'Middle', 6: 'Middle', 7: 'High', 8: 'High'},  # Canada
+    3: {1: 'Low', 2: 'Middle', 3: 'Middle', 4: 'Middle', 5: 'Middle', 6: 'High'},  # Germany
+    4: {1: 'Low', 2: 'Middle', 3: 'Middle', 4: 'Middle', 5: 'Middle', 6: 'Middle', 7: 'High', 8: 'High'},  # Ireland
+    5: {1: 'Low', 2: 'Middle', 3: 'Middle', 4: 'Middle', 5: 'High', 6: 'High'},  # Japan
+    6: {1: 'Low', 2: 'Middle', 3: 'Middle', 4: 'Middle', 5: 'Middle', 6: 'Middle', 7: 'High', 8: 'High'},  # Saudi Arabia
+    7: {1: 'Low', 2: 'Middle', 3: 'Middle', 4: 'Middle', 5: 'Middle', 6: 'Middle', 7: 'High', 8: 'High'},  # New Zealand
+    8: {1: 'Low', 2: 'Middle', 3: 'Middle', 4: 'Middle', 5: 'High', 6: 'High'},  # Singapore
+    9: {1: 'Low', 2: 'Middle', 3: 'Middle', 4: 'Middle', 5: 'Middle', 6: 'High', 7: 'High', 8: 'High'},  # Spain
+    10: {1: 'Low', 2: 'Middle', 3: 'Middle', 4: 'Middle', 5: 'Middle', 6: 'Middle', 7: 'High', 8: 'High'}  # USA
+}
+
+CURRENCY_RATES = {
+    "Australia": 0.64, "Canada": 0.73, "Germany": 1.05, "Ireland": 1.05, "Japan": 0.0067,
+    "KSA (Saudi Arabia)": 0.27, "New Zealand": 0.59, "Singapore": 0.73, "Spain": 1.05,
+    "USA (United States of America)": 1
+}
+
+# Survey pricing scenarios (Q14a-e) and the discount each one offers
+SCENARIOS = ['Q14a', 'Q14b', 'Q14c', 'Q14d', 'Q14e']
+DISCOUNTS = {'Q14a': '10%', 'Q14b': '20%', 'Q14c': '40%', 'Q14d': '60%', 'Q14e': '80%'}
+
+# Scenario id prefixes and the geography names used by the health data
+COUNTRY_MAP = {
+    "SIN": "Singapore",
+    "NEW": "Newzealand",
+    "SPA": "Spain",
+    "JAP": "Japan",
+    "CAN": "Canada",
+    "AUS": "Australia",
+    "GER": "Germany",
+    "IRE": "Ireland",
+    "USA": "America",
+    "KSA": "KSA"
+}
+
+# Parent of every geography below a country of the health data (see impactPy.geography); countries
+# have no parent and fall back to global data
+ENGLISH_REGIONS = ['North East', 'North West', 'Yorkshire and The Humber', 'East Midlands', 'West Midlands',
+                   'East', 'London', 'South East', 'South West']
+GEOGRAPHY_PARENTS = {region: 'england' for region in ENGLISH_REGIONS}
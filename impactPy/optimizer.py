@@ -0,0 +1,241 @@
+
+"""
+Discount policy optimizer.
+
+Chooses one discount per market (or per market and gender) to maximise the total health and
+social value of the policy, subject to a budget on the discount given to new customers and a
+minimum number of new customers.
+
+The options are the rows of the consolidated results (see impactPy.consolidation), so every
+price tier of the elasticity stage is a candidate; running the pipeline with --discounts gives
+a finer grid. For every option, in US$ (converted with the exchange rate of the business outcome):
+
+- health value = total health saving
+- social value = new customers x social change x social_value (US$ per customer for a full change of 1)
+- discount cost = new customers' average spend x discount
+
+The discount cost counts the spend of new customers only: the discount existing customers would
+also receive is not part of the consolidated results, so the budget is not the total revenue
+foregone by the policy.
+
+An allocation is one option index per unit; its value, cost and new customers are sums of
+per-option arrays. When the number of allocations is small enough (6 options over 10 markets is
+60 million) all of them are evaluated, as broadcast sums of the totals of two halves of the
+units, and the best is exact; otherwise a beam search keeps the best partial allocations unit
+by unit.
+"""
+
+
+import numpy as np
+import pandas as pd
+
+OPTIMIZER_SETTINGS = {
+    'unit': 'market',
+    'budget': None,
+    'min_new_customers': None,
+    'social_value': 0.0,
+    'include_no_discount': True
+}
+
+UNIT_COLUMNS = {'market': ['market'], 'gender': ['market', 'gender']}
+
+OPTION_COLUMNS = ['new_customers', 'newly_active_customers', 'health_value', 'social_value', 'policy_value',
+                  'discount_cost']
+
+def build_options(results, unit='market', social_value=0.0, include_no_discount=True):
+    """
+    One row per (unit, price) with its policy value (health + social), discount cost and new customers in US$.
+
+    results: consolidated results (consolidate_results); health outcomes exist for gender
+    scenarios only, so units are markets (Female + Male) or market x gender.
+    social_value: US$ per new customer for a social change of 1 (0 leaves social value out).
+    include_no_discount adds a 0% option with no cost and no value, so a unit can be left out.
+    """
+    if unit not in UNIT_COLUMNS:
+        raise ValueError(f"Unknown unit '{unit}', expected one of {list(UNIT_COLUMNS)}")
+
+    rows = results[results['segment'] == 'gender'].rename(columns={'value': 'gender'})
+    rows['discount'] = rows['price'].astype(str).str.rstrip('%').astype(float)
+
+    exchange_rate = rows['economic_outcome_avg_$'] / rows['economic_outcome_avg_local']
+    rows['health_value'] = rows['total_saving'].fillna(0) * exchange_rate
+    rows['social_value'] = rows['new_customers'] * rows['social_change'].fillna(0) * social_value
+    rows['policy_value'] = rows['health_value'] + rows['social_value']
+    rows['discount_cost'] = rows['economic_outcome_avg_$'] * rows['discount'] / 100
+    rows = rows.dropna(subset=['discount_cost', 'policy_value'])
+
+    keys = UNIT_COLUMNS[unit] + ['price', 'discount']
+    options = rows.groupby(keys, sort=False)[OPTION_COLUMNS].sum().reset_index()
+
+    if include_no_discount:
+        no_discount = options[UNIT_COLUMNS[unit]].drop_duplicates().assign(price='0%', discount=0.0)
+        for column in OPTION_COLUMNS:
+            no_discount[column] = 0.0
+        options = pd.concat([no_discount, options], ignore_index=True)
+
+    options = options.sort_values(UNIT_COLUMNS[unit] + ['discount'], kind='stable').reset_index(drop=True)
+    return options
+
+def option_arrays(options, unit='market'):
+    """
+    Units and (units, options) arrays of value, cost and new customers, options packed to the
+    left; the number of options of each unit is its radix.
+    """
+    unit_columns = UNIT_COLUMNS[unit]
+    units = options[unit_columns].drop_duplicates().reset_index(drop=True)
+    unit_index = pd.MultiIndex.from_frame(units).get_indexer(pd.MultiIndex.from_frame(options[unit_columns]))
+
+    position = options.groupby(unit_index, sort=False).cumcount().to_numpy()
+    radix = np.bincount(unit_index, minlength=len(units))
+
+    arrays = {'option_row': np.full((len(units), radix.max()), -1)}
+    arrays['option_row'][unit_index, position] = np.arange(len(options))
+    for column, option_column in [('value', 'policy_value'), ('cost', 'discount_cost'), ('new_customers', 'new_customers')]:
+        arrays[column] = np.zeros((len(units), radix.max()))
+        arrays[column][unit_index, position] = options[option_column].to_numpy(dtype=float)
+
+    return units, radix, arrays
+
+def decode_allocations(indices, radix):
+    """Option index of every unit for allocation numbers in mixed radix (first unit most significant)."""
+    choices = np.empty((len(indices), len(radix)), dtype=np.int64)
+    for position in range(len(radix) - 1, -1, -1):
+        choices[:, position] = indices % radix[position]
+        indices = indices // radix[position]
+    return choices
+
+def evaluate_allocations(arrays, choices):
+    """Total value, cost and new customers of every allocation (rows of choices)."""
+    units = np.arange(choices.shape[1])
+    return {column: arrays[column][units, choices].sum(axis=1) for column in ['value', 'cost', 'new_customers']}
+
+def feasible(totals, budget=None, min_new_customers=None):
+    mask = np.ones(np.shape(totals['value']), dtype=bool)
+    if budget is not None:
+        mask &= totals['cost'] <= budget
+    if min_new_customers is not None:
+        mask &= totals['new_customers'] >= min_new_customers
+    return mask
+
+def half_totals(arrays, radix, units):
+    """Choices and totals of every allocation of a subset of the units."""
+    choices = decode_allocations(np.arange(int(np.prod(radix[units], dtype=np.int64))), radix[units])
+    totals = evaluate_allocations({column: arrays[column][units] for column in ['value', 'cost', 'new_customers']}, choices)
+    return choices, totals
+
+def search_exhaustive(arrays, radix, budget=None, min_new_customers=None, chunk_size=2**22):
+    """
+    Best feasible allocation over all allocations. The units are split in two halves whose
+    allocations are enumerated once; every allocation is then a (left, right) pair, and the
+    totals of a chunk of left allocations against all right allocations are one broadcast sum.
+    """
+    split = np.searchsorted(np.cumsum(np.log(radix)), np.log(radix).sum() / 2, side='right')
+    left_units, right_units = np.arange(split), np.arange(split, len(radix))
+    left_choices, left = half_totals(arrays, radix, left_units)
+    right_choices, right = half_totals(arrays, radix, right_units)
+
+    best_value, best_choice = -np.inf, None
+    rows_per_chunk = max(1, chunk_size // len(right_choices))
+
+    for start in range(0, len(left_choices), rows_per_chunk):
+        rows = slice(start, start + rows_per_chunk)
+        totals = {column: left[column][rows, None] + right[column][None, :] for column in left}
+        values = np.where(feasible(totals, budget, min_new_customers), totals['value'], -np.inf)
+
+        best = np.unravel_index(np.argmax(values), values.shape)
+        if values[best] > best_value:
+            best_value = values[best]
+            best_choice = np.concatenate([left_choices[start + best[0]], right_choices[best[1]]])
+
+    return best_choice, len(left_choices) * len(right_choices)
+
+def frontier(cost, benefit):
+    """Positions of the allocations no other allocation beats on both lower cost and higher benefit, by cost."""
+    order = np.lexsort((-benefit, cost))
+    best_before = np.concatenate([[-np.inf], np.maximum.accumulate(benefit[order])[:-1]])
+    return order[benefit[order] > best_before]
+
+def search_beam(arrays, radix, budget=None, min_new_customers=None, beam_width=20000):
+    """
+    Best allocation found by a beam search over units: partial allocations are extended by every
+    option of the next unit, those that can no longer meet the constraints are dropped, and of
+    the rest only the cost/value frontier is kept (with the cost/new customer frontier when there
+    is a customer target), thinned evenly along cost to beam_width.
+    """
+    n_units = len(radix)
+    # Most new customers the units after each position can still add
+    best_customers = np.where(np.arange(arrays['new_customers'].shape[1]) < radix[:, None], arrays['new_customers'], -np.inf).max(axis=1)
+    remaining_customers = np.concatenate([np.cumsum(best_customers[::-1])[::-1][1:], [0.0]])
+
+    choices = np.zeros((1, 0), dtype=np.int64)
+    totals = {column: np.zeros(1) for column in ['value', 'cost', 'new_customers']}
+    evaluated = 0
+
+    for unit in range(n_units):
+        options = np.arange(radix[unit])
+        parents = np.repeat(np.arange(len(choices)), len(options))
+        picks = np.tile(options, len(choices))
+
+        totals = {column: totals[column][parents] + arrays[column][unit, picks] for column in totals}
+        choices = np.column_stack([choices[parents], picks])
+        evaluated += len(picks)
+
+        reachable = dict(totals, new_customers=totals['new_customers'] + remaining_customers[unit])
+        possible = np.flatnonzero(feasible(reachable, budget, min_new_customers))
+        if len(possible) == 0:
+            return None, evaluated
+
+        kept = possible[frontier(totals['cost'][possible], totals['value'][possible])]
+        if min_new_customers is not None:
+            kept = np.union1d(kept, possible[frontier(totals['cost'][possible], totals['new_customers'][possible])])
+            kept = kept[np.argsort(totals['cost'][kept], kind='stable')]
+        if len(kept) > beam_width:
+            kept = kept[np.unique(np.linspace(0, len(kept) - 1, beam_width).round().astype(int))]
+
+        choices = choices[kept]
+        totals = {column: totals[column][kept] for column in totals}
+
+    best = np.where(feasible(totals, budget, min_new_customers), totals['value'], -np.inf)
+    if not np.isfinite(best.max()):
+        return None, evaluated
+    return choices[np.argmax(best)], evaluated
+
+def optimize_discounts(options, unit='market', budget=None, min_new_customers=None,
+                       max_evaluations=10**9, beam_width=20000):
+    """
+    Discount of every unit maximising total value under the constraints.
+
+    options: build_options output
+    budget: most discount cost (US$, on new customers' spend) of the whole policy; None for no limit
+    min_new_customers: fewest new customers of the whole policy; None for no limit
+
+    Returns the chosen option of every unit and a summary (totals, search method, allocations evaluated).
+    Raises ValueError when no allocation meets the constraints.
+    """
+    units, radix, arrays = option_arrays(options, unit)
+    n_allocations = int(np.prod(radix.astype(float)))
+
+    if n_allocations <= max_evaluations:
+        method = 'exhaustive'
+        best_choice, evaluated = search_exhaustive(arrays, radix, budget, min_new_customers)
+    else:
+        method = 'beam'
+        best_choice, evaluated = search_beam(arrays, radix, budget, min_new_customers, beam_width)
+
+    if best_choice is None:
+        raise ValueError("No discount policy meets the budget and new customer constraints")
+
+    policy = options.iloc[arrays['option_row'][np.arange(len(units)), best_choice]].reset_index(drop=True)
+
+    summary = {
+        'method': method,
+        'allocations': n_allocations,
+        'evaluated': evaluated,
+        'total_value': float(policy['policy_value'].sum()),
+        'total_discount_cost': float(policy['discount_cost'].sum()),
+        'total_new_customers': float(policy['new_customers'].sum()),
+        'budget': budget,
+        'min_new_customers': min_new_customers
+    }
+
+    return policy, summary
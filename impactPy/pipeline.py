@@ -0,0 +1,572 @@
+
+"""
+Runs the SROI model end to end, reading inputs from and saving results to the data folder.
+
+Stages (in order):
+    validation     survey codes, health parameter coverage and market penetration checked before any heavy
+                   work; errors stop the run
+    calibration    survey weights raked to population margins by market, gender, age group and income level
+    activity       weekly activity minutes and active flag per respondent (script 1a)
+    summaries      activity and spending summaries by gender, age group and income level, and active
+                   rates over a sweep of activity thresholds (script 1b)
+    elasticity     price elasticity scenarios and new customers (scripts 2a, 2b)
+    business       economic outcomes of new customers (script 3)
+    social         social change of converting non-customers (script 4)
+    health         health outcomes and cost savings of gender and age group scenarios (script 5)
+    consolidation  one results table of business, social and health outcomes per scenario
+    sensitivity    derivatives and elasticities of new customers, spend, cases saved and savings of every
+                   gender scenario with respect to each input, ranked for tornado charts
+    projection     multi-year NPV and health return ratio of every gender scenario
+    cohort         cases, deaths and DALYs saved year by year by the newly active customers of every gender
+                   scenario and disease (Markov cohort model, see impactPy.cohort)
+    optimization   discount per market maximising health and social value under a budget
+
+Usage (from the repository root):
+    python -m impactPy
+    python -m impactPy --stages elasticity business health
+    python -m impactPy --discounts 10 20 30 40 50 60 80    scenarios on a custom price grid (see impactPy.demand_curve)
+    python -m impactPy --stages optimization --budget 3e9 --min-new-customers 5e7
+    python -m impactPy --profile              per-stage time and memory report (see impactPy.profiling)
+    python -m impactPy --calibrated-weights   weighted stages use the calibrated weights (see impactPy.calibration)
+    python -m impactPy --stages validation    only check the inputs (see impactPy.validation)
+    python -m impactPy --precision float32    bulk arrays in single precision (see impactPy.precision)
+
+Every run is also appended to the results warehouse (see impactPy.warehouse) unless --no-warehouse is given.
+"""
+
+
+import argparse
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from .activity import calculate_activity_levels, create_activity_summary, create_spending_summaries
+from .business import calculate_business_outcomes
+from .calibration import CALIBRATED_WEIGHT, CALIBRATION_SETTINGS, WeightCalibration, apply_weights, read_margins
+from .cohort import COHORT_SETTINGS, cohort_yearly_table, simulate_cohorts, summarise_cohorts
+from .elasticity import (MODE_CONFIGS, SURVEY_RATE_TABLES, calculate_survey_rates, prepare_market_data,
+                         process_market_data)
+from .consolidation import consolidate_results
+from .health_functions import (HEALTH_AGE_STRATA, HEALTH_OUTCOME_COLUMNS, HEALTH_SOURCES, RISK_KEY_COLUMNS, get_risk_table,
+                               calculate_country_health_outcomes, health_age_groups, load_health_tables, parameter_values,
+                               resolve_health_parameters, split_scenarios_by_gender)
+from .incremental import load_or_calculate_rates, read_previous_outcomes, save_parameters, update_outcomes
+from .mappings import COUNTRY_MAP
+from .optimizer import OPTIMIZER_SETTINGS, build_options, optimize_discounts
+from .precision import PRECISION_SETTINGS, PRECISIONS, resolve_precision
+from .profiling import PROFILE_DIR, StageProfiler
+from .projection import PROJECTION_SETTINGS, build_projection_inputs, project_sroi, project_yearly_table
+from .sensitivity import SENSITIVITY_SETTINGS, rank_inputs, scenario_sensitivities
+from .social import calculate_social_outcomes, calculate_market_social_outcomes
+from .thresholds import THRESHOLD_SETTINGS, threshold_curves
+from .validation import raise_for_errors, read_raw_tables, required_health_keys, validate_inputs
+from .survey import SURVEY_PATH, SURVEY_SHEET, load_survey, process_data
+from .warehouse import WAREHOUSE_PATH, record_run
+
+SEGMENTS = ['gender', 'age_group', 'income_level']
+
+# Scenario columns carried into the health outcomes; age group scenarios have one row per gender
+HEALTH_SCENARIO_COLUMNS = ['scenario_id', 'segment', 'age_group', 'gender', 'gender_share',
+                           'newly_active_customers', 'newly_fairly_active_customers']
+
+PATHS = {
+    'survey': SURVEY_PATH,
+    'survey_sheet': SURVEY_SHEET,
+    'population_margins': 'data/inputs/population_margins.csv',
+    'validation_report': 'data/outputs/validation_report.xlsx',
+    'calibrated_weights': 'data/outputs/survey_weights.xlsx',
+    # Weights file used by the weighted stages instead of the vendor WEIGHT (None: vendor weights)
+    'survey_weights': None,
+    'activity_output': 'data/outputs/activity_output.xlsx',
+    'activity_summary': {
+        'gender': 'data/outputs/activity_summarised_gender.xlsx',
+        'age_group': 'data/outputs/activity_summarised_age_group.xlsx',
+        'income_level': 'data/outputs/activity_summarised_income_level.xlsx'
+    },
+    'activity_thresholds': 'data/outputs/activity_thresholds.xlsx',
+    'spending_summary': {
+        'gender': 'data/outputs/spending_summarised_gender.xlsx',
+        'age_group': 'data/outputs/spending_summarised_age_group.xlsx',
+        'income_level': 'data/outputs/spending_summarised_income.xlsx'
+    },
+    'market_penetration': {
+        'gender': 'data/inputs/market_penetration_gender.xlsx',
+        'age_group': 'data/inputs/market_penetration_age.xlsx',
+        'income_level': 'data/inputs/market_penetration_income.xlsx'
+    },
+    'survey_rates': 'data/outputs/survey_rates.xlsx',
+    'elasticity_scenarios': {
+        'gender': 'data/outputs/elasticity_scenarios_gender.xlsx',
+        'age_group': 'data/outputs/elasticity_scenarios_age_group.xlsx',
+        'income_level': 'data/outputs/elasticity_scenarios_income.xlsx'
+    },
+    'business_outcome': {
+        'gender': 'data/outputs/business_outcome_gender.xlsx',
+        'age_group': 'data/outputs/business_outcome_age.xlsx',
+        'income_level': 'data/outputs/business_outcome_income.xlsx'
+    },
+    'social_change': {
+        'gender': 'data/outputs/social_change_gender.xlsx',
+        'age_group': 'data/outputs/social_change_age.xlsx',
+        'market': 'data/outputs/social_change_market.xlsx'
+    },
+    'health_outcomes': 'health_outcomes.xlsx',
+    'health_risk_table': 'data/outputs/health_risk_table.xlsx',
+    'sroi_results': 'data/outputs/sroi_results.xlsx',
+    'sroi_sensitivity': 'data/outputs/sroi_sensitivity.xlsx',
+    'sroi_projection': 'data/outputs/sroi_projection.xlsx',
+    'health_cohort': 'data/outputs/health_cohort.xlsx',
+    'discount_policy': 'data/outputs/discount_policy.xlsx',
+    'profiles': PROFILE_DIR,
+    'warehouse': WAREHOUSE_PATH
+}
+
+def load_weighted_survey(paths=PATHS):
+    """Survey with the vendor WEIGHT, or the weights of paths['survey_weights'] when it is set."""
+    survey_df = load_survey(paths['survey'], paths['survey_sheet'])
+    if paths.get('survey_weights'):
+        survey_df = apply_weights(survey_df, pd.read_excel(paths['survey_weights']))
+    return survey_df
+
+def survey_sources(paths=PATHS):
+    """Files behind the weighted survey, for the staleness checks of cached results."""
+    return [paths['survey']] + ([paths['survey_weights']] if paths.get('survey_weights') else [])
+
+def load_segmented_survey(paths=PATHS):
+    """Survey merged with the activity output and mapped to segment labels."""
+    survey_df = load_weighted_survey(paths)
+    activity_df = pd.read_excel(paths['activity_output'])
+    return process_data(pd.merge(survey_df, activity_df, on=['S1', 'dSEGMENT', 'uuid'], how='left'))
+
+def run_validation_stage(paths=PATHS, country_map=COUNTRY_MAP):
+    survey_df = load_weighted_survey(paths)
+    raw_tables = read_raw_tables(HEALTH_SOURCES)
+    market_penetration = {mode: pd.read_excel(path) for mode, path in paths['market_penetration'].items()}
+
+    start = time.perf_counter()
+    report = validate_inputs(survey_df, raw_tables, market_penetration, required_health_keys(country_map))
+    elapsed = time.perf_counter() - start
+
+    report.to_excel(paths['validation_report'], index=False)
+    errors = int((report['severity'] == 'error').sum())
+    print(f"Inputs checked in {elapsed * 1000:.0f} ms: {errors} errors, {len(report) - errors} warnings "
+          f"(report saved to {paths['validation_report']})")
+    for row in report[report['severity'] == 'warning'].itertuples(index=False):
+        print(f"Warning - {row.source}: {row.check} in {row.column} ({row.count} rows, e.g. {row.examples})")
+
+    raise_for_errors(report)
+    return report
+
+def run_calibration_stage(paths=PATHS, settings=CALIBRATION_SETTINGS):
+    if not os.path.exists(paths['population_margins']):
+        print(f"No population margins at {paths['population_margins']}; survey weights are not calibrated")
+        return None
+
+    survey_df = process_data(load_survey(paths['survey'], paths['survey_sheet']))
+    calibration = WeightCalibration(survey_df, read_margins(paths['population_margins']), settings['variables'])
+    weights = calibration.calibrate(settings['method'], settings['bounds'], settings['max_iterations'], settings['tolerance'])
+
+    output_df = survey_df[['S1', 'dSEGMENT', 'uuid', 'market', 'WEIGHT']].assign(**{CALIBRATED_WEIGHT: weights})
+    report = calibration.margin_report(weights)
+
+    with pd.ExcelWriter(paths['calibrated_weights']) as writer:
+        output_df.to_excel(writer, sheet_name='weights', index=False)
+        report.to_excel(writer, sheet_name='margins', index=False)
+        pd.DataFrame([calibration.summary]).to_excel(writer, sheet_name='summary', index=False)
+
+    summary = calibration.summary
+    print(f"Survey weights calibrated ({summary['method']}, {summary['iterations']} iterations): largest margin error "
+          f"{summary['max_error']:.2e}, {summary['trimmed']} weights at bounds, design effect {summary['design_effect']:.3f}")
+    print(f"Calibrated weights saved to {paths['calibrated_weights']}")
+    return output_df, report
+
+def run_activity_stage(paths=PATHS, precision=None):
+    output_df = calculate_activity_levels(load_survey(paths['survey'], paths['survey_sheet']), precision)
+
+    # Save the activity output
+    output_df.to_excel(paths['activity_output'], index=False)
+    return output_df
+
+def run_summary_stage(paths=PATHS, threshold_settings=THRESHOLD_SETTINGS):
+    df = load_segmented_survey(paths)
+
+    # Calculate and save activity summaries
+    activity_summaries = {}
+    for group in SEGMENTS:
+        activity_summaries[group] = create_activity_summary(df, [group])
+        activity_summaries[group].to_excel(paths['activity_summary'][group], index=False)
+
+    # Calculate and save spending summaries
+    spending_summaries = create_spending_summaries(df)
+    for group, spending_summary in spending_summaries.items():
+        spending_summary.to_excel(paths['spending_summary'][group], index=False)
+
+    # Active rates under other threshold and intensity definitions, for every market and segment
+    curves = threshold_curves(df, SEGMENTS, threshold_settings['thresholds'], threshold_settings['schemes'])
+    with pd.ExcelWriter(paths['activity_thresholds']) as writer:
+        for group, curve in curves.items():
+            curve.to_excel(writer, sheet_name=group, index=False)
+
+    print("All summaries have been calculated and saved.")
+    return activity_summaries, spending_summaries, curves
+
+def run_elasticity_stage(paths=PATHS, modes=SEGMENTS, discounts=None, precision=None):
+    # Survey-derived rates are only recalculated when the survey (or its weights) changes
+    survey_rates = load_or_calculate_rates(
+        paths['survey_rates'],
+        survey_sources(paths),
+        lambda: calculate_survey_rates(process_data(load_weighted_survey(paths)), precision=precision),
+        SURVEY_RATE_TABLES,
+        {'precision': resolve_precision(precision)}
+    )
+
+    # Read market data files
+    market_penetration = {mode: pd.read_excel(path) for mode, path in paths['market_penetration'].items()}
+    activity_summarised = {mode: pd.read_excel(path) for mode, path in paths['activity_summary'].items()}
+
+    market_data = prepare_market_data(
+        survey_rates['age_proportions'],
+        market_penetration['gender'],
+        market_penetration['age_group'],
+        activity_summarised['gender'],
+        activity_summarised['age_group'],
+        market_penetration['income_level'],
+        activity_summarised['income_level']
+    )
+
+    # Process each mode and save results
+    results = {}
+    for mode in modes:
+        results[mode] = process_market_data(survey_rates[mode], mode, market_data, discounts)
+
+        output_path = paths['elasticity_scenarios'][mode]
+        results[mode].to_excel(output_path, index=False)
+        print(f"Saved {mode} results to {output_path}")
+
+    return results
+
+def run_business_stage(paths=PATHS, modes=SEGMENTS):
+    results = {}
+    for mode in modes:
+        scenarios_df = pd.read_excel(paths['elasticity_scenarios'][mode])
+        spending_df = pd.read_excel(paths['spending_summary'][mode])
+        output_path = paths['business_outcome'][mode]
+
+        # Previous results are reused for unchanged scenarios if they are newer than the spending data
+        previous_outcomes = read_previous_outcomes(output_path, [paths['spending_summary'][mode]])
+
+        results[mode] = update_outcomes(
+            previous_outcomes,
+            scenarios_df,
+            lambda changed_df: calculate_business_outcomes(changed_df, spending_df, mode),
+            ['new_customers']
+        )
+        results[mode].to_excel(output_path, index=False)
+
+    return results
+
+def run_social_stage(paths=PATHS):
+    df = process_data(load_weighted_survey(paths))
+
+    results = {
+        'gender': calculate_social_outcomes(df, 'gender'),
+        'age_group': calculate_social_outcomes(df, 'age_group'),
+        'market': calculate_market_social_outcomes(df)
+    }
+    for group, summary in results.items():
+        summary.to_excel(paths['social_change'][group], index=False)
+
+    print(f"Social outcome analysis saved to {', '.join(paths['social_change'].values())}")
+    return results
+
+def load_health_scenarios(paths=PATHS):
+    """Gender scenarios and age group scenarios split by gender, evaluated together by the health stage."""
+    gender_df = pd.read_excel(paths['elasticity_scenarios']['gender'])
+    age_df = pd.read_excel(paths['elasticity_scenarios']['age_group'])
+    gender_shares = pd.read_excel(paths['survey_rates'], sheet_name='gender_age_proportions')
+
+    df = pd.concat([
+        gender_df.assign(segment='gender', gender_share=1.0),
+        split_scenarios_by_gender(age_df, gender_shares, 'age_group').assign(segment='age_group')
+    ], ignore_index=True).reindex(columns=HEALTH_SCENARIO_COLUMNS)
+
+    # Scenarios saved before the fairly active tier have no newly fairly active customers
+    df['newly_fairly_active_customers'] = df['newly_fairly_active_customers'].fillna(0.0)
+    return df
+
+def run_health_stage(paths=PATHS, country_map=COUNTRY_MAP, precision=None):
+    df = load_health_scenarios(paths)
+
+    # Previous results are reused for scenarios whose newly active and fairly active customers did
+    # not change, unless the health parameter tables were updated since the last run or the
+    # outcomes were calculated in another precision or for other geographies
+    parameters = {'precision': resolve_precision(precision), 'country_map': country_map}
+    previous_outcomes = read_previous_outcomes(paths['health_outcomes'], HEALTH_SOURCES.values(), sheet_name=None,
+                                               parameters=parameters)
+    outcome_columns = set(HEALTH_SCENARIO_COLUMNS + HEALTH_OUTCOME_COLUMNS)
+    if previous_outcomes is not None and not outcome_columns <= set(previous_outcomes.columns):
+        # Outcomes saved by an earlier version of the health stage are recalculated
+        previous_outcomes = None
+
+    results = {}
+    for code in country_map:
+        market_df = df[df['scenario_id'].str.startswith(code)]
+
+        if previous_outcomes is None:
+            previous_country = None
+        else:
+            previous_country = previous_outcomes[previous_outcomes['scenario_id'].str.startswith(code)]
+
+        results[code] = update_outcomes(
+            previous_country,
+            market_df,
+            lambda changed_df: calculate_country_health_outcomes(code, changed_df, country_map, precision),
+            ['newly_active_customers', 'newly_fairly_active_customers']
+        )
+
+    with pd.ExcelWriter(paths['health_outcomes']) as writer:
+        # Save each country to a separate sheet
+        for code, combined_results in results.items():
+            if not combined_results.empty:
+                combined_results.to_excel(writer, sheet_name=code, index=False)
+            else:
+                print(f"No results for {code}. Skipping...")
+    save_parameters(paths['health_outcomes'], parameters)
+
+    # Save the risk decompositions behind these results, and the source row of every parameter, for inspection
+    risk_table = get_risk_table(['male', 'female'], sorted(set(country_map.values())),
+                                age_groups=sorted(set(HEALTH_AGE_STRATA.values())))
+    resolution = resolve_health_parameters(load_health_tables(), risk_table[RISK_KEY_COLUMNS])
+    with pd.ExcelWriter(paths['health_risk_table']) as writer:
+        risk_table.to_excel(writer, sheet_name='risks', index=False)
+        resolution.to_excel(writer, sheet_name='resolution', index=False)
+
+    print(f"All results have been saved to '{paths['health_outcomes']}'")
+    return results
+
+def run_consolidation_stage(paths=PATHS):
+    scenarios = {mode: pd.read_excel(paths['elasticity_scenarios'][mode]) for mode in SEGMENTS}
+    business = {mode: pd.read_excel(paths['business_outcome'][mode]) for mode in SEGMENTS}
+    social = {mode: pd.read_excel(paths['social_change'][mode]) for mode in ['gender', 'age_group']}
+    market_social = pd.read_excel(paths['social_change']['market'])
+    health_df = pd.concat(pd.read_excel(paths['health_outcomes'], sheet_name=None).values(), ignore_index=True)
+
+    results, health_by_disease = consolidate_results(scenarios, business, social, health_df, market_social)
+
+    with pd.ExcelWriter(paths['sroi_results']) as writer:
+        results.to_excel(writer, sheet_name='results', index=False)
+        health_by_disease.to_excel(writer, sheet_name='health_by_disease', index=False)
+
+    print(f"Consolidated results saved to {paths['sroi_results']}")
+    return results, health_by_disease
+
+def run_sensitivity_stage(paths=PATHS, country_map=COUNTRY_MAP, settings=SENSITIVITY_SETTINGS):
+    scenarios_df = pd.read_excel(paths['elasticity_scenarios']['gender'])
+    spending_df = pd.read_excel(paths['spending_summary']['gender'])
+
+    # Scenarios saved before the fairly active tier have no fairly active change
+    if 'fairly change' not in scenarios_df.columns:
+        scenarios_df['fairly change'] = 0.0
+
+    resolution = resolve_health_parameters(load_health_tables(), required_health_keys(country_map), report=False)
+    table = scenario_sensitivities(scenarios_df, spending_df, parameter_values(resolution), country_map, settings)
+    ranking = rank_inputs(table)
+
+    with pd.ExcelWriter(paths['sroi_sensitivity']) as writer:
+        table.to_excel(writer, sheet_name='sensitivities', index=False)
+        ranking.to_excel(writer, sheet_name='ranking', index=False)
+
+    for output, inputs in ranking.groupby('output', sort=False):
+        top = inputs.head(3)
+        labels = [row.input if pd.isna(row.factor) else f"{row.input} ({row.factor})" for row in top.itertuples(index=False)]
+        print(f"Most influential inputs of {output}: {', '.join(labels)}")
+    print(f"Sensitivities of {table['scenario_id'].nunique()} scenarios saved to {paths['sroi_sensitivity']}")
+    return table
+
+def run_projection_stage(paths=PATHS, settings=PROJECTION_SETTINGS, precision=None):
+    scenarios_df = pd.read_excel(paths['elasticity_scenarios']['gender'])
+    business_df = pd.read_excel(paths['business_outcome']['gender'])
+    health_df = pd.concat(pd.read_excel(paths['health_outcomes'], sheet_name=None).values(), ignore_index=True)
+
+    inputs = build_projection_inputs(scenarios_df, business_df, health_df)
+    summary = project_sroi(inputs, **settings, precision=precision)
+    yearly = project_yearly_table(
+        inputs,
+        max(settings['horizons']),
+        settings['discount_rates'][0],
+        settings['retention'][0],
+        settings['activity_decay'][0],
+        precision
+    )
+
+    with pd.ExcelWriter(paths['sroi_projection']) as writer:
+        summary.to_excel(writer, sheet_name='summary', index=False)
+        yearly.to_excel(writer, sheet_name='years', index=False)
+
+    print(f"SROI projection saved to {paths['sroi_projection']}")
+    return summary
+
+def run_cohort_stage(paths=PATHS, country_map=COUNTRY_MAP, settings=COHORT_SETTINGS, precision=None):
+    df = load_health_scenarios(paths)
+    df = df[df['segment'] == 'gender'].drop(columns=['segment', 'age_group', 'gender_share'])
+
+    df['geography'] = df['scenario_id'].str[:3].map(country_map)
+    df = df[df['geography'].notna()]
+    df['gender'] = df['gender'].str.lower()
+    df['health_age_group'] = health_age_groups(df)
+
+    # The health stage already reported the parameters behind these risk decompositions
+    risk_table = get_risk_table(df['gender'].unique(), df['geography'].unique(), age_groups=df['health_age_group'].unique(),
+                                report=False)
+    rows, outcomes, people = simulate_cohorts(df, risk_table, settings, precision=precision)
+    summary = summarise_cohorts(rows, outcomes, settings['discount_rate'], precision)
+
+    with pd.ExcelWriter(paths['health_cohort']) as writer:
+        summary.to_excel(writer, sheet_name='summary', index=False)
+        cohort_yearly_table(rows, outcomes, people).to_excel(writer, sheet_name='years', index=False)
+
+    print(f"Cohort outcomes of {len(df)} scenarios over {settings['horizon']} years saved to {paths['health_cohort']}")
+    return summary
+
+def run_optimization_stage(paths=PATHS, settings=OPTIMIZER_SETTINGS):
+    results = pd.read_excel(paths['sroi_results'])
+
+    options = build_options(results, settings['unit'], settings['social_value'], settings['include_no_discount'])
+    policy, summary = optimize_discounts(options, settings['unit'], settings['budget'], settings['min_new_customers'])
+    summary['social_value'] = settings['social_value']
+
+    with pd.ExcelWriter(paths['discount_policy']) as writer:
+        policy.to_excel(writer, sheet_name='policy', index=False)
+        options.to_excel(writer, sheet_name='options', index=False)
+        pd.DataFrame([summary]).to_excel(writer, sheet_name='summary', index=False)
+
+    print(f"Discount policy ({summary['method']} search over {summary['allocations']:,} allocations): "
+          f"value {summary['total_value']:,.0f} US$ (social value {settings['social_value']:,.0f} US$ per customer), "
+          f"discount cost {summary['total_discount_cost']:,.0f} US$, {summary['total_new_customers']:,.0f} new customers")
+    print(f"Discount policy saved to {paths['discount_policy']}")
+    return policy
+
+STAGES = {
+    'validation': run_validation_stage,
+    'calibration': run_calibration_stage,
+    'activity': run_activity_stage,
+    'summaries': run_summary_stage,
+    'elasticity': run_elasticity_stage,
+    'business': run_business_stage,
+    'social': run_social_stage,
+    'health': run_health_stage,
+    'consolidation': run_consolidation_stage,
+    'sensitivity': run_sensitivity_stage,
+    'projection': run_projection_stage,
+    'cohort': run_cohort_stage,
+    'optimization': run_optimization_stage
+}
+
+def run_pipeline(stages=STAGES, paths=PATHS, profiler=None, options=None):
+    """Run stages in order; options maps a stage to extra keyword arguments for it."""
+    options = options or {}
+
+    results = {}
+    for stage in stages:
+        print(f"Running {stage} stage")
+        kwargs = dict(options.get(stage, {}), paths=paths)
+        if profiler is None:
+            results[stage] = STAGES[stage](**kwargs)
+        else:
+            results[stage] = profiler.run(stage, STAGES[stage], **kwargs)
+    return results
+
+def input_paths(paths=PATHS):
+    """Input files whose fingerprints identify the data behind a run."""
+    return (survey_sources(paths) + [paths['population_margins']] + list(paths['market_penetration'].values())
+            + list(HEALTH_SOURCES.values()))
+
+def run_parameters(stages, country_map=COUNTRY_MAP, projection_settings=PROJECTION_SETTINGS, discounts=None,
+                   optimizer_settings=OPTIMIZER_SETTINGS, calibration_settings=CALIBRATION_SETTINGS, survey_weights=None,
+                   precision=None):
+    return {'stages': stages, 'country_map': country_map, 'projection': projection_settings, 'discounts': discounts,
+            'optimizer': optimizer_settings, 'calibration': calibration_settings, 'survey_weights': survey_weights,
+            'precision': resolve_precision(precision)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the HFA SROI impact model.')
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES),
+                        help='stages to run, in pipeline order (default: all)')
+    parser.add_argument('--discounts', nargs='+', type=float,
+                        help='discounts (in %%) to evaluate on the demand curves instead of the survey tiers, e.g. 10 25 30 50')
+    parser.add_argument('--budget', type=float,
+                        help="most discount cost (US$) of the optimised discount policy: the discount on new customers' "
+                             "average spend (existing customers' discounts are not counted)")
+    parser.add_argument('--social-value', type=float, default=OPTIMIZER_SETTINGS['social_value'],
+                        help='US$ per new customer for a social change of 1 in the optimised policy value (default 0: '
+                             'health savings only)')
+    parser.add_argument('--min-new-customers', type=float,
+                        help='fewest new customers of the optimised discount policy')
+    parser.add_argument('--policy-unit', choices=['market', 'gender'], default=OPTIMIZER_SETTINGS['unit'],
+                        help='choose one discount per market or per market and gender')
+    parser.add_argument('--calibrated-weights', action='store_true',
+                        help='use the calibrated survey weights (calibration stage) instead of the vendor WEIGHT')
+    parser.add_argument('--calibration-method', choices=['raking', 'linear'], default=CALIBRATION_SETTINGS['method'],
+                        help='raking (iterative proportional fitting) or linear calibration')
+    parser.add_argument('--weight-bounds', nargs=2, type=float, default=CALIBRATION_SETTINGS['bounds'],
+                        metavar=('LOWER', 'UPPER'), help='trim calibrated weights to these multiples of the vendor weight')
+    parser.add_argument('--precision', choices=list(PRECISIONS), default=PRECISION_SETTINGS['precision'],
+                        help='precision of the bulk arrays of the activity, elasticity, health, projection and cohort stages '
+                             '(accumulations stay float64)')
+    parser.add_argument('--profile', action='store_true',
+                        help='report wall/CPU time, peak memory and sampled hot functions per stage')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='also trace the peak of Python allocations with tracemalloc (slower, implies --profile)')
+    parser.add_argument('--profile-calls', action='store_true',
+                        help='also collect exact call statistics with cProfile (slower, implies --profile)')
+    parser.add_argument('--sample-interval-ms', type=float, default=5.0,
+                        help='stack sampling interval of the profiler (0 disables sampling)')
+    parser.add_argument('--no-warehouse', action='store_true',
+                        help='do not append this run to the results warehouse')
+    args = parser.parse_args(argv)
+
+    stages = [stage for stage in STAGES if stage in args.stages]
+    started = datetime.now()
+
+    profiler = None
+    if args.profile or args.profile_memory or args.profile_calls:
+        profiler = StageProfiler(
+            sample_interval=args.sample_interval_ms / 1000 or None,
+            trace_memory=args.profile_memory,
+            collect_calls=args.profile_calls
+        )
+
+    # Calibrated runs keep their own survey rates, so switching weights never reuses stale rates
+    paths = PATHS
+    if args.calibrated_weights:
+        paths = dict(PATHS, survey_weights=PATHS['calibrated_weights'],
+                     survey_rates=PATHS['survey_rates'].replace('.xlsx', '_calibrated.xlsx'))
+
+    try:
+        calibration_settings = dict(CALIBRATION_SETTINGS, method=args.calibration_method, bounds=tuple(args.weight_bounds))
+        optimizer_settings = dict(OPTIMIZER_SETTINGS, unit=args.policy_unit, budget=args.budget,
+                                  min_new_customers=args.min_new_customers, social_value=args.social_value)
+        options = {'calibration': {'settings': calibration_settings}, 'optimization': {'settings': optimizer_settings}}
+        for stage in ['activity', 'elasticity', 'health', 'projection', 'cohort']:
+            options[stage] = {'precision': args.precision}
+        if args.discounts:
+            options['elasticity']['discounts'] = args.discounts
+        results = run_pipeline(stages, paths, profiler=profiler, options=options)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            report_path, stacks_path = profiler.write(PATHS['profiles'])
+            profiler.print_summary()
+            print(f"Profile saved to {report_path} (collapsed stacks: {stacks_path})")
+
+    if not args.no_warehouse:
+        parameters = run_parameters(stages, discounts=args.discounts, optimizer_settings=optimizer_settings,
+                                    calibration_settings=calibration_settings, survey_weights=paths['survey_weights'],
+                                    precision=args.precision)
+        run_id = record_run(results, input_paths(paths), parameters, PATHS['warehouse'], started)
+        print(f"Run {run_id} saved to {PATHS['warehouse']}")
+
+if __name__ == "__main__":
+    main()
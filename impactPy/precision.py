@@ -0,0 +1,52 @@
+
+"""
+Numeric precision policy of the array engines.
+
+The bulk intermediate arrays of the model are computed in the compute precision:
+
+- activity minutes of every respondent and activity (calculate_activity_levels);
+- weighted yes responses of every respondent and price tier (calculate_elasticity);
+- risk decompositions, cases saved and savings of every scenario x disease row (evaluate_health_outcomes);
+- variants x scenarios x years projections and discount factors (project_sroi);
+- scenario x disease x state cohorts and their yearly outcomes (simulate_cohorts).
+
+float64 is the default. Engines take precision=None for the policy in PRECISION_SETTINGS, read
+when they run, so changing the policy applies to every engine. float32 halves the memory and bandwidth of these arrays for large sweep
+workloads. Accumulations (weighted sums per group, activity totals, present values) are always
+carried in float64, so rounding does not grow with the number of terms summed: each element of a
+float32 array carries a relative error of about 6e-8 per operation, and the outputs stay within
+FLOAT32_TOLERANCES of the float64 results (checked by impactPy.equivalence and measured by
+python -m impactPy.benchmark).
+"""
+
+
+import numpy as np
+
+PRECISIONS = {'float64': np.float64, 'float32': np.float32}
+
+PRECISION_SETTINGS = {
+    'precision': 'float64'
+}
+
+# Accumulations are never reduced
+ACCUMULATOR = np.float64
+
+# Largest differences from float64 outputs accepted in float32, relative to the largest value of
+# each output column: cases saved and NPVs are differences of large numbers, so a value close to
+# zero carries the absolute error of its terms
+FLOAT32_TOLERANCES = {'rtol': 1e-5, 'atol': 0.0, 'scale': 'column'}
+
+def resolve_precision(precision=None):
+    """Precision name to compute in: precision, or PRECISION_SETTINGS['precision'] when None."""
+    precision = precision or PRECISION_SETTINGS['precision']
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}', expected one of {list(PRECISIONS)}")
+    return precision
+
+def compute_dtype(precision=None):
+    """NumPy dtype of the bulk arrays for a precision name of PRECISIONS (see resolve_precision)."""
+    return np.dtype(PRECISIONS[resolve_precision(precision)])
+
+def as_compute(values, precision=None):
+    """values as an array of the compute precision (no copy when it already is one)."""
+    return np.asarray(values, dtype=compute_dtype(precision))
@@ -0,0 +1,218 @@
+
+"""
+Per-stage profiling of pipeline runs.
+
+Every stage is wrapped with wall and CPU timers and a sampling collector: a background thread
+records the running stack and the resident memory every few milliseconds, which ranks the
+functions the stage spent its time in and gives its peak memory at little cost. tracemalloc
+(exact peak of Python allocations, several times slower on the Excel reads) and cProfile (exact
+call counts) can be switched on for a closer look.
+
+Each run writes a JSON report and a collapsed-stack file ("stage;frame;frame count" per line)
+that flame graph tools such as flamegraph.pl or speedscope read directly.
+
+Usage (from the repository root):
+    python -m impactPy --profile
+    python -m impactPy --profile --profile-memory --profile-calls --stages health
+"""
+
+
+import cProfile
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+PROFILE_DIR = 'data/outputs/profiles'
+
+def current_rss():
+    """Resident memory of this process in bytes, or None where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+class StackSampler:
+    """Records the stack of one thread, below a given root frame, and the resident memory every interval seconds."""
+
+    def __init__(self, thread_id, root_frame, interval=0.005):
+        self.thread_id = thread_id
+        self.root_frame = root_frame
+        self.interval = interval
+        self.stacks = Counter()
+        self.start_rss = current_rss()
+        self.peak_rss = self.start_rss
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = current_rss()
+            if rss is not None and rss > self.peak_rss:
+                self.peak_rss = rss
+
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.root_frame:
+                if frame.f_code.co_filename != cProfile.__file__:
+                    stack.append(frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+def rank_sampled_functions(stacks, top=20):
+    """Functions ranked by the samples they were running in (self) and on the stack for (inclusive)."""
+    self_samples = Counter()
+    inclusive_samples = Counter()
+    for stack, count in stacks.items():
+        self_samples[stack[-1]] += count
+        for label in set(stack):
+            inclusive_samples[label] += count
+
+    total = sum(stacks.values())
+    return [{
+        'function': label,
+        'self_samples': count,
+        'inclusive_samples': inclusive_samples[label],
+        'self_share': round(count / total, 4)
+    } for label, count in self_samples.most_common(top)]
+
+def rank_profiled_functions(profile, top=20):
+    """Functions ranked by their own time (excluding callees) as measured by cProfile."""
+    stats = pstats.Stats(profile).stats
+    ranked = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+
+    return [{
+        'function': f"{os.path.basename(filename)}:{line}({name})",
+        'calls': calls,
+        'own_seconds': round(own_time, 6),
+        'cumulative_seconds': round(cumulative_time, 6)
+    } for (filename, line, name), (_, calls, own_time, cumulative_time, _) in ranked]
+
+class StageProfiler:
+    """
+    Runs pipeline stages under the profilers and collects one report entry per stage.
+
+    Sampling (sample_interval seconds, None disables it) is cheap enough to leave on;
+    trace_memory adds tracemalloc and collect_calls adds cProfile.
+    """
+
+    def __init__(self, sample_interval=0.005, trace_memory=False, collect_calls=False, top=20):
+        self.sample_interval = sample_interval
+        self.trace_memory = trace_memory
+        self.collect_calls = collect_calls
+        self.top = top
+        self.started = datetime.now()
+        self.stages = []
+        self.stacks = Counter()
+
+    def run(self, stage, func, *args, **kwargs):
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            memory_start = tracemalloc.get_traced_memory()[0]
+
+        sampler = None
+        if self.sample_interval:
+            sampler = StackSampler(threading.get_ident(), sys._getframe(), self.sample_interval)
+            sampler.start()
+
+        profile = cProfile.Profile() if self.collect_calls else None
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            if profile is not None:
+                result = profile.runcall(func, *args, **kwargs)
+            else:
+                result = func(*args, **kwargs)
+        finally:
+            entry = {
+                'stage': stage,
+                'wall_seconds': round(time.perf_counter() - wall_start, 4),
+                'cpu_seconds': round(time.process_time() - cpu_start, 4)
+            }
+
+            if sampler is not None:
+                sampler.stop()
+                for stack, count in sampler.stacks.items():
+                    self.stacks[(stage,) + stack] += count
+                entry['samples'] = sum(sampler.stacks.values())
+                entry['top_functions'] = rank_sampled_functions(sampler.stacks, self.top)
+                if sampler.start_rss is not None:
+                    entry['peak_rss_mb'] = round(sampler.peak_rss / 2**20, 1)
+                    entry['peak_rss_increase_mb'] = round((sampler.peak_rss - sampler.start_rss) / 2**20, 1)
+
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                entry['traced_peak_mb'] = round((peak - memory_start) / 2**20, 2)
+                entry['retained_memory_mb'] = round((current - memory_start) / 2**20, 2)
+
+            if profile is not None:
+                entry['top_calls'] = rank_profiled_functions(profile, self.top)
+
+            self.stages.append(entry)
+
+        return result
+
+    def stop(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def report(self):
+        return {
+            'run': {
+                'started': self.started.isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'sample_interval_ms': self.sample_interval * 1000 if self.sample_interval else None,
+                'trace_memory': self.trace_memory,
+                'collect_calls': self.collect_calls
+            },
+            'total': {
+                'wall_seconds': round(sum(entry['wall_seconds'] for entry in self.stages), 4),
+                'cpu_seconds': round(sum(entry['cpu_seconds'] for entry in self.stages), 4)
+            },
+            'stages': self.stages
+        }
+
+    def write(self, directory=PROFILE_DIR):
+        """Save the JSON report and collapsed stacks of this run; returns both paths."""
+        os.makedirs(directory, exist_ok=True)
+        name = f"profile_{self.started.strftime('%Y%m%d-%H%M%S')}"
+
+        report_path = os.path.join(directory, f"{name}.json")
+        with open(report_path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+        stacks_path = os.path.join(directory, f"{name}.collapsed")
+        with open(stacks_path, 'w') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{';'.join(stack)} {count}\n")
+
+        return report_path, stacks_path
+
+    def print_summary(self):
+        print(f"{'stage':<12}{'wall s':>10}{'cpu s':>10}{'peak MB':>10}  top function")
+        for entry in self.stages:
+            top = entry.get('top_functions') or entry.get('top_calls') or [{'function': ''}]
+            peak = entry.get('traced_peak_mb', entry.get('peak_rss_mb', float('nan')))
+            print(f"{entry['stage']:<12}{entry['wall_seconds']:>10.2f}{entry['cpu_seconds']:>10.2f}{peak:>10.1f}  {top[0]['function']}")
@@ -0,0 +1,169 @@
+
+"""
+Multi-year SROI projection.
+
+Scenario outcomes from the business and health stages are one-year figures. The projection
+carries them over a horizon of several years:
+
+- Retained customers = new customers x retention ^ (year - 1); spend and the discount given
+  (the investment: spend x discount, in local currency) follow the retained customers.
+- Newly active population = newly active customers x retention ^ (year - 1) x (1 - activity decay) ^ (year - 1);
+  health savings follow the newly active population.
+- Every year is discounted by (1 + discount rate) ^ year.
+
+NPV = present value of health savings - present value of the investment and
+health return ratio = present value of health savings / present value of the investment, for every
+scenario, horizon and (discount rate, retention, activity decay) variant. Both count health savings
+only: the social value of new customers (see impactPy.optimizer) is not part of the projection.
+
+All scenarios, years and variants are evaluated together as variants x scenarios x years arrays,
+in the compute precision (see impactPy.precision); present values are summed in float64.
+"""
+
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from .precision import ACCUMULATOR, as_compute
+
+# Default assumptions; the discount rate is the HM Treasury Green Book rate
+PROJECTION_SETTINGS = {
+    'horizons': [5, 10],
+    'discount_rates': [0.035],
+    'retention': [0.7],
+    'activity_decay': [0.1]
+}
+
+PROJECTED_COLUMNS = ['retained_customers', 'spend', 'investment', 'newly_active', 'health_saving']
+
+def build_projection_inputs(scenarios_df, business_df, health_df):
+    """
+    One row of year-one figures per scenario.
+
+    scenarios_df: elasticity scenarios (scenario_id, price, new_customers, newly_active_customers)
+    business_df: business outcomes (scenario_id, economic_outcome_avg_local)
+    health_df: health outcomes, one row per scenario and factor (scenario_id, total_saving)
+    """
+    if 'segment' in health_df.columns:
+        health_df = health_df[health_df['segment'] == 'gender']
+    health_totals = health_df.groupby('scenario_id', sort=False)['total_saving'].sum().rename('health_saving')
+
+    inputs = scenarios_df[['scenario_id', 'price', 'new_customers', 'newly_active_customers']].merge(
+        business_df[['scenario_id', 'economic_outcome_avg_local']], on='scenario_id', how='left'
+    )
+    inputs = inputs.merge(health_totals.reset_index(), on='scenario_id', how='left')
+
+    inputs = inputs.rename(columns={'economic_outcome_avg_local': 'spend'})
+    inputs['discount'] = inputs['price'].astype(str).str.rstrip('%').astype(float) / 100
+    inputs['investment'] = inputs['spend'] * inputs['discount']
+
+    return inputs
+
+def projection_variants(discount_rates, retention, activity_decay):
+    """Every combination of the assumption values, one row per variant."""
+    return pd.DataFrame(
+        list(itertools.product(np.atleast_1d(discount_rates), np.atleast_1d(retention), np.atleast_1d(activity_decay))),
+        columns=['discount_rate', 'retention', 'activity_decay']
+    )
+
+def project_years(inputs, years, retention, activity_decay, precision=None,
+                  columns=PROJECTED_COLUMNS):
+    """
+    Year-by-year projections of columns (of PROJECTED_COLUMNS) as arrays of shape (variants, scenarios, years).
+
+    retention and activity_decay are arrays with one value per variant.
+    """
+    elapsed = as_compute(np.arange(years), precision)
+    retention = as_compute(retention, precision)[:, None, None]
+    activity_decay = as_compute(activity_decay, precision)[:, None, None]
+
+    survival = retention ** elapsed
+    activity = survival * (1 - activity_decay) ** elapsed
+
+    def year_one(column):
+        return as_compute(inputs[column], precision)[None, :, None]
+
+    projections = {
+        'retained_customers': lambda: year_one('new_customers') * survival,
+        'spend': lambda: year_one('spend') * survival,
+        'investment': lambda: year_one('investment') * survival,
+        'newly_active': lambda: year_one('newly_active_customers') * activity,
+        'health_saving': lambda: year_one('health_saving') * activity
+    }
+    return {column: projections[column]() for column in columns}
+
+def discount_factors(discount_rates, years, precision=None):
+    """Discount factors of shape (variants, 1, years), year one discounted by one period."""
+    discount_rates = as_compute(discount_rates, precision)[:, None, None]
+    return (1 + discount_rates) ** -as_compute(np.arange(1, years + 1), precision)
+
+def project_sroi(inputs, horizons=PROJECTION_SETTINGS['horizons'],
+                 discount_rates=PROJECTION_SETTINGS['discount_rates'],
+                 retention=PROJECTION_SETTINGS['retention'],
+                 activity_decay=PROJECTION_SETTINGS['activity_decay'],
+                 precision=None):
+    """
+    Present values, NPV and health return ratio for every scenario, horizon and assumption variant.
+
+    Returns a long table with one row per (scenario_id, horizon, discount_rate, retention, activity_decay).
+    """
+    horizons = np.atleast_1d(horizons).astype(int)
+    if (horizons < 1).any():
+        raise ValueError("Horizons must be at least one year")
+
+    variants = projection_variants(discount_rates, retention, activity_decay)
+    years = horizons.max()
+
+    discounted_columns = ['spend', 'investment', 'health_saving']
+    projected = project_years(inputs, years, variants['retention'], variants['activity_decay'], precision, discounted_columns)
+    factors = discount_factors(variants['discount_rate'], years, precision)
+
+    # Present values up to each horizon: (variants, scenarios, horizons), summed in float64
+    present_values = {}
+    for column in discounted_columns:
+        discounted = projected.pop(column) * factors
+        present_values[column] = np.stack([discounted[..., :horizon].sum(axis=-1, dtype=ACCUMULATOR)
+                                           for horizon in horizons], axis=-1)
+
+    n_variants, n_scenarios, n_horizons = len(variants), len(inputs), len(horizons)
+    variant_index, scenario_index, horizon_index = np.meshgrid(
+        np.arange(n_variants), np.arange(n_scenarios), np.arange(n_horizons), indexing='ij'
+    )
+    variant_index, scenario_index, horizon_index = variant_index.ravel(), scenario_index.ravel(), horizon_index.ravel()
+
+    results = pd.DataFrame({
+        'scenario_id': inputs['scenario_id'].to_numpy()[scenario_index],
+        'horizon': horizons[horizon_index]
+    })
+    for column in variants.columns:
+        results[column] = variants[column].to_numpy()[variant_index]
+
+    results['pv_spend'] = present_values['spend'].ravel()
+    results['pv_investment'] = present_values['investment'].ravel()
+    results['pv_health_saving'] = present_values['health_saving'].ravel()
+    results['npv'] = results['pv_health_saving'] - results['pv_investment']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        results['health_return_ratio'] = results['pv_health_saving'] / results['pv_investment']
+
+    return results
+
+def project_yearly_table(inputs, years, discount_rate=PROJECTION_SETTINGS['discount_rates'][0],
+                         retention=PROJECTION_SETTINGS['retention'][0],
+                         activity_decay=PROJECTION_SETTINGS['activity_decay'][0],
+                         precision=None):
+    """Year-by-year projection of one assumption variant as a long table (scenario_id, year, ...)."""
+    projected = project_years(inputs, years, [retention], [activity_decay], precision)
+    factors = discount_factors([discount_rate], years, precision)
+
+    n_scenarios = len(inputs)
+    table = pd.DataFrame({
+        'scenario_id': np.repeat(inputs['scenario_id'].to_numpy(), years),
+        'year': np.tile(np.arange(1, years + 1), n_scenarios)
+    })
+    for column in PROJECTED_COLUMNS:
+        table[column] = projected[column][0].ravel()
+    table['discount_factor'] = np.broadcast_to(factors[0], (n_scenarios, years)).ravel()
+
+    return table
@@ -0,0 +1,310 @@
+
+"""
+Frozen reference implementations.
+
+Copies of the model's calculations as they stood when the equivalence harness was introduced:
+activity minutes, the weighted median and spending summaries, price elasticity rates, the risk decomposition and cases
+saved, and the cost per case adjustment. They are deliberately simple (row by row where the
+originals were) and must not be optimised or edited: impactPy.equivalence runs them alongside the
+live implementations to prove that faster engines give the same numbers.
+
+Constants are frozen with the functions, so changing a live constant is also caught.
+"""
+
+
+import numpy as np
+import pandas as pd
+
+CURRENCY_RATES = {
+    "Australia": 0.64, "Canada": 0.73, "Germany": 1.05, "Ireland": 1.05, "Japan": 0.0067,
+    "KSA (Saudi Arabia)": 0.27, "New Zealand": 0.59, "Singapore": 0.73, "Spain": 1.05,
+    "USA (United States of America)": 1
+}
+
+SCENARIOS = ['Q14a', 'Q14b', 'Q14c', 'Q14d', 'Q14e']
+DISCOUNTS = {'Q14a': '10%', 'Q14b': '20%', 'Q14c': '40%', 'Q14d': '60%', 'Q14e': '80%'}
+
+FREQUENCY_DAYS = {1: 0.5, 2: 1, 3: 2, 4: 3, 5: 4, 6: 5, 7: 6, 8: 7, 9: 8}
+INTENSITY_CODES = {1: 'high', 2: 'moderate', 3: 'low'}
+INTENSITY_WEIGHTS = {'low': 0, 'moderate': 1, 'high': 2}
+ACTIVE_MINUTES = 150
+FAIRLY_ACTIVE_MINUTES = 30
+ACTIVITY_TIERS = ['inactive', 'fairly active', 'active']
+
+ACTIVITY_QUESTIONS = {
+    1: {
+        'gym_freq': 'Q4', 'gym_duration': 'Q5r1', 'gym_intensity': 'Q6',
+        'walking_freq': 'Q9', 'walking_duration': 'Q10r1', 'walking_intensity': 'Q11',
+        'sports_freq': 'Q12', 'sports_duration': 'Q13r1', 'sports_intensity': 'Q14'
+    },
+    2: {
+        'gym_freq': 'Section_B_Q2', 'gym_duration': 'Section_B_Q3r1', 'gym_intensity': 'Section_B_Q4',
+        'walking_freq': 'Section_B_Q7', 'walking_duration': 'Section_B_Q8r1', 'walking_intensity': 'Section_B_Q9',
+        'sports_freq': 'Section_B_Q10', 'sports_duration': 'Section_B_Q11r1', 'sports_intensity': 'Section_B_Q12'
+    }
+}
+
+ACTIVITY_OUTPUT_COLUMNS = ['S1', 'dSEGMENT', 'uuid', 'total_activity_mins', 'activity_tier', 'active_flag', 'fairly_active_flag',
+                           'total_gym_minutes', 'gym_intensity',
+                           'walking_minutes', 'walking_intensity',
+                           'other_sports_minutes', 'other_sports_intensity']
+
+HEALTH_OUTCOME_COLUMNS = ['factor', 'risk_active', 'risk_inactive', 'active_cases_saved', 'fairly_active_cases_saved',
+                          'active_dalys_saved', 'active_deaths_saved', 'direct_cost_per_case', 'direct_cost_saving', 'indirect_cost_per_case',
+                          'indirect_cost_saving', 'total_saving']
+
+# Activity
+
+def calculate_weekly_minutes(frequency_code, session_minutes):
+    return FREQUENCY_DAYS.get(frequency_code, 0) * session_minutes
+
+def classify_intensity(intensity_code):
+    return INTENSITY_CODES.get(intensity_code, 'low')
+
+def calculate_activities(row):
+    q_map = ACTIVITY_QUESTIONS[1] if row['dSEGMENT'] == 1 else ACTIVITY_QUESTIONS[2]
+
+    total_gym_minutes = calculate_weekly_minutes(row[q_map['gym_freq']], row[q_map['gym_duration']])
+    gym_intensity = classify_intensity(row[q_map['gym_intensity']])
+
+    walking_minutes = calculate_weekly_minutes(row[q_map['walking_freq']], row[q_map['walking_duration']]) if row[q_map['walking_duration']] >= 10 else 0
+    walking_intensity = classify_intensity(row[q_map['walking_intensity']])
+
+    other_sports_minutes = calculate_weekly_minutes(row[q_map['sports_freq']], row[q_map['sports_duration']])
+    other_sports_intensity = classify_intensity(row[q_map['sports_intensity']])
+
+    return pd.Series({
+        'total_gym_minutes': total_gym_minutes,
+        'gym_intensity': gym_intensity,
+        'walking_minutes': walking_minutes,
+        'walking_intensity': walking_intensity,
+        'other_sports_minutes': other_sports_minutes,
+        'other_sports_intensity': other_sports_intensity
+    })
+
+def calculate_total_activity(row):
+    total_activity = 0
+
+    for minutes, intensity in [('total_gym_minutes', 'gym_intensity'),
+                               ('walking_minutes', 'walking_intensity'),
+                               ('other_sports_minutes', 'other_sports_intensity')]:
+        if row[minutes] > 0:
+            total_activity += row[minutes] * INTENSITY_WEIGHTS[row[intensity]]
+
+    return total_activity
+
+def classify_activity_tier(minutes):
+    if minutes >= ACTIVE_MINUTES:
+        return 'active'
+    if minutes >= FAIRLY_ACTIVE_MINUTES:
+        return 'fairly active'
+    return 'inactive'
+
+def calculate_activity_levels(survey_df):
+    activity_columns = survey_df.apply(calculate_activities, axis=1)
+    df = pd.concat([survey_df, activity_columns], axis=1)
+
+    df['total_activity_mins'] = df.apply(calculate_total_activity, axis=1)
+    df['activity_tier'] = df['total_activity_mins'].apply(classify_activity_tier)
+    df['active_flag'] = (df['activity_tier'] == 'active').astype(int)
+    df['fairly_active_flag'] = (df['activity_tier'] == 'fairly active').astype(int)
+
+    return df[ACTIVITY_OUTPUT_COLUMNS]
+
+# Spending
+
+def weighted_median(data, weights):
+    data, weights = np.array(data).squeeze(), np.array(weights).squeeze()
+    s_data, s_weights = map(np.array, zip(*sorted(zip(data, weights))))
+    midpoint = 0.5 * sum(s_weights)
+    if any(weights > midpoint):
+        w_median = (data[weights == np.max(weights)])[0]
+    else:
+        cs_weights = np.cumsum(s_weights)
+        idx = np.where(cs_weights <= midpoint)[0][-1]
+        if cs_weights[idx] == midpoint:
+            w_median = np.mean(s_data[idx:idx+2])
+        else:
+            w_median = s_data[idx+1]
+    return w_median
+
+def calculate_spending_summary(data, group_cols, currency_rates=CURRENCY_RATES):
+    def group_stats(group):
+        local_median = weighted_median(group['Q2r1'], group['WEIGHT'])
+        usd_median = local_median * group['currency_rate'].iloc[0]
+
+        weighted_total = np.sum(group['WEIGHT'])
+        weighted_local_avg = np.sum(group['Q2r1'] * group['WEIGHT']) / weighted_total
+        weighted_usd_avg = weighted_local_avg * group['currency_rate'].iloc[0]
+
+        return pd.Series({
+            'median_spent_local': local_median,
+            'median_spent_$': usd_median,
+            'avg_spent_local': weighted_local_avg,
+            'avg_spent_$': weighted_usd_avg,
+            'weighted_total': weighted_total
+        })
+
+    data = data.copy()
+    data['currency_rate'] = data['market'].map(currency_rates)
+
+    grouped = data.groupby(group_cols)
+    summary = grouped.apply(group_stats, include_groups=False).reset_index()
+
+    numeric_columns = ['median_spent_local', 'median_spent_$', 'avg_spent_local', 'avg_spent_$', 'weighted_total']
+    summary[numeric_columns] = summary[numeric_columns].round(2)
+
+    return summary
+
+# Price elasticity
+
+def calculate_elasticity(df, group_cols, filter_col, valid_values):
+    df = df.copy()
+
+    for i in range(1, len(SCENARIOS)):
+        df[SCENARIOS[i]] = df[SCENARIOS[i-1]].where(df[SCENARIOS[i-1]] == 1, df[SCENARIOS[i]])
+
+    df['respondent_count'] = 1
+    results = []
+
+    for scenario in SCENARIOS:
+        price = DISCOUNTS[scenario]
+
+        price_barrier_mask = df['Section_B_Q13r5'].notna()
+
+        df['weighted_yes'] = df[scenario].apply(lambda x: 1 if x == 1 else 0) * df['WEIGHT'] * price_barrier_mask
+
+        weighted_sums = df.groupby(group_cols).agg(
+            total_weight=('WEIGHT', 'sum'),
+            weighted_yes=('weighted_yes', 'sum'),
+            total_respondents=('respondent_count', 'sum')
+        ).reset_index()
+
+        price_barrier_stats = df.groupby(group_cols).agg(
+            price_barrier_weight=('WEIGHT', lambda x: (x * price_barrier_mask).sum()),
+            non_price_barrier_weight=('WEIGHT', lambda x: (x * ~price_barrier_mask).sum())
+        ).reset_index()
+
+        weighted_sums = weighted_sums.merge(price_barrier_stats, on=group_cols)
+
+        weighted_sums['% yes'] = (weighted_sums['weighted_yes'] / weighted_sums['price_barrier_weight'])
+        weighted_sums['% price_barrier'] = (weighted_sums['price_barrier_weight'] / weighted_sums['total_weight'])
+        weighted_sums['% non_price_barrier'] = (weighted_sums['non_price_barrier_weight'] / weighted_sums['total_weight'])
+
+        weighted_sums['scenario'] = scenario
+        weighted_sums['price'] = price
+
+        results.append(weighted_sums[['scenario'] + group_cols + ['price', '% yes', '% price_barrier', '% non_price_barrier', 'total_respondents']])
+
+    final_results = pd.concat(results, ignore_index=True)
+    final_results = final_results[final_results[filter_col].isin(valid_values)]
+
+    return final_results
+
+# Health
+
+def calculate_adjusted_risk_rates(PopulationRisk, PopulationActiveRate, RelativeRisk, PopulationFairlyActiveRate=None, FairlyActiveRelativeRisk=None):
+    if PopulationFairlyActiveRate is None:
+        ActiveRisk = PopulationRisk/(RelativeRisk * (1 - PopulationActiveRate) + PopulationActiveRate)
+        InactiveRisk = ActiveRisk * RelativeRisk
+        return ActiveRisk, InactiveRisk
+
+    InactiveRisk = PopulationRisk/((1 - PopulationActiveRate - PopulationFairlyActiveRate) + (PopulationActiveRate * (1 / RelativeRisk)) + (PopulationFairlyActiveRate * (1/FairlyActiveRelativeRisk)))
+    ActiveRisk = InactiveRisk / RelativeRisk
+    FairlyActiveRisk = InactiveRisk / FairlyActiveRelativeRisk
+    return ActiveRisk, FairlyActiveRisk, InactiveRisk
+
+def calculate_cases_saved(ActiveRisk, InactiveRisk, ActiveNum):
+    return InactiveRisk * ActiveNum - ActiveRisk * ActiveNum
+
+def health_outcomes(parameters, additional_active, additional_fairly_active):
+    """
+    Outcomes of one (gender, geography, age stratum) by factor, one factor at a time, from the
+    resolved parameter values of each factor (a row per factor with a column per parameter).
+    """
+    rows = []
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for record in parameters.to_dict('records'):
+            # NumPy scalars, so that a relative risk of 0 gives inf and NaN rather than an exception
+            params = {key: np.float64(value) if key != 'factor' else value for key, value in record.items()
+                      if key not in ('gender', 'geography', 'age_group')}
+            risk_active, risk_fairly_active, risk_inactive = calculate_adjusted_risk_rates(
+                params['population_risk'], params['activity_rate'], params['relative_risk'],
+                params['fairly_activity_rate'], params['fairly_relative_risk'])
+            daly_active, _, daly_inactive = calculate_adjusted_risk_rates(
+                params['population_daly_risk'], params['activity_rate'], params['relative_risk'],
+                params['fairly_activity_rate'], params['fairly_relative_risk'])
+            death_active, _, death_inactive = calculate_adjusted_risk_rates(
+                params['population_mortality_risk'], params['activity_rate'], params['relative_risk'],
+                params['fairly_activity_rate'], params['fairly_relative_risk'])
+
+            cases_saved = calculate_cases_saved(risk_active, risk_inactive, additional_active)
+            fairly_cases_saved = calculate_cases_saved(risk_fairly_active, risk_inactive, additional_fairly_active)
+            total_cases_saved = cases_saved + fairly_cases_saved
+
+            rows.append({
+                'factor': params['factor'],
+                'risk_active': risk_active,
+                'risk_inactive': risk_inactive,
+                'active_cases_saved': cases_saved,
+                'fairly_active_cases_saved': fairly_cases_saved,
+                'active_dalys_saved': calculate_cases_saved(daly_active, daly_inactive, additional_active),
+                'active_deaths_saved': calculate_cases_saved(death_active, death_inactive, additional_active),
+                'direct_cost_per_case': params['direct_cost_per_case'],
+                'direct_cost_saving': total_cases_saved * params['direct_cost_per_case'],
+                'indirect_cost_per_case': params['indirect_cost_per_case'],
+                'indirect_cost_saving': total_cases_saved * params['indirect_cost_per_case'],
+                'total_saving': total_cases_saved * (params['direct_cost_per_case'] + params['indirect_cost_per_case'])
+            })
+
+    return pd.DataFrame(rows, columns=HEALTH_OUTCOME_COLUMNS)
+
+# Cost per case adjustment
+
+def adjust_market_costs(market_df, market, cpi_data, healthcare_expenditure, uk_adjustment_data, usa_adjustment_data):
+    """Costs of one market, already converted to local currency (cost_per_case, forex_rate), inflated and adjusted."""
+    market_df = market_df.copy()
+    market_df['geography'] = market
+
+    def calculate_inflation(row):
+        if pd.isna(row['base_year']):
+            return pd.Series([np.nan, np.nan], index=['inflation_rate', 'cost_inflated'])
+        try:
+            inflation_factor = cpi_data.loc[row['geography'], '2024'] / cpi_data.loc[row['geography'], str(int(row['base_year']))]
+        except KeyError:
+            inflation_factor = np.nan
+        if pd.isna(inflation_factor):
+            return pd.Series([np.nan, np.nan], index=['inflation_rate', 'cost_inflated'])
+        return pd.Series([inflation_factor, row['cost_per_case'] * inflation_factor], index=['inflation_rate', 'cost_inflated'])
+
+    market_df[['inflation_rate', 'cost_inflated']] = market_df.apply(calculate_inflation, axis=1)
+
+    try:
+        healthcare_expenditure_2024 = healthcare_expenditure.loc[healthcare_expenditure['Country Name'] == market, '2024'].values[0]
+    except IndexError:
+        healthcare_expenditure_2024 = np.nan
+
+    def income_adjustment_factor(row):
+        if row['direct']:
+            return 0
+        adjustment_data = usa_adjustment_data if row['factor'] == 'osteoporosis' else uk_adjustment_data
+        try:
+            return adjustment_data.loc[adjustment_data['Country Name'] == market, 'income_adjustment_factor'].iloc[0]
+        except (KeyError, IndexError):
+            return np.nan
+
+    market_df['income_adjustment_factor'] = market_df.apply(income_adjustment_factor, axis=1)
+    market_df['healthcare_expenditure_factor'] = market_df.apply(lambda row: healthcare_expenditure_2024 if row['direct'] else 0, axis=1)
+
+    market_df['cost_per_case_uk'] = market_df['cost_per_case_unflated']
+    market_df['cost_per_case_local'] = market_df['cost_per_case']
+    market_df['cost_per_case_adjusted'] = market_df.apply(
+        lambda row: row['cost_inflated'] * (row['healthcare_expenditure_factor'] if row['direct'] else row['income_adjustment_factor']),
+        axis=1
+    )
+
+    return market_df[['geography', 'factor', 'age_group', 'gender', 'direct',
+                      'cost_per_case_uk', 'forex_rate', 'cost_per_case_local',
+                      'inflation_rate', 'cost_inflated',
+                      'healthcare_expenditure_factor', 'income_adjustment_factor',
+                      'cost_per_case_adjusted']]
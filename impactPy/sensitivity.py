@@ -0,0 +1,207 @@
+
+"""
+Analytic sensitivities of scenario outcomes to every input.
+
+From the survey rates to the savings, every gender scenario is a closed-form composition:
+
+    new_customers = non-customers x % yes x % price_barrier
+    newly (fairly) active customers = new_customers x (fairly) change
+    spend = new_customers x spend per customer
+    cases_saved = sum over factors of the cases saved by the active and fairly active tiers
+                  (calculate_adjusted_risk_rates, calculate_cases_saved)
+    total_saving = sum over factors of cases saved x (direct + indirect cost per case)
+
+The model is evaluated once on Dual numbers: arrays carrying their partial derivatives with respect
+to each named input, propagated through every arithmetic operation by the chain rule. The risk
+decomposition runs through the health stage's own functions, so the derivatives are those of the
+exact formulas, for every scenario at once, without a finite-difference rerun per input.
+
+The result is a long, tornado-ready table: one row per (scenario, output, input), and per factor
+for the health parameters, with the derivative, the elasticity (% change of the output for a 1%
+change of the input) and the output at the input -/+ swing (10% by default), ranked by influence.
+"""
+
+
+import numpy as np
+import pandas as pd
+
+from .health_functions import calculate_adjusted_risk_rates, calculate_cases_saved
+from .mappings import COUNTRY_MAP
+
+SENSITIVITY_SETTINGS = {
+    'spend_column': 'avg_spent_$',
+    'swing': 0.1
+}
+
+SCENARIO_INPUTS = ['non-customers', '% yes', '% price_barrier', 'change', 'fairly change']
+
+HEALTH_INPUTS = ['population_risk', 'activity_rate', 'fairly_activity_rate', 'relative_risk', 'fairly_relative_risk',
+                 'direct_cost_per_case', 'indirect_cost_per_case']
+
+SENSITIVITY_COLUMNS = ['scenario_id', 'market', 'price', 'gender', 'output', 'input', 'factor', 'input_value',
+                       'output_value', 'derivative', 'elasticity', 'output_low', 'output_high', 'rank']
+
+class Dual:
+    """Array of values with their partial derivatives with respect to named inputs (forward-mode differentiation)."""
+
+    def __init__(self, value, partials=None):
+        self.value = np.asarray(value, dtype=float)
+        self.partials = partials or {}
+
+    @classmethod
+    def input(cls, name, value):
+        value = np.asarray(value, dtype=float)
+        return cls(value, {name: np.ones_like(value)})
+
+    def take(self, rows):
+        return Dual(self.value[rows], {name: partial[rows] for name, partial in self.partials.items()})
+
+    def _combine(self, other, value, d_self, d_other):
+        """Result of an operation with derivative d_self with respect to self and d_other with respect to other."""
+        partials = {name: d_self * partial for name, partial in self.partials.items()}
+        if isinstance(other, Dual):
+            for name, partial in other.partials.items():
+                partials[name] = partials[name] + d_other * partial if name in partials else d_other * partial
+        return Dual(value, partials)
+
+    def __add__(self, other):
+        return self._combine(other, self.value + _value(other), 1.0, 1.0)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self._combine(other, self.value - _value(other), 1.0, -1.0)
+
+    def __rsub__(self, other):
+        return self._combine(other, _value(other) - self.value, -1.0, 1.0)
+
+    def __mul__(self, other):
+        other_value = _value(other)
+        return self._combine(other, self.value * other_value, other_value, self.value)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        other_value = _value(other)
+        return self._combine(other, self.value / other_value, 1 / other_value, -self.value / other_value ** 2)
+
+    def __rtruediv__(self, other):
+        other_value = _value(other)
+        return self._combine(other, other_value / self.value, -other_value / self.value ** 2, 1 / self.value)
+
+    def __neg__(self):
+        return Dual(-self.value, {name: -partial for name, partial in self.partials.items()})
+
+def _value(x):
+    return x.value if isinstance(x, Dual) else np.asarray(x, dtype=float)
+
+def spend_output(spend_column):
+    """Business outcome column of a spending column, e.g. avg_spent_$ -> economic_outcome_avg_$."""
+    return 'economic_outcome_' + spend_column.replace('_spent', '')
+
+def customer_outcomes(inputs, spend_column=SENSITIVITY_SETTINGS['spend_column']):
+    """New, newly active and newly fairly active customers and their spend, as process_market_data and calculate_business_outcomes."""
+    new_customers = inputs['non-customers'] * inputs['% yes'] * inputs['% price_barrier']
+    return {
+        'new_customers': new_customers,
+        'newly_active_customers': new_customers * inputs['change'],
+        'newly_fairly_active_customers': new_customers * inputs['fairly change'],
+        spend_output(spend_column): new_customers * inputs[spend_column]
+    }
+
+def health_outcomes(newly_active, newly_fairly_active, parameters):
+    """Cases saved and total saving of one factor per row, as evaluate_health_outcomes."""
+    active_risk, fairly_active_risk, inactive_risk = calculate_adjusted_risk_rates(
+        parameters['population_risk'], parameters['activity_rate'], parameters['relative_risk'],
+        parameters['fairly_activity_rate'], parameters['fairly_relative_risk']
+    )
+    cases_saved = (calculate_cases_saved(active_risk, inactive_risk, newly_active)
+                   + calculate_cases_saved(fairly_active_risk, inactive_risk, newly_fairly_active))
+    total_saving = cases_saved * (parameters['direct_cost_per_case'] + parameters['indirect_cost_per_case'])
+    return cases_saved, total_saving
+
+def _rows(scenarios, output, output_value, input_name, input_value, derivative, factor=None):
+    return scenarios[['scenario_id', 'market', 'price', 'gender']].reset_index(drop=True).assign(
+        output=output, input=input_name, factor=factor, input_value=input_value,
+        output_value=output_value, derivative=derivative
+    )
+
+def scenario_sensitivities(scenarios_df, spending_df, parameters, country_map=COUNTRY_MAP, settings=SENSITIVITY_SETTINGS):
+    """
+    Derivatives and elasticities of new customers, spend, cases saved and total saving of every
+    gender scenario with respect to each input (SENSITIVITY_COLUMNS).
+
+    scenarios_df: gender elasticity scenarios (scenario_id, market, price, gender and SCENARIO_INPUTS)
+    spending_df: gender spending summary (market, gender and settings['spend_column'])
+    parameters: resolved health parameters, one row per (factor, gender, geography, age_group)
+                with a column per parameter (see parameter_values)
+
+    Factors whose outcome is blank (no cost per case, a relative risk of 0) are left out of the
+    totals, as in consolidate_results.
+    """
+    spend_column = settings['spend_column']
+    scenarios = scenarios_df.merge(spending_df[['market', 'gender', spend_column]], on=['market', 'gender'], how='left')
+    scenarios = scenarios.reset_index(drop=True)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inputs = {name: Dual.input(name, scenarios[name]) for name in SCENARIO_INPUTS + [spend_column]}
+        customers = customer_outcomes(inputs, spend_column)
+
+        # One row per scenario and factor, with the adult parameters of the scenario's gender and market
+        keys = pd.DataFrame({
+            'row': np.arange(len(scenarios)),
+            'gender': scenarios['gender'].str.lower(),
+            'geography': scenarios['scenario_id'].str[:3].map(country_map),
+            'age_group': 'adult'
+        })
+        factors = keys.merge(parameters, on=['gender', 'geography', 'age_group'], how='inner')
+        rows = factors['row'].to_numpy()
+
+        health_inputs = {name: Dual.input(name, factors[name]) for name in HEALTH_INPUTS}
+        health = health_outcomes(customers['newly_active_customers'].take(rows),
+                                 customers['newly_fairly_active_customers'].take(rows), health_inputs)
+
+    tables = []
+    for output in ['new_customers', spend_output(spend_column)]:
+        result = customers[output]
+        for name, derivative in result.partials.items():
+            tables.append(_rows(scenarios, output, result.value, name, inputs[name].value, derivative))
+
+    # Health outcomes are summed over factors; derivatives with respect to scenario inputs are summed
+    # with them, while each factor's parameters are inputs of their own
+    evaluated = np.bincount(rows, minlength=len(scenarios)) > 0
+    for output, result in zip(['cases_saved', 'total_saving'], health):
+        defined = ~np.isnan(result.value)
+        totals = np.bincount(rows, weights=np.where(defined, result.value, 0), minlength=len(scenarios))
+
+        for name, derivative in result.partials.items():
+            if name in health_inputs:
+                kept = defined & np.isfinite(derivative)
+                tables.append(_rows(scenarios.iloc[rows[kept]], output, totals[rows[kept]], name,
+                                    health_inputs[name].value[kept], derivative[kept], factors['factor'].to_numpy()[kept]))
+            else:
+                summed = np.bincount(rows, weights=np.where(defined, derivative, 0), minlength=len(scenarios))
+                tables.append(_rows(scenarios[evaluated], output, totals[evaluated], name,
+                                    inputs[name].value[evaluated], summed[evaluated]))
+
+    table = pd.concat(tables, ignore_index=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['elasticity'] = np.where(table['output_value'] != 0,
+                                       table['derivative'] * table['input_value'] / table['output_value'], np.nan)
+    swing = table['derivative'] * table['input_value'] * settings['swing']
+    table['output_low'] = table['output_value'] - swing
+    table['output_high'] = table['output_value'] + swing
+
+    # Most influential input first within every scenario and output
+    table['rank'] = (table['elasticity'].abs().groupby([table['scenario_id'], table['output']])
+                     .rank(method='first', ascending=False))
+    table = table.sort_values(['scenario_id', 'output', 'rank'], kind='stable').reset_index(drop=True)
+
+    return table[SENSITIVITY_COLUMNS]
+
+def rank_inputs(table):
+    """Median absolute elasticity of every output to every input (and factor) across scenarios, largest first."""
+    ranking = (table.assign(abs_elasticity=table['elasticity'].abs())
+               .groupby(['output', 'input', 'factor'], dropna=False)['abs_elasticity']
+               .median().rename('median_abs_elasticity').reset_index())
+    return ranking.sort_values(['output', 'median_abs_elasticity'], ascending=[True, False]).reset_index(drop=True)
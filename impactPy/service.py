@@ -0,0 +1,408 @@
+
+"""
+Long-running model service for low-latency scenario queries.
+
+Survey rates, penetration, activity and spending summaries and the health risk tables are loaded
+once. Every scenario (market x discount x segment) is then evaluated up front with the elasticity,
+business and health functions, so a query is an indexed lookup. Queries arriving at the same time
+are gathered by a batcher thread and looked up together in one evaluate call.
+
+A query is a JSON object such as
+    {"market": "Japan", "discount": 20, "segment": "gender", "value": "Female"}
+where market is a market name or scenario code (e.g. "JAP"), discount is any discount between 0
+and 100% (or "20%"), segment is gender, age_group or income_level (default gender) and value is optional
+(all segment values are returned when omitted). The survey discounts (10, 20, 40, 60 and 80%) are
+evaluated at startup; other discounts are evaluated on the demand curves (see
+impactPy.demand_curve) when first queried, and the most recently queried of them (curve_cache, default 64)
+are kept for later queries. A query that is not a JSON object, or matches
+no scenario, is answered with {"error": ...} without affecting the other queries.
+
+Startup messages (e.g. of the survey rate cache) go to stderr, so stdout only carries answers.
+
+Usage (from the repository root):
+    python -m impactPy.service --port 8000     HTTP: POST /query, GET /stats
+    python -m impactPy.service --stdin         one JSON query (or list of queries) per line
+"""
+
+
+import argparse
+import contextlib
+import functools
+import json
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from .business import calculate_business_outcomes
+from .elasticity import SURVEY_RATE_TABLES, calculate_survey_rates, prepare_market_data, process_market_data
+from .health_functions import get_risk_table, evaluate_health_outcomes, health_age_groups, split_scenarios_by_gender
+from .incremental import load_or_calculate_rates
+from .mappings import COUNTRY_MAP
+from .pipeline import PATHS, SEGMENTS
+from .precision import resolve_precision
+from .survey import load_survey, process_data
+
+HEALTH_TOTAL_COLUMNS = ['active_cases_saved', 'fairly_active_cases_saved', 'active_dalys_saved', 'active_deaths_saved',
+                        'direct_cost_saving', 'indirect_cost_saving', 'total_saving']
+
+RESULT_COLUMNS = ['scenario_id', 'market', 'price', 'segment', 'value', 'new_customers', 'newly_active_customers',
+                  'newly_fairly_active_customers',
+                  'economic_outcome_median_local', 'economic_outcome_median_$',
+                  'economic_outcome_avg_local', 'economic_outcome_avg_$'] + HEALTH_TOTAL_COLUMNS
+
+def build_scenario_table(survey_rates, market_data, spending_summaries, country_map=COUNTRY_MAP, discounts=None):
+    """
+    Evaluate every scenario of every segment into one long table keyed by (code, discount, segment, value),
+    at the survey discounts or, if given, at discounts on the demand curves.
+    """
+
+    tables = []
+    for mode in SEGMENTS:
+        scenarios_df = process_market_data(survey_rates[mode], mode, market_data, discounts)
+        business_df = calculate_business_outcomes(scenarios_df, spending_summaries[mode], mode)
+
+        table = scenarios_df.merge(business_df.drop(columns=['price', mode, 'new_customers']), on='scenario_id', how='left')
+        table = table.rename(columns={mode: 'value'})
+        table['segment'] = mode
+        tables.append(table)
+
+    table = pd.concat(tables, ignore_index=True)
+    table['code'] = table['scenario_id'].str[:3]
+    table['discount'] = table['price'].str.rstrip('%').astype(float)
+
+    # Health outcomes are available for the gender and age group cuts (age groups split by gender), summed over diseases
+    gender_df = table[table['segment'] == 'gender'].assign(gender=lambda df: df['value'], gender_share=1.0)
+    age_df = split_scenarios_by_gender(
+        table[table['segment'] == 'age_group'].assign(age_group=lambda df: df['value']),
+        survey_rates['gender_age_proportions'], 'age_group'
+    )
+    health_scenarios = pd.concat([gender_df, age_df], ignore_index=True)
+    health_scenarios = pd.DataFrame({
+        'scenario_id': health_scenarios['scenario_id'],
+        'segment': health_scenarios['segment'],
+        'gender': health_scenarios['gender'].str.lower(),
+        'geography': health_scenarios['code'].map(country_map),
+        'health_age_group': health_age_groups(health_scenarios),
+        'newly_active_customers': health_scenarios['newly_active_customers'],
+        'newly_fairly_active_customers': health_scenarios['newly_fairly_active_customers']
+    }).dropna(subset=['geography'])
+
+    risk_table = get_risk_table(health_scenarios['gender'].unique(), health_scenarios['geography'].unique(),
+                                age_groups=health_scenarios['health_age_group'].unique(), report=False)
+    health_df = evaluate_health_outcomes(health_scenarios, risk_table)
+    health_totals = health_df.groupby(['scenario_id', 'segment'])[HEALTH_TOTAL_COLUMNS].sum().reset_index()
+
+    # scenario_ids are only unique within a segment (e.g. SPA40M is Male and Middle income)
+    return table.merge(health_totals, on=['scenario_id', 'segment'], how='left')
+
+def index_scenarios(scenario_table):
+    """Result rows of a scenario table, as lists of dicts keyed by (code, discount, segment)."""
+    index = {}
+    records = scenario_table[RESULT_COLUMNS].astype(object).where(scenario_table[RESULT_COLUMNS].notna(), None)
+    for key, record in zip(zip(scenario_table['code'], scenario_table['discount'], scenario_table['segment']),
+                           records.to_dict('records')):
+        index.setdefault(key, []).append(record)
+    return index
+
+def normalise_query(query):
+    """
+    Turn a query dict into its lookup key (code, discount, segment) and optional segment value,
+    raising ValueError for a query that is not a dict or names its segment by anything but a string.
+    """
+    if not isinstance(query, dict):
+        raise ValueError(f"A query must be a JSON object, got {json.dumps(query, default=str)}")
+    if not isinstance(query.get('segment', 'gender'), str):
+        raise ValueError(f"The segment of a query must be a string, got {json.dumps(query['segment'], default=str)}")
+
+    discount = query.get('discount')
+    if isinstance(discount, str):
+        discount = discount.strip().rstrip('%')
+    try:
+        discount = float(discount)
+    except (TypeError, ValueError):
+        discount = None
+
+    code = str(query.get('market', '')).strip()[:3].upper()
+    return (code, discount, query.get('segment', 'gender')), query.get('value')
+
+class ModelService:
+    """
+    Holds the evaluated scenario table, indexed by (code, discount, segment), and answers queries against it.
+
+    build, if given, returns the scenario table of a list of discounts (build_scenario_table on the
+    demand curves); queries at discounts missing from the table are then evaluated with it, and the
+    tables of the curve_cache most recently queried such discounts are kept. Without it such queries
+    are answered with an error.
+    """
+
+    def __init__(self, scenario_table, latency_window=10000, build=None, curve_cache=64):
+        self.scenario_table = scenario_table
+        self.build = build
+        self.curve_cache = curve_cache
+        self._index = index_scenarios(scenario_table)
+        self._discounts = set(scenario_table['discount'])
+        self._curve_indexes = OrderedDict()
+        self.latencies = deque(maxlen=latency_window)
+        self.request_count = 0
+        self.batch_sizes = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frames(cls, survey_rates, market_penetration, activity_summarised, spending_summaries, **kwargs):
+        market_data = prepare_market_data(
+            survey_rates['age_proportions'],
+            market_penetration['gender'],
+            market_penetration['age_group'],
+            activity_summarised['gender'],
+            activity_summarised['age_group'],
+            market_penetration['income_level'],
+            activity_summarised['income_level']
+        )
+        build = functools.partial(build_scenario_table, survey_rates, market_data, spending_summaries)
+        return cls(build(), build=build, **kwargs)
+
+    @classmethod
+    def from_files(cls, paths=PATHS, **kwargs):
+        survey_rates = load_or_calculate_rates(
+            paths['survey_rates'],
+            [paths['survey']],
+            lambda: calculate_survey_rates(process_data(load_survey(paths['survey'], paths['survey_sheet']))),
+            SURVEY_RATE_TABLES,
+            {'precision': resolve_precision()}
+        )
+        market_penetration = {mode: pd.read_excel(path) for mode, path in paths['market_penetration'].items()}
+        activity_summarised = {mode: pd.read_excel(path) for mode, path in paths['activity_summary'].items()}
+        spending_summaries = {mode: pd.read_excel(path) for mode, path in paths['spending_summary'].items()}
+        return cls.from_frames(survey_rates, market_penetration, activity_summarised, spending_summaries, **kwargs)
+
+    def evaluate(self, queries):
+        """Answer a list of queries; returns one list of result rows per query."""
+        parsed = []
+        for query in queries:
+            try:
+                parsed.append(normalise_query(query))
+            except ValueError as e:
+                parsed.append(e)
+
+        # Discounts off the survey grid are evaluated on the demand curves, the missing ones all in one table
+        indexes = {}
+        if self.build is not None:
+            off_grid = {key[1] for key, _ in (item for item in parsed if not isinstance(item, ValueError))
+                        if key[1] is not None and 0 < key[1] < 100 and key[1] not in self._discounts}
+            for discount in off_grid & self._curve_indexes.keys():
+                self._curve_indexes.move_to_end(discount)
+                indexes[discount] = self._curve_indexes[discount]
+            missing = off_grid - indexes.keys()
+            if missing:
+                built = index_scenarios(self.build(discounts=sorted(missing)))
+                for discount in missing:
+                    indexes[discount] = {key: rows for key, rows in built.items() if key[1] == discount}
+                    self._curve_indexes[discount] = indexes[discount]
+            while len(self._curve_indexes) > self.curve_cache:
+                self._curve_indexes.popitem(last=False)
+
+        answers = []
+        for query, item in zip(queries, parsed):
+            if isinstance(item, ValueError):
+                answers.append([{'error': str(item)}])
+                continue
+            key, value = item
+            rows = (self._index if key[1] in self._discounts else indexes.get(key[1], {})).get(key, [])
+            if value is not None:
+                rows = [row for row in rows if row['value'] == value]
+            if rows:
+                answers.append(rows)
+            elif key[1] is None or not 0 < key[1] < 100:
+                answers.append([{'error': f"The discount of {query} must be a number between 0 and 100"}])
+            elif key[1] not in self._discounts and self.build is None:
+                answers.append([{'error': f"No scenario matches {query}: only the discounts {sorted(self._discounts)} "
+                                          "are evaluated"}])
+            else:
+                answers.append([{'error': f"No scenario matches {query}"}])
+
+        return answers
+
+    def query(self, queries):
+        """Evaluate queries and record the latency of the call."""
+        start = time.perf_counter()
+        answers = self.evaluate(queries)
+        self.record(time.perf_counter() - start, len(queries))
+        return answers
+
+    def record(self, seconds, batch_size=None):
+        with self._lock:
+            self.latencies.append(seconds)
+            if batch_size is not None:
+                self.batch_sizes.append(batch_size)
+            self.request_count += 1
+
+    def stats(self):
+        """Latency percentiles (milliseconds) over the most recent requests."""
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000
+            batch_sizes = np.array(self.batch_sizes)
+            request_count = self.request_count
+
+        if latencies.size == 0:
+            return {'requests': request_count}
+
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        return {
+            'requests': request_count,
+            'latency_ms': {'p50': float(p50), 'p90': float(p90), 'p99': float(p99), 'max': float(latencies.max())},
+            'mean_batch_size': float(batch_sizes.mean()) if batch_sizes.size else None
+        }
+
+class QueryBatcher:
+    """
+    Gathers queries submitted concurrently (e.g. by HTTP handler threads) and evaluates them
+    together, waiting at most max_wait seconds for a batch to fill up to max_batch queries.
+    """
+
+    def __init__(self, service, max_batch=512, max_wait=0.002):
+        self.service = service
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, queries):
+        """Block until the queries are answered; the recorded latency includes time spent queued."""
+        start = time.perf_counter()
+        request = {'queries': queries, 'done': threading.Event()}
+        self._requests.put(request)
+        request['done'].wait()
+        self.service.record(time.perf_counter() - start)
+        return request['answers']
+
+    def _run(self):
+        while True:
+            batch = [self._requests.get()]
+            size = len(batch[0]['queries'])
+            deadline = time.perf_counter() + self.max_wait
+
+            while size < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request['queries'])
+
+            queries = [query for request in batch for query in request['queries']]
+            with self.service._lock:
+                self.service.batch_sizes.append(len(queries))
+            try:
+                answers = self.service.evaluate(queries)
+            except Exception as e:
+                answers = [[{'error': str(e)}] for _ in queries]
+
+            position = 0
+            for request in batch:
+                count = len(request['queries'])
+                request['answers'] = answers[position:position + count]
+                position += count
+                request['done'].set()
+
+def make_handler(batcher):
+    class ServiceHandler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._send(200, batcher.service.stats())
+            elif self.path == '/health':
+                self._send(200, {'status': 'ok'})
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/query':
+                self._send(404, {'error': 'not found'})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            except ValueError as e:
+                self._send(400, {'error': f"Invalid JSON: {e}"})
+                return
+
+            queries = payload if isinstance(payload, list) else [payload]
+            self._send(200, {'results': batcher.submit(queries)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ServiceHandler
+
+class ServiceHTTPServer(ThreadingHTTPServer):
+    # Accept bursts of concurrent dashboard requests instead of resetting connections
+    request_queue_size = 256
+    daemon_threads = True
+
+def serve_http(service, host='127.0.0.1', port=8000, max_batch=512, max_wait=0.002):
+    batcher = QueryBatcher(service, max_batch=max_batch, max_wait=max_wait)
+    server = ServiceHTTPServer((host, port), make_handler(batcher))
+    print(f"Serving model queries on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def serve_stdin(service, stdin=sys.stdin, stdout=sys.stdout):
+    """Answer one JSON query (or list of queries) per input line with one JSON line."""
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            payload = json.loads(line)
+        except ValueError as e:
+            stdout.write(json.dumps({'error': f"Invalid JSON: {e}"}) + '\n')
+        else:
+            if payload == 'stats':
+                stdout.write(json.dumps(service.stats()) + '\n')
+            else:
+                queries = payload if isinstance(payload, list) else [payload]
+                stdout.write(json.dumps({'results': service.query(queries)}) + '\n')
+        stdout.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve HFA SROI scenario queries from warm caches.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--stdin', action='store_true', help='read JSON-lines queries from stdin instead of serving HTTP')
+    parser.add_argument('--max-batch', type=int, default=512)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--curve-cache', type=int, default=64,
+                        help='number of off-grid discounts whose evaluated scenarios are kept')
+    args = parser.parse_args(argv)
+
+    # Keep stdout for answers: in --stdin mode it is the JSON-lines protocol
+    with contextlib.redirect_stdout(sys.stderr):
+        service = ModelService.from_files(curve_cache=args.curve_cache)
+
+    if args.stdin:
+        serve_stdin(service)
+    else:
+        serve_http(service, args.host, args.port, args.max_batch, args.max_wait_ms / 1000)
+
+if __name__ == "__main__":
+    main()
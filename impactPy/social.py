@@ -0,0 +1,74 @@
+
+"""
+Social outcome of investment.
+The social outcome refers to the change in social levels when a non-customer becomes a customer. 
+It is measured using two survey questions related to life satisfaction (S6) and community trust (S7).
+"""
+
+
+import pandas as pd
+
+MARKET_COLUMN_ORDER = [
+    'market',
+    'S6_customer', 'S6_non_customer',
+    'S7_customer', 'S7_non_customer',
+    'life_satisfaction_change', 'community_trust_change', 'social_change',
+    'weighted_total'
+]
+
+# Weighted sums behind the social means, per (group columns, dSEGMENT)
+SOCIAL_SUM_COLUMNS = ['weighted_S6', 'weighted_S7', 'WEIGHT']
+
+def social_sums(df, keys):
+    """Weighted S6 and S7 answers and weights (SOCIAL_SUM_COLUMNS) of every (keys, dSEGMENT) group."""
+    data = df[keys + ['dSEGMENT', 'WEIGHT']].assign(weighted_S6=df['S6'] * df['WEIGHT'], weighted_S7=df['S7'] * df['WEIGHT'])
+    return data.groupby(keys + ['dSEGMENT'])[SOCIAL_SUM_COLUMNS].sum()
+
+def weighted_social_means(sums):
+    """
+    Weighted mean S6 and S7 of customers and non-customers, and their weights, of every group of the
+    weighted sums (SOCIAL_SUM_COLUMNS) per (group columns, dSEGMENT): as summed by social_sums or
+    merged from survey waves (see impactPy.waves).
+    """
+    sums = sums.unstack('dSEGMENT').reindex(columns=pd.MultiIndex.from_product([SOCIAL_SUM_COLUMNS, [1, 2]])).fillna(0.0)
+    return pd.DataFrame({
+        'S6_customer': sums['weighted_S6'][1] / sums['WEIGHT'][1],
+        'S6_non_customer': sums['weighted_S6'][2] / sums['WEIGHT'][2],
+        'S7_customer': sums['weighted_S7'][1] / sums['WEIGHT'][1],
+        'S7_non_customer': sums['weighted_S7'][2] / sums['WEIGHT'][2],
+        'weighted_customers': sums['WEIGHT'][1],
+        'weighted_non_customers': sums['WEIGHT'][2]
+    }).reset_index()
+
+def add_social_change(summary):
+    # Calculate change in social outcomes
+    summary['life_satisfaction_change'] = (summary['S6_customer'] - summary['S6_non_customer'])/summary['S6_customer']
+    summary['community_trust_change'] = (summary['S7_customer'] - summary['S7_non_customer'])/summary['S7_customer']
+    summary['social_change'] = (summary['life_satisfaction_change'] + summary['community_trust_change']) / 2
+    return summary
+
+def calculate_social_outcomes(df, group_column):
+    """Social change by market and segment for Male and Female respondents."""
+
+    # Filter for Male and Female only
+    df_filtered = df[df['S4'].isin([1, 2])]
+
+    return social_outcomes_from_sums(social_sums(df_filtered, ['market', group_column]))
+
+def social_outcomes_from_sums(sums):
+    """Social change of every group of the weighted sums per (market, segment, dSEGMENT), as calculate_social_outcomes."""
+    summary = weighted_social_means(sums).drop(columns=['weighted_customers', 'weighted_non_customers'])
+    return add_social_change(summary)
+
+def calculate_market_social_outcomes(df):
+    """Social change by market over all respondents."""
+    return market_social_outcomes_from_sums(social_sums(df, ['market']))
+
+def market_social_outcomes_from_sums(sums):
+    """Social change of every market of the weighted sums per (market, dSEGMENT), as calculate_market_social_outcomes."""
+    market_summary = add_social_change(weighted_social_means(sums))
+
+    # Calculate total weighted counts
+    market_summary['weighted_total'] = market_summary['weighted_customers'] + market_summary['weighted_non_customers']
+
+    return market_summary[MARKET_COLUMN_ORDER]
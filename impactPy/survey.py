@@ -0,0 +1,36 @@
+
+"""
+Loading the elasticity questionnaire and mapping its demographic codes
+(gender, age group, market and income level) to the segment labels used by the model.
+"""
+
+
+import pandas as pd
+
+from .mappings import GENDER_MAPPING, AGE_MAPPING, MARKET_MAPPING, COLUMN_MAPPING, INCOME_MAPPINGS
+
+SURVEY_PATH = 'data/survey_data/Elasticity_Questionnaire_v3.xlsx'
+SURVEY_SHEET = 'Data'
+
+def load_survey(file_path=SURVEY_PATH, sheet_name=SURVEY_SHEET):
+    return pd.read_excel(file_path, sheet_name=sheet_name)
+
+def map_income_level(row):
+    market = row['S1']
+    income_column = f'S5_{COLUMN_MAPPING[market]}'
+    income_value = row[income_column]
+
+    if income_value == 99:
+        return 'Prefer not to answer'
+
+    return INCOME_MAPPINGS.get(market, {}).get(income_value, 'Unknown')
+
+def process_data(df):
+    """Return a copy of the survey with gender, age_group, market and income_level labels."""
+    segments = pd.DataFrame({
+        'gender': df['S4'].map(GENDER_MAPPING),
+        'age_group': df['dS3_RECODE'].map(AGE_MAPPING),
+        'market': df['S1'].map(MARKET_MAPPING),
+        'income_level': df.apply(map_income_level, axis=1)
+    }, index=df.index)
+    return pd.concat([df.drop(columns=segments.columns, errors='ignore'), segments], axis=1)
@@ -0,0 +1,132 @@
+
+"""
+Activity threshold sweep.
+
+The active flag of the activity stage is total weekly minutes >= 150, with vigorous minutes
+counting double. To test other definitions without rerunning the activity and summary stages,
+the weekly minutes of every respondent are recomputed from the activity output under each
+intensity weighting scheme, and sorted with cumulative survey weights per
+(scheme, market, segment value, customer status).
+
+The weighted share of respondents below any threshold is then one searchsorted into those
+cumulative distributions, so the active customer and non-customer rates (and change) of every
+market and segment value come out for a whole list of thresholds and schemes at once. At 150
+minutes under the WHO scheme they equal the activity summaries, including the fairly active
+shares (respondents from 30 minutes up to the threshold).
+"""
+
+
+import numpy as np
+import pandas as pd
+
+from .activity import ACTIVE_MINUTES, CUSTOMER_STATUS, FAIRLY_ACTIVE_MINUTES, INTENSITY_WEIGHTS, format_activity_summary
+
+# Weight of a minute of low, moderate and high intensity activity in each scheme
+INTENSITY_SCHEMES = {
+    'who': INTENSITY_WEIGHTS,
+    'vigorous_x1': {'low': 0, 'moderate': 1, 'high': 1},
+    'vigorous_x3': {'low': 0, 'moderate': 1, 'high': 3}
+}
+
+THRESHOLD_SETTINGS = {
+    'thresholds': [60, 90, 120, 150, 180, 210, 240, 300],
+    'schemes': INTENSITY_SCHEMES
+}
+
+ACTIVITY_MINUTE_COLUMNS = [('total_gym_minutes', 'gym_intensity'),
+                           ('walking_minutes', 'walking_intensity'),
+                           ('other_sports_minutes', 'other_sports_intensity')]
+
+def weekly_minutes(df, intensity_weights):
+    """Total weekly activity minutes of every respondent under one intensity weighting, as in activity_minutes."""
+    total = np.zeros(len(df))
+    for minutes, intensity in ACTIVITY_MINUTE_COLUMNS:
+        values = df[minutes].to_numpy(dtype=float)
+        weights = df[intensity].map(intensity_weights).to_numpy(dtype=float)
+        total += np.where(values > 0, values * weights, 0)
+    return total
+
+class ActivityDistributions:
+    """
+    Weighted cumulative distributions of weekly activity minutes of one segmentation.
+
+    df: segmented survey with the activity output columns (see load_segmented_survey)
+    group_columns: segment columns, e.g. ['gender']; groups are (market, *group_columns) and
+    only groups with both customers and non-customers are kept, as in create_activity_summary.
+    """
+
+    def __init__(self, df, group_columns, schemes=INTENSITY_SCHEMES):
+        keys = ['market'] + list(group_columns)
+        data = df[df['dSEGMENT'].isin(list(CUSTOMER_STATUS))].dropna(subset=keys)
+
+        statuses = data.groupby(keys)['dSEGMENT'].nunique()
+        self.groups = statuses[statuses == len(CUSTOMER_STATUS)].index.to_frame(index=False)
+        group_codes = pd.MultiIndex.from_frame(self.groups).get_indexer(pd.MultiIndex.from_frame(data[keys]))
+        data, group_codes = data[group_codes >= 0], group_codes[group_codes >= 0]
+
+        # One cell per (group, customer status): customers first, then non-customers
+        status_codes = data['dSEGMENT'].map({status: code for code, status in enumerate(CUSTOMER_STATUS)}).to_numpy()
+        cells = group_codes * len(CUSTOMER_STATUS) + status_codes
+        self.n_cells = len(self.groups) * len(CUSTOMER_STATUS)
+        weights = data['WEIGHT'].to_numpy(dtype=float)
+        self.cell_weights = data['WEIGHT'].groupby(cells).sum().reindex(np.arange(self.n_cells)).to_numpy()
+
+        self.schemes = list(schemes)
+        self.distributions = {}
+        for scheme, intensity_weights in schemes.items():
+            minutes = weekly_minutes(data, intensity_weights)
+            order = np.lexsort((minutes, cells))
+
+            # Cells are laid end to end on one axis, each spanning more than the largest value
+            span = minutes.max() + 1 if len(minutes) else 1.0
+            self.distributions[scheme] = {
+                'span': span,
+                'positions': cells[order] * span + minutes[order],
+                'cumulative_weights': np.concatenate([[0.0], np.cumsum(weights[order])]),
+                'cell_starts': np.searchsorted(cells[order], np.arange(self.n_cells + 1))
+            }
+
+    def active_rates(self, thresholds, scheme='who'):
+        """Weighted share of respondents at or above each threshold, as an array of (groups, customer status, thresholds)."""
+        distribution = self.distributions[scheme]
+        thresholds = np.clip(np.asarray(thresholds, dtype=float), 0, distribution['span'])
+
+        cumulative = distribution['cumulative_weights']
+        starts = distribution['cell_starts']
+        queries = np.arange(self.n_cells)[:, None] * distribution['span'] + thresholds[None, :]
+
+        below = cumulative[np.searchsorted(distribution['positions'], queries, side='left')] - cumulative[starts[:-1], None]
+        totals = cumulative[starts[1:]] - cumulative[starts[:-1]]
+
+        return (1 - below / totals[:, None]).reshape(len(self.groups), len(CUSTOMER_STATUS), -1)
+
+    def curves(self, thresholds, schemes=None):
+        """Active customer and non-customer rates and change of every group, for every scheme and threshold."""
+        thresholds = np.asarray(thresholds, dtype=float)
+        schemes = schemes or self.schemes
+        n_groups, n_thresholds = len(self.groups), len(thresholds)
+
+        tables = []
+        for scheme in schemes:
+            rates = self.active_rates(thresholds, scheme)
+            table = self.groups.iloc[np.repeat(np.arange(n_groups), n_thresholds)].reset_index(drop=True)
+            table.insert(0, 'scheme', scheme)
+            table['threshold'] = np.tile(thresholds, n_groups)
+            table['active customers'] = rates[:, 0, :].ravel()
+            table['active non-customers'] = rates[:, 1, :].ravel()
+            table['change'] = table['active customers'] - table['active non-customers']
+            tables.append(table)
+
+        return pd.concat(tables, ignore_index=True)
+
+    def summary(self, threshold=ACTIVE_MINUTES, scheme='who', fairly_active_threshold=FAIRLY_ACTIVE_MINUTES):
+        """Activity summary (as create_activity_summary) for one threshold and scheme, e.g. to feed the elasticity stage."""
+        rates = self.active_rates([threshold, min(fairly_active_threshold, threshold)], scheme)
+        active, fairly_active = rates[:, :, 0], rates[:, :, 1] - rates[:, :, 0]
+        weights = self.cell_weights.reshape(len(self.groups), len(CUSTOMER_STATUS))
+        return format_activity_summary(self.groups, active[:, 0], active[:, 1], weights[:, 0], weights[:, 1],
+                                       fairly_active[:, 0], fairly_active[:, 1])
+
+def threshold_curves(df, segments, thresholds=THRESHOLD_SETTINGS['thresholds'], schemes=INTENSITY_SCHEMES):
+    """Threshold curves of every segment (dict of DataFrames by segment)."""
+    return {segment: ActivityDistributions(df, [segment], schemes).curves(thresholds) for segment in segments}
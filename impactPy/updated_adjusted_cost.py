@@ -3,7 +3,6 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import yfinance as yf
 
 def read_data(file_path):
     return pd.read_csv(file_path)
@@ -39,6 +38,9 @@ def get_inflation_adjustment(cpi_data, country, base_year):
         return np.nan
 
 def fetch_exchange_rate(currency_pair, date, max_attempts=4):
+    # Imported here so the module can be used without yfinance installed
+    import yfinance as yf
+
     for i in range(max_attempts):
         adjusted_date = date + timedelta(days=i)
         data = yf.download(currency_pair, start=adjusted_date, end=adjusted_date + timedelta(days=1))
@@ -84,7 +86,45 @@ def get_income_adjustment_factor(uk_data, usa_data, market, factor):
     except (KeyError, IndexError):
         return np.nan
 
-# [Previous imports and functions remain the same until process_market_data]
+def adjust_market_costs(market_df, market, cpi_data, healthcare_expenditure, uk_adjustment_data, usa_adjustment_data):
+    """Inflate the local costs of one market (cost_per_case and forex_rate converted) and adjust them by healthcare expenditure or income."""
+    market_df = market_df.copy()
+    market_df['geography'] = market
+    market_df[['inflation_rate','cost_inflated']] = calculate_inflated_costs(market_df, cpi_data)
+
+    try:
+        healthcare_expenditure_2024 = healthcare_expenditure.loc[healthcare_expenditure['Country Name'] == market, '2024'].values[0]
+    except IndexError:
+        healthcare_expenditure_2024 = np.nan
+
+    # Set adjustment_factor to 0 if direct is True; otherwise use income adjustment factor
+    market_df['income_adjustment_factor'] = market_df.apply(
+        lambda row: 0 if row['direct'] else get_income_adjustment_factor(uk_adjustment_data, usa_adjustment_data, market, row['factor']),
+        axis=1
+    )
+
+    # Set healthcare expenditure to 0 if direct is False
+    market_df['healthcare_expenditure_factor'] = market_df.apply(
+        lambda row: healthcare_expenditure_2024 if row['direct'] else 0,
+        axis=1
+    )
+
+    # Adjust costs based on the updated adjustment factor
+    def adjust_costs(row):
+        adjustment_factor = row['healthcare_expenditure_factor'] if row['direct'] else row['income_adjustment_factor']
+        return row['cost_inflated'] * adjustment_factor
+
+    market_df['cost_per_case_uk'] = market_df['cost_per_case_unflated']
+    market_df['cost_per_case_local'] = market_df['cost_per_case']
+
+    market_df['cost_per_case_adjusted'] = market_df.apply(adjust_costs, axis=1)
+
+    # Include these columns in the final output
+    return market_df[['geography', 'factor', 'age_group', 'gender', 'direct',
+                      'cost_per_case_uk', 'forex_rate', 'cost_per_case_local',
+                      'inflation_rate', 'cost_inflated',
+                      'healthcare_expenditure_factor', 'income_adjustment_factor',
+                      'cost_per_case_adjusted']]
 
 def process_market_data(df, markets, cpi_data, healthcare_expenditure, uk_adjustment_data, usa_adjustment_data):
     consolidated_data = []
@@ -94,42 +134,8 @@ def process_market_data(df, markets, cpi_data, healthcare_expenditure, uk_adjust
         market_df = market_df[(market_df['age_group'] == 'adult') & (market_df['category'] == 'health')]
 
         market_df[['cost_per_case', 'forex_rate']] = convert_cost_to_local_currency(market_df, currency_pair)
-        market_df['geography'] = market
-        market_df[['inflation_rate','cost_inflated']] = calculate_inflated_costs(market_df, cpi_data)
-
-        try:
-            healthcare_expenditure_2024 = healthcare_expenditure.loc[healthcare_expenditure['Country Name'] == market, '2024'].values[0]
-        except IndexError:
-            healthcare_expenditure_2024 = np.nan
-
-        # Set adjustment_factor to 0 if direct is True; otherwise use income adjustment factor
-        market_df['income_adjustment_factor'] = market_df.apply(
-            lambda row: 0 if row['direct'] else get_income_adjustment_factor(uk_adjustment_data, usa_adjustment_data, market, row['factor']),
-            axis=1
-        )
-
-        # Set healthcare expenditure to 0 if direct is False
-        market_df['healthcare_expenditure_factor'] = market_df.apply(
-            lambda row: healthcare_expenditure_2024 if row['direct'] else 0,
-            axis=1
-        )
-        
-        # Adjust costs based on the updated adjustment factor
-        def adjust_costs(row):
-            adjustment_factor = row['healthcare_expenditure_factor'] if row['direct'] else row['income_adjustment_factor']
-            return row['cost_inflated'] * adjustment_factor
-
-        market_df['cost_per_case_uk'] = market_df['cost_per_case_unflated']
-        market_df['cost_per_case_local'] = market_df['cost_per_case']
-        
-        market_df['cost_per_case_adjusted'] = market_df.apply(adjust_costs, axis=1)
-
-        # Include these columns in the final output
-        consolidated_data.append(market_df[['geography', 'factor', 'age_group', 'gender', 'direct',
-                                          'cost_per_case_uk', 'forex_rate', 'cost_per_case_local',
-                                          'inflation_rate', 'cost_inflated',
-                                          'healthcare_expenditure_factor', 'income_adjustment_factor',
-                                          'cost_per_case_adjusted']])
+        consolidated_data.append(adjust_market_costs(market_df, market, cpi_data, healthcare_expenditure,
+                                                     uk_adjustment_data, usa_adjustment_data))
 
     return pd.concat(consolidated_data, ignore_index=True)
 
@@ -0,0 +1,317 @@
+
+"""
+Input validation gate.
+
+Bad inputs otherwise surface late or not at all: an unknown frequency code counts as 0 days, an
+unknown income code becomes 'Unknown', a missing health parameter stops the health stage for a
+whole market, and a formatted number ("6,323.49" outside the cost table) is not a number. The
+validation stage checks every survey and parameter input before any heavy work:
+
+- required columns, and no missing values where every respondent must answer;
+- code domains of the survey questions (market, gender, age, customer status, frequency,
+  intensity, income per market, price scenarios, S6/S7 scales);
+- survey weights finite and positive, durations and spend non-negative;
+- numeric coercibility of every numeric column of the health parameter tables, as they are read;
+- coverage of every health parameter for each (factor, gender, geography, age group) the run will
+  evaluate, and plausible values (rates within 0-1, relative risks positive);
+- market penetration columns, values and coverage of the survey markets.
+
+Each check is one vectorised mask over a whole table. Failures are aggregated into a report with
+one row per (source, check, column): how many rows fail and a few examples. Errors stop the
+pipeline; warnings (e.g. a parameter left blank) are only reported.
+"""
+
+
+import numpy as np
+import pandas as pd
+
+from .activity import ACTIVITY_QUESTIONS, FREQUENCY_DAYS, INTENSITY_CODES, CUSTOMER_STATUS
+from .health_functions import (AGE_GROUP_ALIASES, COST_NUMERIC_COLUMNS, HEALTH_AGE_STRATA, HEALTH_LISTS,
+                               HEALTH_PARAMETERS, HEALTH_SOURCES, RISK_KEY_COLUMNS, resolve_health_parameters)
+from .mappings import AGE_MAPPING, COLUMN_MAPPING, COUNTRY_MAP, GENDER_MAPPING, INCOME_MAPPINGS, MARKET_MAPPING, SCENARIOS
+
+REPORT_COLUMNS = ['source', 'check', 'column', 'severity', 'count', 'examples']
+
+MAX_EXAMPLES = 5
+
+# Answers every respondent must give
+SURVEY_REQUIRED_COLUMNS = ['S1', 'S4', 'dS3_RECODE', 'dSEGMENT', 'uuid', 'WEIGHT', 'S6', 'S7']
+
+# Valid codes of each coded question; missing answers are allowed unless required
+SURVEY_CODE_DOMAINS = {
+    'S1': MARKET_MAPPING,
+    'S4': GENDER_MAPPING,
+    'dS3_RECODE': AGE_MAPPING,
+    'dSEGMENT': CUSTOMER_STATUS,
+    'S6': range(0, 11),
+    'S7': range(1, 6),
+    **{column: (1, 2) for column in SCENARIOS}
+}
+for questions in ACTIVITY_QUESTIONS.values():
+    for item, column in questions.items():
+        if item.endswith('_freq'):
+            SURVEY_CODE_DOMAINS[column] = FREQUENCY_DAYS
+        elif item.endswith('_intensity'):
+            SURVEY_CODE_DOMAINS[column] = INTENSITY_CODES
+
+SURVEY_NON_NEGATIVE_COLUMNS = [column for questions in ACTIVITY_QUESTIONS.values()
+                               for item, column in questions.items() if item.endswith('_duration')] + ['Q2r1']
+
+# Income answer meaning "Prefer not to answer"
+INCOME_REFUSED = 99
+
+PENETRATION_COLUMNS = {
+    'gender': ['market', 'gender', 'non-customers'],
+    'age_group': ['market', 'non-customers'],
+    'income_level': ['market', 'income_level', 'non-customers']
+}
+
+# Plausible range of each resolved health parameter (inclusive bounds)
+PARAMETER_RANGES = {
+    'activity_rate': (0, 1),
+    'fairly_activity_rate': (0, 1),
+    'relative_risk': (0, np.inf),
+    'fairly_relative_risk': (0, np.inf),
+    'population_risk': (0, np.inf),
+    'population_mortality_risk': (0, np.inf),
+    'population_daly_risk': (0, np.inf),
+    'direct_cost_per_case': (0, np.inf),
+    'indirect_cost_per_case': (0, np.inf)
+}
+
+def failing(source, check, column, bad, values, severity='error'):
+    """Report rows for the rows flagged in bad (a boolean mask), with the first few offending values."""
+    bad = np.asarray(bad, dtype=bool)
+    count = int(bad.sum())
+    if count == 0:
+        return []
+
+    examples = pd.unique(np.asarray(values, dtype=object)[bad])[:MAX_EXAMPLES]
+    return [{'source': source, 'check': check, 'column': column, 'severity': severity, 'count': count,
+             'examples': ', '.join(str(example) for example in examples)}]
+
+def missing_columns(source, df, columns):
+    missing = [column for column in columns if column not in df.columns]
+    return failing(source, 'required column', ', '.join(missing), np.ones(len(missing), dtype=bool), missing)
+
+def coerce_numeric(values, formatted=False):
+    """
+    Numbers of a column and a mask of the entries that are present but not numbers. formatted
+    columns may pad values and use thousands separators, with "-" for none (as in the cost table).
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        numbers = values.to_numpy(dtype=float)
+        return numbers, np.zeros(len(numbers), dtype=bool)
+
+    text = values.astype(str).str.strip()
+    present = values.notna().to_numpy() & (text != '').to_numpy()
+    if formatted:
+        text = text.str.replace(',', '', regex=False)
+        present &= (text != '-').to_numpy()
+
+    numbers = pd.to_numeric(text.where(present), errors='coerce').to_numpy(dtype=float)
+    return numbers, present & np.isnan(numbers)
+
+def check_survey(df, source='survey'):
+    """Required answers, code domains, weights, non-negative minutes and spend, and income codes by market."""
+    columns = SURVEY_REQUIRED_COLUMNS + list(SURVEY_CODE_DOMAINS) + SURVEY_NON_NEGATIVE_COLUMNS
+    issues = missing_columns(source, df, list(dict.fromkeys(columns + ['Section_B_Q13r5'])))
+
+    for column in SURVEY_REQUIRED_COLUMNS:
+        if column in df.columns:
+            issues += failing(source, 'missing answer', column, df[column].isna(), df.index + 2)
+
+    numeric = {}
+    for column in dict.fromkeys(list(SURVEY_CODE_DOMAINS) + SURVEY_NON_NEGATIVE_COLUMNS + ['WEIGHT']):
+        if column in df.columns:
+            numeric[column], not_numeric = coerce_numeric(df[column])
+            issues += failing(source, 'not numeric', column, not_numeric, df[column])
+
+    for column, domain in SURVEY_CODE_DOMAINS.items():
+        if column in numeric:
+            values = numeric[column]
+            issues += failing(source, 'unknown code', column, ~np.isnan(values) & ~np.isin(values, list(domain)), values)
+
+    if 'WEIGHT' in numeric:
+        weights = numeric['WEIGHT']
+        issues += failing(source, 'weight not positive', 'WEIGHT', ~(np.isfinite(weights) & (weights > 0)), weights)
+
+    for column in SURVEY_NON_NEGATIVE_COLUMNS:
+        if column in numeric:
+            issues += failing(source, 'negative value', column, numeric[column] < 0, numeric[column])
+
+    issues += check_income_codes(df, numeric.get('S1'), source)
+    return issues
+
+def check_income_codes(df, markets, source='survey'):
+    """Income answer of every respondent, read from the income question of its market, against that market's codes."""
+    if markets is None:
+        return []
+
+    income_columns = [f'S5_{code}' for code in COLUMN_MAPPING.values()]
+    missing = [column for column in income_columns if column not in df.columns]
+    if missing:
+        return missing_columns(source, df, income_columns)
+
+    market_codes = np.array(list(COLUMN_MAPPING))
+    position = np.searchsorted(market_codes, markets)
+    known = np.isin(markets, market_codes)
+
+    answers = np.full(len(df), np.nan)
+    columns = np.clip(position[known], 0, len(market_codes) - 1)
+    answers[known] = df[income_columns].apply(pd.to_numeric, errors='coerce').to_numpy()[np.flatnonzero(known), columns]
+
+    # (market, answer) pairs as one number each
+    valid_pairs = [market * 1000 + code for market, codes in INCOME_MAPPINGS.items() for code in list(codes) + [INCOME_REFUSED]]
+    valid = np.isin(markets * 1000 + answers, valid_pairs)
+
+    issues = failing(source, 'missing answer', 'S5 (income of the market)', known & np.isnan(answers), df.index + 2)
+    issues += failing(source, 'unknown code', 'S5 (income of the market)', known & ~np.isnan(answers) & ~valid,
+                      [f"{MARKET_MAPPING[int(market)]}: {answer:g}" if market in MARKET_MAPPING else answer
+                       for market, answer in zip(markets, answers)])
+    return issues
+
+def read_raw_tables(sources=HEALTH_SOURCES):
+    """Every health parameter table as text, with padded headers stripped."""
+    tables = {}
+    for name, path in sources.items():
+        table = pd.read_csv(path, dtype=str)
+        table.columns = table.columns.str.strip()
+        tables[name] = table
+    return tables
+
+def check_health_tables(raw_tables, parameters=HEALTH_PARAMETERS):
+    """Required columns of every parameter table, and numbers that will not parse as each table is read."""
+    issues = []
+    for name, table in raw_tables.items():
+        specs = [spec for spec in parameters.values() if spec['table'] == name]
+        required = list(dict.fromkeys(column for spec in specs for column in spec['match'] + ['gender', 'geography', spec['value']]))
+        issues += missing_columns(name, table, required)
+
+        # The cost table is read as a formatted export; the others are read as plain numbers
+        formatted = name == 'cost_per_case'
+        numeric_columns = {spec['value'] for spec in specs} | {'rate_per'} | (set(COST_NUMERIC_COLUMNS) if formatted else set())
+        for column in sorted(numeric_columns & set(table.columns)):
+            _, not_numeric = coerce_numeric(table[column], formatted)
+            issues += failing(name, 'not numeric', column, not_numeric, table[column])
+
+        if formatted and 'direct' in table.columns:
+            direct = table['direct'].str.strip().str.upper()
+            issues += failing(name, 'unknown code', 'direct', ~direct.isin(['TRUE', 'FALSE']), table['direct'])
+
+    return issues
+
+def required_health_keys(country_map=COUNTRY_MAP, genders=('male', 'female'), age_groups=None):
+    """Every (factor, gender, geography, age_group) the health stage evaluates."""
+    age_groups = age_groups or sorted(set(HEALTH_AGE_STRATA.values()))
+    return pd.DataFrame([(factor, gender, geography, age_group)
+                         for geography in sorted(set(country_map.values())) for gender in genders
+                         for age_group in age_groups for factor in HEALTH_LISTS[age_group]],
+                        columns=RISK_KEY_COLUMNS)
+
+def check_parameter_coverage(tables, keys, parameters=HEALTH_PARAMETERS):
+    """Required parameters found and every resolved value present and within PARAMETER_RANGES."""
+    tables = {name: table.copy() for name, table in tables.items()}
+    for spec in parameters.values():
+        table = tables[spec['table']]
+        table[spec['value']] = pd.to_numeric(table[spec['value']], errors='coerce')
+        if 'rate_per' in table.columns:
+            table['rate_per'] = pd.to_numeric(table['rate_per'], errors='coerce')
+
+    resolution = resolve_health_parameters(tables, keys, parameters, report=False)
+    labels = resolution['factor'].astype(str)
+    for column in RISK_KEY_COLUMNS[1:]:
+        labels = labels + '/' + resolution[column].astype(str)
+
+    issues = []
+    for parameter, spec in parameters.items():
+        rows = (resolution['parameter'] == parameter).to_numpy()
+        found = resolution['source_row'].notna().to_numpy()[rows]
+        values = resolution['value'].to_numpy(dtype=float)[rows]
+        keys_label = labels.to_numpy()[rows]
+        source = f"{spec['table']} ({parameter})"
+
+        if 'default' in spec:
+            issues += failing(source, 'no data (default used)', spec['value'], ~found, keys_label, 'warning')
+            issues += failing(source, 'missing value', spec['value'], found & np.isnan(values), keys_label, 'warning')
+        else:
+            issues += failing(source, 'no data', spec['value'], ~found, keys_label)
+            issues += failing(source, 'missing value', spec['value'], found & np.isnan(values), keys_label)
+
+        lower, upper = PARAMETER_RANGES.get(parameter, (-np.inf, np.inf))
+        issues += failing(source, 'out of range', spec['value'], found & ((values < lower) | (values > upper)),
+                          [f"{key}: {value:g}" for key, value in zip(keys_label, values)])
+
+        # A relative risk of 0 marks a condition that does not apply (e.g. breast cancer for men); its outcomes are blank
+        if parameter in ('relative_risk', 'fairly_relative_risk'):
+            issues += failing(source, 'not applicable (relative risk 0)', spec['value'], found & (values == 0), keys_label, 'warning')
+
+    # Active and fairly active shares cannot exceed the whole population
+    rates = resolution.set_index(RISK_KEY_COLUMNS + ['parameter'])['value'].unstack('parameter')
+    if {'activity_rate', 'fairly_activity_rate'} <= set(rates.columns):
+        total = rates['activity_rate'] + rates['fairly_activity_rate'].fillna(0)
+        issues += failing('activity_levels', 'active shares above 1', 'activity_rate', (total > 1).to_numpy(),
+                          ['/'.join(map(str, key)) for key in rates.index])
+
+    return issues
+
+def check_market_penetration(market_penetration, markets):
+    """Columns and non-negative non-customers of every penetration table, and coverage of the survey markets."""
+    issues = []
+    for mode, table in market_penetration.items():
+        source = f"market_penetration_{mode}"
+        missing = missing_columns(source, table, PENETRATION_COLUMNS[mode])
+        issues += missing
+        if missing:
+            continue
+
+        values, not_numeric = coerce_numeric(table['non-customers'])
+        issues += failing(source, 'not numeric', 'non-customers', not_numeric, table['non-customers'])
+        issues += failing(source, 'negative value', 'non-customers', values < 0, values)
+
+        uncovered = np.array(sorted(set(markets) - set(table['market'].dropna())), dtype=object)
+        issues += failing(source, 'market not covered', 'market', np.ones(len(uncovered), dtype=bool), uncovered)
+
+    return issues
+
+def validate_inputs(survey_df, raw_tables, market_penetration=None, keys=None):
+    """
+    Report of every failing check (REPORT_COLUMNS), errors first.
+
+    survey_df: the survey as loaded (load_survey)
+    raw_tables: health parameter tables as text (read_raw_tables)
+    market_penetration: dict of market penetration tables by segment
+    keys: (factor, gender, geography, age_group) to check coverage for (required_health_keys by default)
+    """
+    issues = check_survey(survey_df)
+    issues += check_health_tables(raw_tables)
+
+    # Coverage is resolved on the tables as the health stage reads them (see load_health_tables)
+    if not any(issue['check'] == 'required column' for issue in issues):
+        tables = {name: table.apply(lambda column: column.str.strip()) for name, table in raw_tables.items()}
+        for table in tables.values():
+            table['age_group'] = table['age_group'].replace(AGE_GROUP_ALIASES)
+
+        costs = tables['cost_per_case']
+        costs['direct'] = costs['direct'].str.upper() == 'TRUE'
+        costs['cost_per_case_adjusted'] = coerce_numeric(costs['cost_per_case_adjusted'], formatted=True)[0]
+
+        issues += check_parameter_coverage(tables, required_health_keys() if keys is None else keys)
+
+    if market_penetration is not None and 'S1' in survey_df.columns:
+        markets = survey_df['S1'].map(MARKET_MAPPING).dropna().unique()
+        issues += check_market_penetration(market_penetration, markets)
+
+    report = pd.DataFrame(issues, columns=REPORT_COLUMNS)
+    return report.sort_values('severity', kind='stable').reset_index(drop=True)
+
+def raise_for_errors(report):
+    """Raise ValueError listing every error of a validation report."""
+    errors = report[report['severity'] == 'error']
+    if errors.empty:
+        return
+
+    lines = [f"- {row.source}: {row.check} in {row.column} ({row.count} rows, e.g. {row.examples})"
+             for row in errors.itertuples(index=False)]
+    raise ValueError(f"{len(errors)} input checks failed:\n" + '\n'.join(lines))
@@ -0,0 +1,195 @@
+
+"""
+Results warehouse: a local SQLite file that keeps the outputs of every pipeline run.
+
+Each run gets a row in `runs` (run_id, time, stages, parameters and a fingerprint of every input
+file) and its outputs are appended to one table per output with a run_id column:
+
+    input_validation, weight_calibration, elasticity_scenarios, business_outcomes, social_change, activity_summary,
+    spending_summary, activity_thresholds, health_outcomes, sroi_results, health_by_disease,
+    sroi_sensitivity, sroi_projection, health_cohort, discount_policy
+
+Tables are indexed on run_id, market, code, scenario_id and factor where they have them.
+read_table and query return DataFrames, e.g. health savings for Spain over the last 20 runs:
+
+    read_table('health_outcomes', code='SPA', last_runs=20)
+"""
+
+
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+from .consolidation import stack_segments
+from .mappings import MARKET_MAPPING
+
+WAREHOUSE_PATH = 'data/outputs/sroi_warehouse.sqlite'
+
+INDEXED_COLUMNS = ['run_id', 'market', 'code', 'scenario_id', 'factor']
+
+MARKET_BY_CODE = {market[:3].upper(): market for market in MARKET_MAPPING.values()}
+
+def connect(path=WAREHOUSE_PATH):
+    connection = sqlite3.connect(path)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started TEXT,
+            stages TEXT,
+            parameters TEXT,
+            fingerprints TEXT
+        )
+    """)
+    return connection
+
+def file_fingerprint(path):
+    """SHA-256 and size of an input file, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2**20), b''):
+            digest.update(chunk)
+
+    return {'sha256': digest.hexdigest(), 'size': os.path.getsize(path)}
+
+def run_tables(stage_results):
+    """Warehouse tables of the outputs returned by pipeline stages, keyed by table name."""
+    tables = {}
+
+    if stage_results.get('validation') is not None and not stage_results['validation'].empty:
+        tables['input_validation'] = stage_results['validation']
+
+    if stage_results.get('calibration') is not None:
+        tables['weight_calibration'] = stage_results['calibration'][1]
+
+    if 'summaries' in stage_results:
+        activity_summaries, spending_summaries, threshold_curves = stage_results['summaries']
+        tables['activity_summary'] = stack_segments(activity_summaries)
+        tables['spending_summary'] = stack_segments(spending_summaries)
+        tables['activity_thresholds'] = stack_segments(threshold_curves)
+
+    if 'elasticity' in stage_results:
+        tables['elasticity_scenarios'] = stack_segments(stage_results['elasticity'])
+
+    if 'business' in stage_results:
+        tables['business_outcomes'] = stack_segments(stage_results['business'])
+
+    if 'social' in stage_results:
+        tables['social_change'] = stack_segments(stage_results['social'])
+
+    if 'health' in stage_results:
+        health = [df.assign(code=code, market=MARKET_BY_CODE.get(code)) for code, df in stage_results['health'].items() if not df.empty]
+        if health:
+            tables['health_outcomes'] = pd.concat(health, ignore_index=True)
+
+    if 'consolidation' in stage_results:
+        tables['sroi_results'], tables['health_by_disease'] = stage_results['consolidation']
+
+    if 'sensitivity' in stage_results:
+        tables['sroi_sensitivity'] = stage_results['sensitivity']
+
+    if 'projection' in stage_results:
+        tables['sroi_projection'] = stage_results['projection']
+
+    if 'cohort' in stage_results:
+        tables['health_cohort'] = stage_results['cohort']
+
+    if 'optimization' in stage_results:
+        tables['discount_policy'] = stage_results['optimization']
+
+    # Scenario tables without a market column get it from the scenario_id prefix
+    for name, table in tables.items():
+        if 'scenario_id' in table.columns and 'code' not in table.columns:
+            table = table.assign(code=table['scenario_id'].str[:3])
+        if 'code' in table.columns and 'market' not in table.columns:
+            table = table.assign(market=table['code'].map(MARKET_BY_CODE))
+        tables[name] = table
+
+    return tables
+
+def table_columns(connection, name):
+    return [row[1] for row in connection.execute(f'PRAGMA table_info("{name}")')]
+
+def append_table(connection, name, df, run_id):
+    """Append df to table name with its run_id, adding any new columns and the standard indexes."""
+    df = df.assign(run_id=run_id)
+    df = df[['run_id'] + [column for column in df.columns if column != 'run_id']]
+
+    existing = table_columns(connection, name)
+    if existing:
+        for column in df.columns:
+            if column not in existing:
+                connection.execute(f'ALTER TABLE "{name}" ADD COLUMN "{column}"')
+
+    df.to_sql(name, connection, if_exists='append', index=False)
+
+    for column in INDEXED_COLUMNS:
+        if column in df.columns:
+            connection.execute(f'CREATE INDEX IF NOT EXISTS "idx_{name}_{column}" ON "{name}" ("{column}")')
+
+def record_run(stage_results, input_paths, parameters=None, path=WAREHOUSE_PATH, started=None):
+    """Store the outputs of one pipeline run; returns its run_id."""
+    fingerprints = {input_path: file_fingerprint(input_path) for input_path in input_paths}
+    started = started or datetime.now()
+
+    connection = connect(path)
+    try:
+        with connection:
+            cursor = connection.execute(
+                "INSERT INTO runs (started, stages, parameters, fingerprints) VALUES (?, ?, ?, ?)",
+                (started.isoformat(timespec='seconds'), json.dumps(list(stage_results)),
+                 json.dumps(parameters or {}, default=str), json.dumps(fingerprints))
+            )
+            run_id = cursor.lastrowid
+
+            for name, table in run_tables(stage_results).items():
+                append_table(connection, name, table, run_id)
+    finally:
+        connection.close()
+
+    return run_id
+
+def query(sql, params=(), path=WAREHOUSE_PATH):
+    """Run any SQL against the warehouse and return the result as a DataFrame."""
+    connection = connect(path)
+    try:
+        return pd.read_sql_query(sql, connection, params=params)
+    finally:
+        connection.close()
+
+def list_runs(path=WAREHOUSE_PATH):
+    runs = query("SELECT * FROM runs ORDER BY run_id", path=path)
+    for column in ['stages', 'parameters', 'fingerprints']:
+        runs[column] = runs[column].map(json.loads)
+    return runs
+
+def read_table(name, path=WAREHOUSE_PATH, run_ids=None, last_runs=None, columns=None, **filters):
+    """
+    Rows of a warehouse table, optionally limited to some runs (run_ids, or the last_runs most
+    recent runs that wrote the table) and filtered on column values, e.g. market='Spain',
+    scenario_id=['SPA40F', 'SPA40M'] or factor='stroke'.
+    """
+    conditions, params = [], []
+
+    if last_runs is not None:
+        conditions.append(f'run_id IN (SELECT DISTINCT run_id FROM "{name}" ORDER BY run_id DESC LIMIT ?)')
+        params.append(int(last_runs))
+
+    if run_ids is not None:
+        filters['run_id'] = run_ids
+
+    for column, value in filters.items():
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        conditions.append(f'"{column}" IN ({", ".join("?" * len(values))})')
+        params.extend(values)
+
+    selected = ', '.join(f'"{column}"' for column in columns) if columns else '*'
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    return query(f'SELECT {selected} FROM "{name}"{where} ORDER BY run_id', params, path)
@@ -0,0 +1,240 @@
+
+"""
+Append-only partial aggregates of survey waves.
+
+The activity summaries, elasticity rates and social means are ratios of weighted sums, so each
+wave is reduced once to its sums at the finest segment grain (CELL_KEYS: market, gender, age
+group, income level and customer status) and stored in data/outputs/wave_aggregates.sqlite:
+
+    respondents, WEIGHT                                     respondent counts and weights
+    weighted_active, weighted_fairly_active                 weighted activity tiers
+    price_barrier_weight, non_price_barrier_weight,         weights of respondents who do and don't
+    weighted_yes_Q14a .. weighted_yes_Q14e                  name price as a barrier, and their weighted
+                                                            (cumulative) yes responses per price tier
+    weighted_S6, weighted_S7                                weighted life satisfaction and community trust
+
+Adding a wave processes only its respondents and appends its cells; stored waves are never
+rewritten. The pooled outputs of any set of waves (all by default) add up their cells and are
+exactly the outputs of the stages on the respondents of those waves together; trend tables
+give the outputs of every wave side by side. Spending medians do not add up across waves and
+stay with the summaries stage.
+
+Usage (from the repository root):
+    python -m impactPy.waves add 2024-09                    the survey of data/survey_data as wave 2024-09
+    python -m impactPy.waves add 2025-03 --survey path.xlsx
+    python -m impactPy.waves report                         pooled and per-wave tables to data/outputs/wave_report.xlsx
+"""
+
+
+import argparse
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .activity import ACTIVITY_SUM_COLUMNS, activity_summary_from_sums, calculate_activity_levels, fairly_active_flags
+from .elasticity import (ELASTICITY_SUM_COLUMNS, MODE_CONFIGS, calculate_age_group_proportions, calculate_gender_proportions,
+                         elasticity_from_sums)
+from .mappings import SCENARIOS
+from .social import SOCIAL_SUM_COLUMNS, market_social_outcomes_from_sums, social_outcomes_from_sums
+from .survey import SURVEY_PATH, SURVEY_SHEET, load_survey, process_data
+
+WAVES_PATH = 'data/outputs/wave_aggregates.sqlite'
+WAVE_REPORT_PATH = 'data/outputs/wave_report.xlsx'
+
+CELL_KEYS = ['market', 'gender', 'age_group', 'income_level', 'dSEGMENT']
+
+SUM_COLUMNS = list(dict.fromkeys(ELASTICITY_SUM_COLUMNS + ACTIVITY_SUM_COLUMNS + SOCIAL_SUM_COLUMNS))
+
+SEGMENTS = ['gender', 'age_group', 'income_level']
+
+# Segments of the social outcomes (Male and Female respondents), as the social stage
+SOCIAL_SEGMENTS = ['gender', 'age_group']
+SOCIAL_GENDERS = ['Male', 'Female']
+
+def wave_cells(survey_df):
+    """Sums (SUM_COLUMNS) of every cell (CELL_KEYS) of the respondents of one wave, from the survey as loaded."""
+    activity_df = calculate_activity_levels(survey_df)
+    df = process_data(survey_df)
+    weights = df['WEIGHT'].to_numpy(dtype=float)
+
+    # Respondents naming price as a barrier, and their cumulative yes responses, as in calculate_elasticity
+    price_barrier = df['Section_B_Q13r5'].notna().to_numpy()
+    yes = np.logical_or.accumulate((df[SCENARIOS] == 1).to_numpy(), axis=1)
+
+    data = df[CELL_KEYS].assign(
+        respondents=1,
+        WEIGHT=weights,
+        price_barrier_weight=np.where(price_barrier, weights, 0.0),
+        non_price_barrier_weight=np.where(price_barrier, 0.0, weights),
+        **{f'weighted_yes_{scenario}': yes[:, position] * np.where(price_barrier, weights, 0.0)
+           for position, scenario in enumerate(SCENARIOS)},
+        weighted_active=activity_df['active_flag'].to_numpy() * weights,
+        weighted_fairly_active=fairly_active_flags(activity_df).to_numpy() * weights,
+        weighted_S6=df['S6'].to_numpy(dtype=float) * weights,
+        weighted_S7=df['S7'].to_numpy(dtype=float) * weights
+    )
+
+    # Respondents with a missing segment are kept in their own cells, for the outputs that do not use it
+    return data.groupby(CELL_KEYS, dropna=False)[SUM_COLUMNS].sum().reset_index()
+
+def connect(path=WAVES_PATH):
+    connection = sqlite3.connect(path)
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS waves (
+            wave TEXT PRIMARY KEY,
+            added TEXT,
+            source TEXT,
+            respondents INTEGER
+        )
+    """)
+    return connection
+
+class WaveAggregates:
+    """
+    Per-wave cell sums (wave, CELL_KEYS, SUM_COLUMNS) and the outputs of any set of waves.
+
+    waves: one row per wave (wave, added, source, respondents), in the order they were added
+    """
+
+    def __init__(self, cells=None, waves=None):
+        self.cells = cells if cells is not None else pd.DataFrame(columns=['wave'] + CELL_KEYS + SUM_COLUMNS)
+        self.waves = waves if waves is not None else pd.DataFrame(columns=['wave', 'added', 'source', 'respondents'])
+
+    @classmethod
+    def load(cls, path=WAVES_PATH):
+        connection = connect(path)
+        try:
+            waves = pd.read_sql_query("SELECT * FROM waves ORDER BY rowid", connection)
+            if waves.empty:
+                return cls(waves=waves)
+            cells = pd.read_sql_query("SELECT * FROM cells", connection)
+        finally:
+            connection.close()
+        return cls(cells, waves)
+
+    def add_wave(self, wave, survey_df, source=None, path=None):
+        """
+        Reduce the respondents of a new wave to cells and append them (to the store at path too,
+        when given). Stored waves are never replaced: adding a wave twice raises ValueError.
+        """
+        wave = str(wave)
+        if wave in set(self.waves['wave']):
+            raise ValueError(f"Wave '{wave}' is already stored; waves are append-only")
+
+        cells = wave_cells(survey_df).assign(wave=wave)[['wave'] + CELL_KEYS + SUM_COLUMNS]
+        row = pd.DataFrame([{'wave': wave, 'added': datetime.now().isoformat(timespec='seconds'),
+                             'source': source, 'respondents': len(survey_df)}])
+
+        if path is not None:
+            connection = connect(path)
+            try:
+                with connection:
+                    # The primary key refuses a wave stored since this instance was loaded
+                    row.to_sql('waves', connection, if_exists='append', index=False)
+                    cells.to_sql('cells', connection, if_exists='append', index=False)
+                    connection.execute('CREATE INDEX IF NOT EXISTS "idx_cells_wave" ON "cells" ("wave")')
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Wave '{wave}' is already stored in {path}; waves are append-only")
+            finally:
+                connection.close()
+
+        self.cells = pd.concat([df for df in (self.cells, cells) if not df.empty], ignore_index=True)
+        self.waves = pd.concat([df for df in (self.waves, row) if not df.empty], ignore_index=True)
+        return cells
+
+    def select(self, waves=None):
+        """Cells of the given waves (all by default)."""
+        if waves is None:
+            return self.cells
+        waves = [str(wave) for wave in waves]
+        unknown = set(waves) - set(self.waves['wave'])
+        if unknown:
+            raise ValueError(f"Unknown waves {sorted(unknown)}, stored waves are {list(self.waves['wave'])}")
+        return self.cells[self.cells['wave'].isin(waves)]
+
+    def activity_summary(self, segment, waves=None):
+        """create_activity_summary of the pooled waves by market and segment."""
+        keys = ['market', segment, 'dSEGMENT']
+        return activity_summary_from_sums(self.select(waves).groupby(keys)[ACTIVITY_SUM_COLUMNS].sum())
+
+    def survey_rates(self, waves=None, modes=MODE_CONFIGS):
+        """calculate_survey_rates of the pooled waves: elasticity rates and age group proportions of non-customers."""
+        non_customers = self.select(waves)
+        non_customers = non_customers[non_customers['dSEGMENT'] == 2]
+
+        rates = {
+            'age_proportions': calculate_age_group_proportions(non_customers),
+            'gender_age_proportions': calculate_gender_proportions(non_customers, 'age_group')
+        }
+        for mode, config in modes.items():
+            sums = non_customers.groupby(config['group_cols'])[ELASTICITY_SUM_COLUMNS].sum()
+            rates[mode] = elasticity_from_sums(sums, config['filter_col'], config['valid_values'])
+        return rates
+
+    def social_outcomes(self, segment, waves=None):
+        """calculate_social_outcomes (Male and Female respondents) of the pooled waves by market and segment."""
+        cells = self.select(waves)
+        cells = cells[cells['gender'].isin(SOCIAL_GENDERS)]
+        return social_outcomes_from_sums(cells.groupby(['market', segment, 'dSEGMENT'])[SOCIAL_SUM_COLUMNS].sum())
+
+    def market_social_outcomes(self, waves=None):
+        """calculate_market_social_outcomes of the pooled waves."""
+        return market_social_outcomes_from_sums(self.select(waves).groupby(['market', 'dSEGMENT'])[SOCIAL_SUM_COLUMNS].sum())
+
+    def tables(self, waves=None):
+        """Every output of the pooled waves, keyed by table name."""
+        rates = self.survey_rates(waves)
+        tables = {f'activity_{segment}': self.activity_summary(segment, waves) for segment in SEGMENTS}
+        tables.update({f'elasticity_{mode}': rates[mode] for mode in MODE_CONFIGS})
+        tables['age_proportions'] = rates['age_proportions']
+        tables.update({f'social_{segment}': self.social_outcomes(segment, waves) for segment in SOCIAL_SEGMENTS})
+        tables['social_market'] = self.market_social_outcomes(waves)
+        return tables
+
+    def report(self):
+        """
+        Every output (see tables) of the pooled waves and of each wave, stacked with a 'wave'
+        column ('pooled' for all waves together) for trend reporting.
+        """
+        results = {'pooled': self.tables()}
+        for wave in self.waves['wave']:
+            results[wave] = self.tables([wave])
+
+        report = {}
+        for name, pooled in results['pooled'].items():
+            stacked = pd.concat([tables[name].assign(wave=wave) for wave, tables in results.items()], ignore_index=True)
+            report[name] = stacked[['wave'] + list(pooled.columns)]
+        return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Store survey waves as partial aggregates and report pooled and per-wave outputs.')
+    parser.add_argument('--store', default=WAVES_PATH, help='SQLite file of the wave aggregates')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='reduce the respondents of a new wave and append them to the store')
+    add.add_argument('wave', help='wave label, e.g. 2024-09')
+    add.add_argument('--survey', default=SURVEY_PATH)
+    add.add_argument('--sheet', default=SURVEY_SHEET)
+
+    report = commands.add_parser('report', help='pooled and per-wave outputs of every stored wave')
+    report.add_argument('--output', default=WAVE_REPORT_PATH)
+    args = parser.parse_args(argv)
+
+    aggregates = WaveAggregates.load(args.store)
+
+    if args.command == 'add':
+        cells = aggregates.add_wave(args.wave, load_survey(args.survey, args.sheet), args.survey, args.store)
+        print(f"Wave {args.wave}: {int(cells['respondents'].sum())} respondents in {len(cells)} cells added to {args.store} "
+              f"({len(aggregates.waves)} waves stored)")
+    else:
+        if aggregates.waves.empty:
+            raise ValueError(f"No waves stored in {args.store}; add one with python -m impactPy.waves add <wave>")
+        with pd.ExcelWriter(args.output) as writer:
+            for name, table in aggregates.report().items():
+                table.to_excel(writer, sheet_name=name, index=False)
+        print(f"Pooled and per-wave outputs of {len(aggregates.waves)} waves saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
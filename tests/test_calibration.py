@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from impactPy.calibration import WeightCalibration
+from impactPy.equivalence import synthetic_survey
+
+
+def margins(df):
+    """Population shares for every category of two markets, unlike the sample's."""
+    rows = []
+    for market in df['market'].dropna().unique()[:2]:
+        rows += [(market, 'gender', 'Female', 0.42), (market, 'gender', 'Male', 0.38), (market, 'gender', 'Others', 0.2)]
+        rows += [(market, 'age_group', 'Young Adults (16-35)', 0.35), (market, 'age_group', 'Old Adults (>35)', 0.65)]
+        rows += [(market, 'income_level', 'Low', 0.3), (market, 'income_level', 'Middle', 0.5),
+                 (market, 'income_level', 'High', 0.2)]
+    return pd.DataFrame(rows, columns=['market', 'variable', 'category', 'target'])
+
+
+@pytest.mark.parametrize('method', ['raking', 'linear'])
+def test_calibration_hits_margins(method):
+    df = synthetic_survey(3000)
+    calibration = WeightCalibration(df, margins(df))
+    weights = calibration.calibrate(method, bounds=None)
+
+    report = calibration.margin_report(weights)
+    assert calibration.summary['converged']
+    np.testing.assert_allclose(report['calibrated_total'], report['target'], rtol=1e-5)
+
+
+@pytest.mark.parametrize('method', ['raking', 'linear'])
+def test_calibration_keeps_market_totals(method):
+    df = synthetic_survey(3000)
+    weights = WeightCalibration(df, margins(df)).calibrate(method)
+
+    before = df.groupby('market')['WEIGHT'].sum()
+    after = pd.Series(weights, index=df.index).groupby(df['market']).sum()
+    np.testing.assert_allclose(after.to_numpy(), before.to_numpy(), rtol=1e-5)
+
+
+def test_markets_without_margins_keep_their_weights():
+    df = synthetic_survey(3000)
+    table = margins(df)
+    weights = WeightCalibration(df, table).calibrate('raking')
+
+    untouched = ~df['market'].isin(table['market']).to_numpy()
+    np.testing.assert_array_equal(weights[untouched], df['WEIGHT'].to_numpy()[untouched])
+
+
+def test_unknown_method_raises():
+    df = synthetic_survey(500)
+    with pytest.raises(ValueError):
+        WeightCalibration(df, margins(df)).calibrate('unknown')
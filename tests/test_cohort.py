@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from impactPy.benchmark import synthetic_risk_table, synthetic_scenarios
+from impactPy.cohort import COHORT_SETTINGS, check_transitions, simulate_cohorts, summarise_cohorts
+from impactPy.health_functions import evaluate_health_outcomes
+
+GEOGRAPHIES = ['Spain', 'Japan']
+
+
+def year_one(scenarios_df, risk_table, column):
+    rows, outcomes, _ = simulate_cohorts(scenarios_df, risk_table, dict(COHORT_SETTINGS, horizon=5, lag=0))
+    return rows.assign(value=outcomes[column][:, 0]).sort_values(['scenario_id', 'factor'])['value'].to_numpy()
+
+
+def test_year_one_cases_match_single_year_outcomes():
+    scenarios_df, risk_table = synthetic_scenarios(50, GEOGRAPHIES), synthetic_risk_table(GEOGRAPHIES)
+    expected = evaluate_health_outcomes(scenarios_df, risk_table).sort_values(['scenario_id', 'factor'])
+
+    np.testing.assert_allclose(year_one(scenarios_df, risk_table, 'cases_saved'),
+                               expected['active_cases_saved'] + expected['fairly_active_cases_saved'], rtol=1e-9)
+    np.testing.assert_allclose(year_one(scenarios_df, risk_table, 'total_saving'), expected['total_saving'], rtol=1e-9)
+
+
+def test_year_one_deaths_match_without_fairly_active_change():
+    scenarios_df = synthetic_scenarios(50, GEOGRAPHIES).assign(newly_fairly_active_customers=0.0)
+    risk_table = synthetic_risk_table(GEOGRAPHIES)
+    expected = evaluate_health_outcomes(scenarios_df, risk_table).sort_values(['scenario_id', 'factor'])
+
+    np.testing.assert_allclose(year_one(scenarios_df, risk_table, 'deaths_saved'), expected['active_deaths_saved'], rtol=1e-9)
+    np.testing.assert_allclose(year_one(scenarios_df, risk_table, 'dalys_saved'), expected['active_dalys_saved'], rtol=1e-9)
+
+
+def test_no_change_saves_nothing():
+    scenarios_df = synthetic_scenarios(10, GEOGRAPHIES).assign(newly_active_customers=0.0, newly_fairly_active_customers=0.0)
+    rows, outcomes, _ = simulate_cohorts(scenarios_df, synthetic_risk_table(GEOGRAPHIES))
+
+    summary = summarise_cohorts(rows, outcomes)
+    assert (summary[['cases_saved', 'deaths_saved', 'dalys_saved', 'total_saving', 'pv_total_saving']] == 0).all().all()
+
+
+def test_invalid_transitions_raise():
+    with pytest.raises(ValueError):
+        check_transitions(np.eye(2))
+    with pytest.raises(ValueError):
+        check_transitions([[0.5, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]])
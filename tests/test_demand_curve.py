@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from impactPy.demand_curve import DemandCurve
+from impactPy.elasticity import calculate_survey_rates, process_market_data
+from impactPy.equivalence import synthetic_survey
+
+SURVEY_DISCOUNTS = [10.0, 20.0, 40.0, 60.0, 80.0]
+
+
+@pytest.fixture(scope='module')
+def rates():
+    return calculate_survey_rates(synthetic_survey(3000))['gender']
+
+
+def fitted(rates):
+    """The curve, with the market and gender of every curve that has survey shares."""
+    curve = DemandCurve.fit(rates, 'gender')
+    observed = ~np.isnan(curve.shares).any(axis=1)
+    keys = curve.keys[observed]
+    return curve, keys['market'].to_numpy()[:, None], keys['gender'].to_numpy()[:, None]
+
+
+def market_data(rates):
+    keys = rates[['market', 'gender']].drop_duplicates().reset_index(drop=True)
+    return {'gender': {
+        'penetration': keys.assign(**{'non-customers': 1000.0 + 10 * np.arange(len(keys))}),
+        'activity': keys.assign(change=0.3, **{'fairly change': 0.1})
+    }}
+
+
+def test_curves_pass_through_the_survey_points(rates):
+    curve, markets, genders = fitted(rates)
+    survey = rates.assign(discount=rates['price'].str.rstrip('%').astype(float)).set_index(['market', 'gender', 'discount'])
+
+    expected = np.array([[survey.loc[(market, gender, discount), '% yes'] for discount in SURVEY_DISCOUNTS]
+                         for market, gender in zip(markets[:, 0], genders[:, 0])])
+    np.testing.assert_allclose(curve.share_yes(markets, genders, SURVEY_DISCOUNTS), expected, rtol=1e-12)
+
+
+def test_curves_are_monotone(rates):
+    curve, markets, genders = fitted(rates)
+    shares = curve.share_yes(markets, genders, np.linspace(0, 100, 401))
+
+    assert (np.diff(shares, axis=1) >= 0).all()
+    np.testing.assert_array_equal(shares[:, 0], 0.0)
+
+
+def test_discount_for_share_inverts_share_yes(rates):
+    curve, markets, genders = fitted(rates)
+    top = curve.share_yes(markets, genders, 100.0)
+    targets = top * np.linspace(0.05, 1, 20)
+
+    discounts = curve.discount_for_share(markets, genders, targets)
+    assert not np.isnan(discounts).any()
+    np.testing.assert_allclose(curve.share_yes(markets, genders, discounts), targets, rtol=1e-9)
+
+    # Below each found discount the target is not yet reached
+    assert (curve.share_yes(markets, genders, np.maximum(discounts - 1e-6, 0)) < targets).all()
+    assert np.isnan(curve.discount_for_share(markets, genders, top + 0.01)).all()
+
+
+def test_survey_discount_grid_reproduces_the_tier_scenarios(rates):
+    data = market_data(rates)
+    tiers = process_market_data(rates, 'gender', data).sort_values('scenario_id').reset_index(drop=True)
+    grid = process_market_data(rates, 'gender', data, discounts=SURVEY_DISCOUNTS)
+    grid = grid.sort_values('scenario_id').reset_index(drop=True)
+
+    observed = tiers['% yes'].notna()
+    pd.testing.assert_frame_equal(grid[observed.to_numpy()].reset_index(drop=True),
+                                  tiers[observed].reset_index(drop=True), check_exact=False, rtol=1e-12)
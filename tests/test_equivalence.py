@@ -0,0 +1,13 @@
+from impactPy.equivalence import error_mismatch, run_equivalence
+
+
+def test_synthetic_cases_match_the_reference():
+    report = run_equivalence(['weighted_median', 'spending_summary', 'elasticity', 'adjusted_risk_rates'], repeats=0)
+    assert report['passed'].all(), report.loc[~report['passed'], 'detail'].tolist()
+
+
+def test_errors_pass_only_when_expected():
+    assert error_mismatch(ValueError('no data'), ValueError('no data'), ValueError) is None
+    assert error_mismatch(ValueError('no data'), ValueError('no data')) is not None
+    assert error_mismatch(ValueError('no data'), 1.0, ValueError) is not None
+    assert error_mismatch(1.0, 1.0, ValueError) is not None
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from impactPy.forecast_backtest import damped_forecasts, trend_forecasts
+from impactPy.healthcare_expenditure_predictor import YEARS_RANGE, predict_next_years
+
+
+def history(n_countries=4, seed=0):
+    """Growing yearly expenditure of every country over YEARS_RANGE, with noise."""
+    rng = np.random.default_rng(seed)
+    return 1000 + np.cumsum(rng.uniform(-20, 80, (n_countries, len(YEARS_RANGE))), axis=1)
+
+
+def test_weighted_trend_matches_the_predictor():
+    pytest.importorskip('sklearn')
+    values = history()
+
+    forecasts = trend_forecasts(values, [len(YEARS_RANGE)], 3, weight_recent_years=3, num_recent_years=6)[0]
+    for country, row in enumerate(values):
+        expected = predict_next_years(pd.Series(row, index=YEARS_RANGE), YEARS_RANGE, n_years=3, mode='weighted',
+                                      weight_recent_years=3, num_recent_years=6)
+        np.testing.assert_allclose(forecasts[country], expected, rtol=1e-10)
+
+
+def test_damped_smoothing_starts_at_the_first_observed_year():
+    values = history()
+    values[1, :2] = np.nan
+    origins = np.arange(6, len(YEARS_RANGE) + 1)
+
+    forecasts = damped_forecasts(values, origins, 3, alpha=0.4, beta=0.2, phi=0.9)
+    late_start = damped_forecasts(values[1:2, 2:], origins - 2, 3, alpha=0.4, beta=0.2, phi=0.9)
+
+    assert not np.isnan(forecasts).any()
+    np.testing.assert_allclose(forecasts[:, 1:2], late_start, rtol=1e-12)
+    np.testing.assert_array_equal(forecasts[:, [0, 2, 3]],
+                                  damped_forecasts(values[[0, 2, 3]], origins, 3, alpha=0.4, beta=0.2, phi=0.9))
+
+
+def test_damped_forecasts_before_the_first_observation_are_missing():
+    values = history(2)
+    values[0, :8] = np.nan
+
+    forecasts = damped_forecasts(values, [6, 9], 3, alpha=0.4, beta=0.2, phi=0.9)
+    assert np.isnan(forecasts[0, 0]).all()
+    assert not np.isnan(forecasts[1]).any()
+    assert not np.isnan(forecasts[:, 1]).any()
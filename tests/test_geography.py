@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from impactPy.geography import geography_key, geography_lineage, population_shares
+
+
+def test_geography_lineage_walks_up_to_the_country():
+    lineage = geography_lineage(['West \nMidlands', 'Spain'], {'West Midlands': 'England', 'England': 'global'})
+
+    assert geography_key('West \nMidlands') == 'west midlands'
+    assert lineage.values.tolist() == [['West \nMidlands', 'west midlands', 0], ['West \nMidlands', 'england', 1],
+                                       ['Spain', 'spain', 0]]
+
+
+def test_population_shares_of_ancestors():
+    lineage = geography_lineage(['London'], {'London': 'England'})
+    shares = population_shares(lineage, pd.Series({'london': 9e6, 'england': 5.6e7}))
+    np.testing.assert_allclose(shares, [1.0, 9e6 / 5.6e7])
+
+    with pytest.raises(ValueError):
+        population_shares(lineage, pd.Series({'london': 9e6}))
@@ -0,0 +1,35 @@
+import os
+
+import pandas as pd
+import pytest
+
+from impactPy.benchmark import synthetic_risk_table, synthetic_scenarios
+from impactPy.health_functions import (HEALTH_OUTCOME_COLUMNS, HEALTH_SOURCES, evaluate_health_outcomes,
+                                       find_health_outcomes, get_risk_table)
+from impactPy.precision import PRECISION_SETTINGS
+
+health_data = pytest.mark.skipif(not all(os.path.exists(path) for path in HEALTH_SOURCES.values()),
+                                 reason='health parameter tables not available')
+
+
+def test_youth_outcomes_refuse_fairly_active_changes():
+    with pytest.raises(ValueError):
+        find_health_outcomes(1000.0, 500.0, youth=True, geography='england')
+
+
+@health_data
+@pytest.mark.parametrize('precision', ['float64', 'float32'])
+def test_scalar_outcomes_equal_the_batch_evaluation(precision):
+    outcomes = find_health_outcomes(98000.0, -25000.0, gender='male', geography='Japan', precision=precision)
+
+    risk_table = get_risk_table(['male'], ['Japan'], report=False)
+    scenario_df = pd.DataFrame({'gender': ['male'], 'geography': ['Japan'], 'health_age_group': ['adult'],
+                                'newly_active_customers': [98000.0], 'newly_fairly_active_customers': [-25000.0]})
+    expected = evaluate_health_outcomes(scenario_df, risk_table, precision)[HEALTH_OUTCOME_COLUMNS]
+    pd.testing.assert_frame_equal(outcomes, expected.reset_index(drop=True), check_exact=True)
+
+
+def test_precision_policy_is_read_at_call_time(monkeypatch):
+    scenarios_df, risk_table = synthetic_scenarios(5, ['Spain']), synthetic_risk_table(['Spain'])
+    monkeypatch.setitem(PRECISION_SETTINGS, 'precision', 'float32')
+    assert evaluate_health_outcomes(scenarios_df, risk_table)['total_saving'].dtype == 'float32'
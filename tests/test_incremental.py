@@ -0,0 +1,47 @@
+import os
+
+import pandas as pd
+
+from impactPy.incremental import changed_scenario_ids, is_current, load_or_calculate_rates, save_parameters
+
+
+def test_change_in_any_row_of_a_scenario_is_detected():
+    # Health outcomes: one row per scenario, gender and disease
+    previous = pd.DataFrame({'scenario_id': ['SPA10Y'] * 4 + ['SPA10O'],
+                             'gender': ['female', 'female', 'male', 'male', 'female'],
+                             'newly_active_customers': [1.0, 1.0, 2.0, 2.0, 5.0]})
+    current = pd.DataFrame({'scenario_id': ['SPA10Y', 'SPA10Y', 'SPA10O', 'SPA20Y'],
+                            'gender': ['female', 'male', 'female', 'female'],
+                            'newly_active_customers': [1.0, 3.0, 5.0, 1.0]})
+
+    assert changed_scenario_ids(previous, current, ['newly_active_customers']) == {'SPA10Y', 'SPA20Y'}
+    assert changed_scenario_ids(previous, current.iloc[1:], ['newly_active_customers']) == {'SPA10Y', 'SPA20Y'}
+    assert changed_scenario_ids(previous, previous, ['newly_active_customers']) == set()
+
+
+def test_outputs_of_other_parameters_are_stale(tmp_path):
+    source, output = tmp_path / 'source.csv', tmp_path / 'output.xlsx'
+    source.write_text('x\n1\n')
+    output.write_text('')
+    os.utime(source, (0, 0))
+
+    assert is_current(output, [source])
+    assert not is_current(output, [source], {'precision': 'float64'})
+    save_parameters(output, {'precision': 'float64'})
+    assert is_current(output, [source], {'precision': 'float64'})
+    assert not is_current(output, [source], {'precision': 'float32'})
+
+
+def test_rates_are_recalculated_for_other_parameters(tmp_path):
+    source, rates_path = tmp_path / 'survey.csv', tmp_path / 'rates.xlsx'
+    source.write_text('x\n1\n')
+    os.utime(source, (0, 0))
+    calls = []
+
+    def calculate():
+        calls.append(1)
+        return {'gender': pd.DataFrame({'% yes': [0.5]})}
+
+    for precision in ['float64', 'float64', 'float32']:
+        load_or_calculate_rates(rates_path, [source], calculate, ['gender'], {'precision': precision})
+    assert len(calls) == 2
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from impactPy.activity import weighted_median
+from impactPy.kernels import group_sums, group_weighted_quantiles
+
+
+def grouped_values(n=2000, n_groups=40, seed=0):
+    """Whole-number values, so groups have ties, with some rows left out (negative codes) and an empty group."""
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(-1, n_groups - 1, n)
+    values = rng.choice([0, 10, 25, 40, 50, 75, 100], n).astype(float)
+    weights = rng.choice([0.5, 1.0, 1.5, 2.0], n)
+    return codes, values, weights, n_groups
+
+
+def test_group_weighted_quantiles_match_weighted_median():
+    codes, values, weights, n_groups = grouped_values()
+    medians = group_weighted_quantiles(codes, values, weights, n_groups, backend='numpy')[0]
+
+    for group in range(n_groups - 1):
+        rows = codes == group
+        assert medians[group] == weighted_median(values[rows], weights[rows])
+    assert np.isnan(medians[n_groups - 1])
+
+
+def test_group_weighted_quantiles_exact_midpoint():
+    quantiles = group_weighted_quantiles([0, 0, 0, 0], [4.0, 1.0, 3.0, 2.0], [1.0, 1.0, 1.0, 1.0], 1, backend='numpy')
+    assert quantiles[0, 0] == 2.5
+
+
+def test_numba_backend_matches_numpy():
+    pytest.importorskip('numba')
+    codes, values, weights, n_groups = grouped_values()
+    quantiles = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+    np.testing.assert_array_equal(
+        group_weighted_quantiles(codes, values, weights, n_groups, quantiles, backend='numba'),
+        group_weighted_quantiles(codes, values, weights, n_groups, quantiles, backend='numpy')
+    )
+    np.testing.assert_allclose(group_sums(codes, values * weights, n_groups, backend='numba'),
+                               group_sums(codes, values * weights, n_groups, backend='numpy'), rtol=1e-12)
+
+
+def test_group_sums_leave_out_negative_codes():
+    sums = group_sums([0, 1, -1, 1], np.array([[1.0, 2.0, 4.0, 8.0], [1.0, 1.0, 1.0, 1.0]]), 3, backend='numpy')
+    np.testing.assert_array_equal(sums, [[1.0, 10.0, 0.0], [1.0, 2.0, 0.0]])
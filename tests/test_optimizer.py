@@ -0,0 +1,82 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from impactPy import pipeline
+from impactPy.optimizer import build_options, optimize_discounts
+
+
+def grid_options(n_markets=5, discounts=(0, 10, 20, 40), seed=0):
+    """Options of build_options for a small grid: value, cost and new customers growing with the discount."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for market in range(n_markets):
+        value = cost = customers = 0.0
+        for discount in discounts:
+            if discount:
+                value += rng.uniform(1e5, 1e6)
+                cost += rng.uniform(1e5, 1e6)
+                customers += rng.uniform(1e3, 1e4)
+            rows.append((f'market {market}', f'{discount}%', float(discount), customers, customers / 3,
+                         value, 0.0, value, cost))
+    return pd.DataFrame(rows, columns=['market', 'price', 'discount', 'new_customers', 'newly_active_customers',
+                                       'health_value', 'social_value', 'policy_value', 'discount_cost'])
+
+
+def brute_force(options, budget, min_new_customers):
+    best = None
+    groups = [group for _, group in options.groupby('market', sort=True)]
+    for rows in itertools.product(*(group.itertuples(index=False) for group in groups)):
+        cost = sum(row.discount_cost for row in rows)
+        customers = sum(row.new_customers for row in rows)
+        if cost <= budget and customers >= min_new_customers:
+            value = sum(row.policy_value for row in rows)
+            best = value if best is None else max(best, value)
+    return best
+
+
+@pytest.mark.parametrize('budget, min_new_customers', [(1.5e6, 0.0), (3e6, 2e4), (1e12, 0.0)])
+def test_exhaustive_and_beam_searches_agree(budget, min_new_customers):
+    options = grid_options()
+
+    exhaustive_policy, exhaustive = optimize_discounts(options, budget=budget, min_new_customers=min_new_customers)
+    beam_policy, beam = optimize_discounts(options, budget=budget, min_new_customers=min_new_customers,
+                                           max_evaluations=0)
+
+    assert (exhaustive['method'], beam['method']) == ('exhaustive', 'beam')
+    assert exhaustive['total_value'] == pytest.approx(brute_force(options, budget, min_new_customers))
+    assert beam['total_value'] == pytest.approx(exhaustive['total_value'])
+    assert exhaustive['total_discount_cost'] <= budget
+    assert list(exhaustive_policy['market']) == sorted(options['market'].unique())
+
+
+def test_infeasible_constraints_raise():
+    with pytest.raises(ValueError):
+        optimize_discounts(grid_options(), budget=0.0, min_new_customers=1.0)
+
+
+def test_options_value_social_change_and_discount_new_customers_spend():
+    results = pd.DataFrame({
+        'segment': 'gender', 'market': 'Japan', 'value': ['Female', 'Male'], 'price': '20%',
+        'new_customers': [100.0, 50.0], 'newly_active_customers': [30.0, 10.0], 'social_change': [0.5, 0.2],
+        'total_saving': [2000.0, 1000.0], 'economic_outcome_avg_local': [20000.0, 10000.0],
+        'economic_outcome_avg_$': [200.0, 100.0]
+    })
+    options = build_options(results, social_value=10.0)
+    option = options[options['price'] == '20%'].iloc[0]
+
+    assert option['health_value'] == pytest.approx(30.0)
+    assert option['social_value'] == pytest.approx(100 * 0.5 * 10 + 50 * 0.2 * 10)
+    assert option['policy_value'] == pytest.approx(30.0 + 600.0)
+    assert option['discount_cost'] == pytest.approx(300.0 * 0.2)
+    assert build_options(results)['social_value'].sum() == 0.0
+
+
+def test_social_value_is_passed_from_the_command_line(monkeypatch):
+    seen = {}
+    monkeypatch.setattr(pipeline, 'run_pipeline', lambda stages, paths, profiler=None, options=None: seen.update(options))
+    pipeline.main(['--stages', 'optimization', '--social-value', '25', '--no-warehouse'])
+
+    assert seen['optimization']['settings']['social_value'] == 25.0
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from impactPy.sensitivity import HEALTH_INPUTS, SCENARIO_INPUTS, scenario_sensitivities
+
+FACTORS = ['stroke', 'depression']
+
+
+def synthetic_inputs(seed=0):
+    """Gender scenarios of two markets, their spending and adult health parameters of two factors."""
+    rng = np.random.default_rng(seed)
+    scenarios = pd.DataFrame([(f'{code}40{gender[0]}', market, '40%', gender)
+                              for code, market in [('SPA', 'Spain'), ('JAP', 'Japan')] for gender in ['Female', 'Male']],
+                             columns=['scenario_id', 'market', 'price', 'gender'])
+    scenarios['non-customers'] = rng.uniform(1e5, 1e6, len(scenarios))
+    scenarios['% yes'] = rng.uniform(0.2, 0.6, len(scenarios))
+    scenarios['% price_barrier'] = rng.uniform(0.3, 0.7, len(scenarios))
+    scenarios['change'] = rng.uniform(0.05, 0.2, len(scenarios))
+    scenarios['fairly change'] = rng.uniform(0.01, 0.1, len(scenarios))
+
+    spending = scenarios[['market', 'gender']].assign(**{'avg_spent_$': rng.uniform(200, 600, len(scenarios))})
+
+    parameters = pd.DataFrame([(factor, gender, geography, 'adult') for factor in FACTORS
+                               for gender in ['female', 'male'] for geography in ['Spain', 'Japan']],
+                              columns=['factor', 'gender', 'geography', 'age_group'])
+    n = len(parameters)
+    parameters = parameters.assign(
+        population_risk=rng.uniform(0.001, 0.02, n), activity_rate=rng.uniform(0.3, 0.5, n),
+        fairly_activity_rate=rng.uniform(0.1, 0.2, n), relative_risk=rng.uniform(1.2, 1.6, n),
+        fairly_relative_risk=rng.uniform(1.05, 1.2, n), direct_cost_per_case=rng.uniform(500, 5000, n),
+        indirect_cost_per_case=rng.uniform(500, 5000, n)
+    )
+    return scenarios, spending, parameters
+
+
+def output_values(scenarios, spending, parameters):
+    """Outputs of every scenario, indexed by (scenario_id, output)."""
+    table = scenario_sensitivities(scenarios, spending, parameters)
+    return table.groupby(['scenario_id', 'output'])['output_value'].first()
+
+
+def central_difference(evaluate, frame, column, rows=slice(None), step=1e-6):
+    """Central finite difference of every output with respect to a column of frame, perturbed in rows."""
+    h = step * frame[column].abs().max()
+    low, high = frame.copy(), frame.copy()
+    low.loc[rows, column] -= h
+    high.loc[rows, column] += h
+    return (evaluate(high) - evaluate(low)) / (2 * h)
+
+
+def test_scenario_input_derivatives_match_finite_differences():
+    scenarios, spending, parameters = synthetic_inputs()
+    table = scenario_sensitivities(scenarios, spending, parameters)
+    evaluate = lambda frame: output_values(frame, spending, parameters)
+
+    for name in SCENARIO_INPUTS:
+        expected = central_difference(evaluate, scenarios, name)
+        derivatives = table[table['input'] == name].set_index(['scenario_id', 'output'])['derivative']
+        np.testing.assert_allclose(derivatives.to_numpy(), expected.reindex(derivatives.index).to_numpy(),
+                                   rtol=1e-6, atol=1e-9, err_msg=name)
+
+    spend = table[table['input'] == 'avg_spent_$'].set_index(['scenario_id', 'output'])['derivative']
+    expected = central_difference(lambda frame: output_values(scenarios, frame, parameters), spending, 'avg_spent_$')
+    np.testing.assert_allclose(spend.to_numpy(), expected.reindex(spend.index).to_numpy(), rtol=1e-6)
+
+
+@pytest.mark.parametrize('factor', FACTORS)
+def test_health_input_derivatives_match_finite_differences(factor):
+    scenarios, spending, parameters = synthetic_inputs()
+    table = scenario_sensitivities(scenarios, spending, parameters)
+    evaluate = lambda frame: output_values(scenarios, spending, frame)
+    rows = parameters['factor'] == factor
+
+    for name in HEALTH_INPUTS:
+        expected = central_difference(evaluate, parameters, name, rows)
+        derivatives = table[(table['input'] == name) & (table['factor'] == factor)].set_index(['scenario_id', 'output'])
+        derivatives = derivatives['derivative']
+
+        # Costs per case move the total saving only
+        assert len(derivatives) == len(scenarios) * (1 if name.endswith('cost_per_case') else 2)
+        np.testing.assert_allclose(derivatives.to_numpy(), expected.reindex(derivatives.index).to_numpy(),
+                                   rtol=1e-5, err_msg=name)
@@ -0,0 +1,92 @@
+import io
+import json
+
+import pandas as pd
+
+from impactPy.service import RESULT_COLUMNS, ModelService, serve_stdin
+
+
+def scenario_table(discounts=None):
+    """Scenario table of build_scenario_table for Japan and Spain by gender, with new customers equal to the discount."""
+    rows = []
+    for market in ['Japan', 'Spain']:
+        for discount in discounts or [10.0, 20.0, 40.0, 60.0, 80.0]:
+            for gender in ['Female', 'Male']:
+                rows.append({'scenario_id': f'{market[:3].upper()}{discount:g}{gender[0]}', 'market': market,
+                             'price': f'{discount:g}%', 'segment': 'gender', 'value': gender,
+                             'new_customers': discount, 'code': market[:3].upper(), 'discount': discount})
+    return pd.DataFrame(rows).reindex(columns=RESULT_COLUMNS + ['code', 'discount'])
+
+
+def test_query_returns_every_segment_value():
+    answer, = ModelService(scenario_table()).evaluate([{'market': 'Japan', 'discount': '20%'}])
+    assert [row['value'] for row in answer] == ['Female', 'Male']
+    assert all(row['new_customers'] == 20.0 for row in answer)
+
+
+def test_malformed_queries_are_answered_with_errors():
+    service = ModelService(scenario_table())
+    answers = service.evaluate([[1], 'x', None, {'market': 'JAP', 'discount': 20, 'segment': ['gender']},
+                                {'market': 'JAP', 'discount': 'abc'}, {'market': 'JAP', 'discount': 130},
+                                {'market': 'XXX', 'discount': 20}, {'market': 'JAP', 'discount': 20, 'value': 'Male'}])
+
+    assert all('error' in answer[0] for answer in answers[:-1])
+    assert answers[-1][0]['scenario_id'] == 'JAP20M'
+
+
+def test_off_grid_discounts_without_curves_are_rejected():
+    answer, = ModelService(scenario_table()).evaluate([{'market': 'Japan', 'discount': 30}])
+    assert 'only the discounts' in answer[0]['error']
+
+
+def test_off_grid_discounts_are_evaluated_once():
+    built = []
+
+    def build(discounts=None):
+        built.append(discounts)
+        return scenario_table(discounts)
+
+    service = ModelService(build(), build=build)
+    first = service.evaluate([{'market': 'Japan', 'discount': 30}, {'market': 'Spain', 'discount': 30, 'value': 'Male'}])
+    second = service.evaluate([{'market': 'Spain', 'discount': 30}])
+
+    assert [row['scenario_id'] for row in first[0]] == ['JAP30F', 'JAP30M']
+    assert [row['scenario_id'] for row in first[1]] == ['SPA30M']
+    assert len(second[0]) == 2
+    assert built == [None, [30.0]]
+    assert service._discounts == {10.0, 20.0, 40.0, 60.0, 80.0}
+
+
+def test_off_grid_discounts_are_evicted_least_recently_used_first():
+    built = []
+
+    def build(discounts=None):
+        built.append(discounts)
+        return scenario_table(discounts)
+
+    service = ModelService(build(), build=build, curve_cache=2)
+    for discount in [30, 50, 30, 70, 30, 50]:
+        answer, = service.evaluate([{'market': 'Japan', 'discount': discount}])
+        assert [row['new_customers'] for row in answer] == [discount, discount]
+
+    assert built == [None, [30.0], [50.0], [70.0], [50.0]]
+    assert list(service._curve_indexes) == [30.0, 50.0]
+
+
+def test_a_batch_larger_than_the_cache_is_answered_in_full():
+    service = ModelService(scenario_table(), build=lambda discounts=None: scenario_table(discounts), curve_cache=1)
+    answers = service.evaluate([{'market': 'Japan', 'discount': discount} for discount in [15, 25, 35]])
+
+    assert [answer[0]['new_customers'] for answer in answers] == [15, 25, 35]
+    assert len(service._curve_indexes) == 1
+
+
+def test_stdin_service_survives_malformed_lines():
+    stdin = io.StringIO('[1]\n"x"\nnot json\n\n{"market": "Spain", "discount": 10, "value": "Female"}\n')
+    stdout = io.StringIO()
+    serve_stdin(ModelService(scenario_table()), stdin, stdout)
+
+    lines = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert len(lines) == 4
+    assert 'error' in lines[0]['results'][0][0] and 'error' in lines[1]['results'][0][0] and 'error' in lines[2]
+    assert lines[3]['results'][0][0]['scenario_id'] == 'SPA10F'
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from impactPy.activity import calculate_activity_levels, create_activity_summary
+from impactPy.equivalence import synthetic_survey
+from impactPy.thresholds import ActivityDistributions
+
+
+@pytest.fixture(scope='module')
+def segmented():
+    survey = synthetic_survey(3000)
+    activity = calculate_activity_levels(survey)
+    return survey.drop(columns=activity.columns.difference(['S1', 'dSEGMENT', 'uuid']), errors='ignore').merge(
+        activity, on=['S1', 'dSEGMENT', 'uuid'], how='left')
+
+
+@pytest.mark.parametrize('segment', ['gender', 'age_group', 'income_level'])
+def test_who_summary_at_150_minutes_reproduces_the_activity_summary(segmented, segment):
+    expected = create_activity_summary(segmented, [segment])
+    summary = ActivityDistributions(segmented, [segment]).summary(150, 'who')
+
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(summary, expected, check_exact=False, rtol=0, atol=1e-9)
+
+
+def test_active_rates_fall_with_the_threshold(segmented):
+    rates = ActivityDistributions(segmented, ['gender']).active_rates(np.arange(0, 601, 30))
+    assert (np.diff(rates, axis=-1) <= 0).all()
+    np.testing.assert_allclose(rates[..., 0], 1.0)
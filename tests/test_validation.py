@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from impactPy import pipeline
+from impactPy.equivalence import synthetic_survey
+from impactPy.health_functions import HEALTH_SOURCES
+from impactPy.mappings import COLUMN_MAPPING, INCOME_MAPPINGS
+from impactPy.validation import (SURVEY_CODE_DOMAINS, coerce_numeric, raise_for_errors, read_raw_tables,
+                                 validate_inputs)
+
+health_data = pytest.mark.skipif(not all(os.path.exists(path) for path in HEALTH_SOURCES.values()),
+                                 reason='health parameter tables not available')
+
+
+def clean_survey(n=300):
+    """A survey that passes every check: the synthetic survey with its invalid codes replaced and S5-S7 answered."""
+    df = synthetic_survey(n)
+    for column, domain in SURVEY_CODE_DOMAINS.items():
+        if column in df.columns:
+            values = pd.to_numeric(df[column], errors='coerce')
+            df[column] = values.where(values.isna() | values.isin(list(domain)), list(domain)[0])
+    for market, code in COLUMN_MAPPING.items():
+        df[f'S5_{code}'] = list(INCOME_MAPPINGS[market])[0]
+    return df.assign(S6=5, S7=3)
+
+
+@pytest.fixture(scope='module')
+def raw_tables():
+    return read_raw_tables()
+
+
+def checks(report, severity='error'):
+    return set(report.loc[report['severity'] == severity, ['check', 'column']].itertuples(index=False, name=None))
+
+
+@health_data
+def test_clean_inputs_pass(raw_tables):
+    report = validate_inputs(clean_survey(), raw_tables)
+    assert checks(report) == set()
+    raise_for_errors(report)
+
+
+@health_data
+@pytest.mark.parametrize('change, expected', [
+    (lambda df: df.assign(Q4=df['Q4'].where(df.index != 3, 12)), ('unknown code', 'Q4')),
+    (lambda df: df.assign(Section_B_Q7=df['Section_B_Q7'].where(df.index != 3, 0.5)), ('unknown code', 'Section_B_Q7')),
+    (lambda df: df.assign(WEIGHT=df['WEIGHT'].where(df.index != 3, 0.0)), ('weight not positive', 'WEIGHT')),
+    (lambda df: df.assign(WEIGHT=df['WEIGHT'].where(df.index != 3, -1.0)), ('weight not positive', 'WEIGHT')),
+    (lambda df: df.drop(columns=['uuid']), ('required column', 'uuid')),
+    (lambda df: df.assign(S6=df['S6'].astype(object).where(df.index != 3, ' 6,323.49 ')), ('not numeric', 'S6'))
+])
+def test_bad_survey_inputs_are_errors(raw_tables, change, expected):
+    report = validate_inputs(change(clean_survey()), raw_tables)
+
+    assert checks(report) == {expected}
+    with pytest.raises(ValueError, match=expected[0]):
+        raise_for_errors(report)
+
+
+def test_formatted_numbers_parse_only_where_formatting_is_expected():
+    values = pd.Series([' 6,323.49 ', ' -   ', '12.5', None])
+
+    numbers, not_numeric = coerce_numeric(values, formatted=True)
+    np.testing.assert_array_equal(numbers, [6323.49, np.nan, 12.5, np.nan])
+    assert not not_numeric.any()
+
+    _, not_numeric = coerce_numeric(values)
+    np.testing.assert_array_equal(not_numeric, [True, True, False, False])
+
+
+@health_data
+def test_formatted_number_in_a_plain_parameter_table_is_an_error(raw_tables):
+    tables = dict(raw_tables, relative_risks=raw_tables['relative_risks'].assign(relative_risk=' 6,323.49 '))
+    report = validate_inputs(clean_survey(), tables)
+    assert ('not numeric', 'relative_risk') in checks(report)
+
+
+@health_data
+def test_parameter_coverage_gaps_are_reported(raw_tables):
+    relative_risks = raw_tables['relative_risks']
+    dalys = raw_tables['population_dalys']
+    tables = dict(raw_tables, relative_risks=relative_risks[relative_risks['factor'].str.strip() != 'stroke'],
+                  population_dalys=dalys[dalys['factor'].str.strip() != 'stroke'])
+    report = validate_inputs(clean_survey(), tables)
+
+    assert checks(report) == {('no data', 'relative_risk')}
+    assert ('no data (default used)', 'population_rate') in checks(report, 'warning')
+    assert report.loc[report['check'] == 'no data', 'examples'].str.startswith('stroke/').all()
+    with pytest.raises(ValueError, match='no data'):
+        raise_for_errors(report)
+
+
+def test_warnings_do_not_stop_the_run():
+    report = pd.DataFrame([{'source': 'population_dalys', 'check': 'no data (default used)', 'column': 'population_rate',
+                            'severity': 'warning', 'count': 1, 'examples': 'stroke'}])
+    raise_for_errors(report)
+
+
+@health_data
+def test_validation_stage_stops_the_run(tmp_path, monkeypatch, raw_tables):
+    survey = clean_survey().drop(columns=['uuid'])
+    monkeypatch.setattr(pipeline, 'load_weighted_survey', lambda paths: survey)
+    paths = dict(pipeline.PATHS, validation_report=str(tmp_path / 'validation.xlsx'), market_penetration={})
+
+    with pytest.raises(ValueError, match='required column'):
+        pipeline.run_pipeline(['validation', 'activity'], paths)
+    assert os.path.exists(paths['validation_report'])
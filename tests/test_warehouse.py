@@ -0,0 +1,46 @@
+import pandas as pd
+
+from impactPy.warehouse import append_table, connect, read_table, record_run, run_tables, table_columns
+
+
+def scenarios(run):
+    return pd.DataFrame({'scenario_id': ['SPA10F', 'SPA10M', 'JAP10F'], 'new_customers': [1.0, 2.0, 3.0 * run]})
+
+
+def test_tables_round_trip_through_sqlite(tmp_path):
+    path = str(tmp_path / 'warehouse.sqlite')
+    connection = connect(path)
+    with connection:
+        for run_id in [1, 2, 3]:
+            table = run_tables({'projection': scenarios(run_id)})['sroi_projection']
+            if run_id == 3:
+                table = table.assign(horizon=5)
+            append_table(connection, 'sroi_projection', table, run_id)
+
+        columns = table_columns(connection, 'sroi_projection')
+        indexes = {row[1] for row in connection.execute("PRAGMA index_list('sroi_projection')")}
+    connection.close()
+
+    assert columns == ['run_id', 'scenario_id', 'new_customers', 'code', 'market', 'horizon']
+    assert indexes == {f'idx_sroi_projection_{column}' for column in ['run_id', 'market', 'code', 'scenario_id']}
+
+    last_two = read_table('sroi_projection', path, last_runs=2)
+    assert sorted(last_two['run_id'].unique()) == [2, 3]
+    assert last_two.loc[last_two['run_id'] == 2, 'horizon'].isna().all()
+    assert (last_two.loc[last_two['run_id'] == 3, 'horizon'] == 5).all()
+
+    spain = read_table('sroi_projection', path, last_runs=1, code='SPA', columns=['scenario_id', 'market'])
+    assert spain.to_dict('records') == [{'scenario_id': 'SPA10F', 'market': 'Spain'},
+                                        {'scenario_id': 'SPA10M', 'market': 'Spain'}]
+
+
+def test_runs_record_their_segments_and_parameters(tmp_path):
+    path = str(tmp_path / 'warehouse.sqlite')
+    elasticity = {'gender': pd.DataFrame({'scenario_id': ['SPA10F'], 'gender': ['Female'], '% yes': [0.2]}),
+                  'age_group': pd.DataFrame({'scenario_id': ['SPA10Y'], 'age_group': ['Young'], '% yes': [0.3]})}
+
+    run_id = record_run({'elasticity': elasticity}, [str(tmp_path / 'missing.csv')], {'precision': 'float64'}, path)
+
+    table = read_table('elasticity_scenarios', path, run_ids=[run_id])
+    assert list(zip(table['segment'], table['value'])) == [('gender', 'Female'), ('age_group', 'Young')]
+    assert read_table('runs', path)['parameters'].tolist() == ['{"precision": "float64"}']
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from impactPy.elasticity import MODE_CONFIGS, calculate_survey_rates
+from impactPy.equivalence import synthetic_survey
+from impactPy.mappings import COLUMN_MAPPING
+from impactPy.survey import process_data
+from impactPy.waves import WaveAggregates
+
+
+def raw_survey(n=3000, seed=0):
+    """synthetic_survey with the income and social answers of the questionnaire as loaded."""
+    df = synthetic_survey(n, seed)
+    rng = np.random.default_rng(seed)
+    df['S6'] = rng.integers(0, 11, n).astype(float)
+    df['S7'] = rng.integers(1, 6, n).astype(float)
+    for code in set(COLUMN_MAPPING.values()):
+        df[f'S5_{code}'] = rng.choice([1, 2, 3, 99], n)
+    return df
+
+
+def test_pooled_waves_equal_the_concatenated_survey():
+    df = raw_survey()
+    waves = WaveAggregates()
+    waves.add_wave('first', df.iloc[:1200])
+    waves.add_wave('second', df.iloc[1200:])
+    single = WaveAggregates()
+    single.add_wave('all', df)
+
+    pooled, expected = waves.tables(), single.tables()
+    assert list(pooled) == list(expected)
+    for name in pooled:
+        pd.testing.assert_frame_equal(pooled[name].reset_index(drop=True), expected[name].reset_index(drop=True), rtol=1e-9)
+
+
+def test_pooled_rates_equal_the_elasticity_stage():
+    df = raw_survey()
+    waves = WaveAggregates()
+    waves.add_wave('first', df.iloc[:1500])
+    waves.add_wave('second', df.iloc[1500:])
+
+    pooled, expected = waves.survey_rates(), calculate_survey_rates(process_data(df))
+    for mode in MODE_CONFIGS:
+        pd.testing.assert_frame_equal(pooled[mode].reset_index(drop=True), expected[mode].reset_index(drop=True),
+                                      rtol=1e-9, check_dtype=False)
+
+
+def test_waves_are_append_only():
+    df = raw_survey(500)
+    waves = WaveAggregates()
+    waves.add_wave('first', df)
+    with pytest.raises(ValueError):
+        waves.add_wave('first', df)
+    with pytest.raises(ValueError):
+        waves.tables(['missing'])